@@ -0,0 +1,298 @@
+import argparse
+import json
+import os
+import sys
+import time
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent
+
+# Values of the run options that are neither in the run config nor on the command line
+DEFAULTS = {
+    "preset": "PHYSIOLOGICAL",
+    "steps": None,
+    "out": "run_output",
+    "modifications": [],
+    "probes": [],
+    "ecg": False,
+    "regions": False,
+    "activation": False,
+    "record": False,
+    "compression": None,
+    "chunk_frames": 256,
+    "video": None,
+    "fps": 30.0,
+    "resolution": None,
+    "stride": 1,
+    "charge": False,
+    "threads": None,
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cardiomaton",
+                                     description="Cardiomaton, starts the GUI when no command is given.")
+    commands = parser.add_subparsers(dest="command")
+
+    # Defaults are suppressed, so only the options given explicitly override the run config
+    run = commands.add_parser("run", argument_default=argparse.SUPPRESS,
+                              help="Runs the simulation headless and writes the requested outputs.")
+    run.add_argument("--config", help="JSON run config with any of the options below, the command line wins")
+    run.add_argument("--preset", help="name of the preset in the database (default PHYSIOLOGICAL)")
+    run.add_argument("--steps", type=int, help="number of simulated frames")
+    run.add_argument("--out", help="output directory (default run_output)")
+    run.add_argument("--modifications", help="JSON file with the list of scripted modifications")
+    run.add_argument("--probe", dest="probes", action="append", nargs=2, type=int, metavar=("X", "Y"),
+                     help="records the charge and the state of the cell, can be repeated")
+    run.add_argument("--ecg", action="store_true", help="writes the pseudo-ECG limb leads")
+    run.add_argument("--regions", action="store_true", help="writes the state counts and mean charge per region")
+    run.add_argument("--activation", action="store_true", help="writes the activation and cycle length maps")
+    run.add_argument("--record", action="store_true", help="streams all frames to the chunked columnar export")
+    run.add_argument("--compression", type=int, help="deflate level (0-9) of the export, raw .npy chunks without it")
+    run.add_argument("--chunk-frames", dest="chunk_frames", type=int, help="frames per chunk of the export")
+    run.add_argument("--video", help="name of the video file in the output directory (.mp4 or .avi)")
+    run.add_argument("--fps", type=float, help="frame rate of the video")
+    run.add_argument("--resolution", nargs=2, type=int, metavar=("WIDTH", "HEIGHT"), help="size of the video")
+    run.add_argument("--stride", type=int, help="every stride-th frame goes to the video")
+    run.add_argument("--charge", action="store_true", help="renders the charge instead of the state")
+    run.add_argument("--threads", type=int, help="number of OpenMP threads, fix it for bit exact reruns")
+    return parser
+
+
+def resolve_options(arguments: argparse.Namespace) -> Dict:
+    """
+    Merges the defaults, the run config and the command line options, in this order.
+
+    Throws:
+        ValueError - on the unknown keys in the run config or the missing number of steps
+    """
+    given = vars(arguments).copy()
+    given.pop("command", None)
+    config = {}
+    if "config" in given:
+        with open(given.pop("config")) as file:
+            config = json.load(file)
+        unknown = set(config) - set(DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown keys in the run config: {', '.join(sorted(unknown))}")
+
+    options = {**DEFAULTS, **config, **given}
+    if isinstance(options["modifications"], str):
+        with open(options["modifications"]) as file:
+            options["modifications"] = json.load(file)
+    if options["steps"] is None or options["steps"] < 0:
+        raise ValueError("Number of steps is required and can't be negative")
+    return options
+
+
+def select_cells(positions, modification: Dict) -> List:
+    """
+    Returns the positions of the cells selected by the modification, either listed in cells
+    or inside the rect [row_start, col_start, row_end, col_end), restricted to the existing cells.
+    """
+    if "cells" in modification:
+        existing = set(map(tuple, positions.tolist()))
+        return [tuple(cell) for cell in modification["cells"] if tuple(cell) in existing]
+    row_start, col_start, row_end, col_end = modification["rect"]
+    inside = ((positions[:, 0] >= row_start) & (positions[:, 0] < row_end)
+              & (positions[:, 1] >= col_start) & (positions[:, 1] < col_end))
+    return list(map(tuple, positions[inside].tolist()))
+
+
+def write_summary(out: Path, summary: Dict) -> None:
+    """
+    Writes the summary of the run to run.json in the output directory.
+    """
+    with open(out / "run.json", "w") as file:
+        json.dump(summary, file, indent=1)
+
+
+def run(options: Dict) -> Dict:
+    """
+    Runs the simulation described by the options and writes the outputs. The backend is imported here,
+    after OMP_NUM_THREADS is set, and nothing on this path imports PyQt6.
+
+    Returns:
+        dict - summary of the run, also written to run.json in the output directory
+
+    Throws:
+        ValueError - on the invalid options, e.g. a probe without the cell or a modification outside of the run
+        RuntimeError - on the unknown preset or a failed export
+        OSError - when the outputs can't be written
+        Once the output directory exists, run.json records the error and the outputs finished before it.
+    """
+    if options["threads"] is not None:
+        os.environ["OMP_NUM_THREADS"] = str(options["threads"])
+
+    import numpy as np
+    from src.backend.enums.cell_type import ConfigLoader
+    from src.backend.models.automaton import Automaton
+    from src.backend.models.ecg_recorder import EcgRecorder
+    from src.backend.models.region_recorder import RegionRecorder
+    from src.backend.services.cell_modifications import apply_cell_modification
+    from src.backend.services.ecg_leads import lead_weights
+    from src.backend.services.recording_export import RecordingExporter
+    from src.backend.services.video_export import VideoExporter, create_frame_buffer
+    from src.database.repository.automaton_repository import get_repository
+
+    ConfigLoader.loadConfig()
+    steps = options["steps"]
+    capacity = max(steps, 1)
+    modifications = sorted(options["modifications"], key=lambda modification: modification.get("step", 0))
+    for modification in modifications:
+        if not 0 <= modification.get("step", 0) <= steps:
+            raise ValueError(f"Modification step {modification.get('step')} is outside of the run")
+        if "cells" not in modification and len(modification.get("rect", ())) != 4:
+            raise ValueError(f"Modification at step {modification.get('step', 0)} needs cells or a rect of 4 numbers")
+    out = Path(options["out"])
+    out.mkdir(parents=True, exist_ok=True)
+
+    outputs = []
+    done = 0
+    try:
+        dto = get_repository().get_automaton(options["preset"])
+        buffer = create_frame_buffer() if options["video"] else None
+        automaton = Automaton(dto.shape, dto.cell_map,
+                              img_ptr=buffer.ctypes.data if buffer is not None else 0,
+                              img_bytes=buffer.strides[0] if buffer is not None else 0,
+                              frame=dto.frame, buffer_size=1)
+        positions = automaton.get_positions()
+
+        probe = automaton.add_probe([tuple(p) for p in options["probes"]], capacity) if options["probes"] else None
+        ecg = None
+        if options["ecg"]:
+            names, weights = lead_weights(positions, automaton.get_shape())
+            ecg = EcgRecorder(weights, names, capacity)
+            automaton.attach_ecg(ecg)
+        regions = None
+        if options["regions"]:
+            regions = RegionRecorder(capacity)
+            automaton.attach_region_recorder(regions)
+
+        # The exporters are left without finalizing when the run fails, their writer threads are stopped
+        with ExitStack() as exporters:
+            exporter = None
+            if options["record"]:
+                exporter = exporters.enter_context(RecordingExporter(out / "recording", positions,
+                                                                     options["chunk_frames"], options["compression"]))
+            video = None
+            if options["video"]:
+                video = exporters.enter_context(VideoExporter(out / options["video"],
+                                                              (buffer.shape[1], buffer.shape[0]), options["fps"],
+                                                              options["resolution"], options["stride"]))
+
+            start_frame = automaton.get_frame_counter()
+            started = time.perf_counter()
+            for target, modification in [*((m.get("step", 0), m) for m in modifications), (steps, None)]:
+                if exporter is None and video is None:
+                    automaton.advance(target - done, options["charge"])
+                else:
+                    for _ in range(target - done):
+                        automaton.update_grid(options["charge"])
+                        if exporter is not None:
+                            view = automaton.state_view()
+                            exporter.submit(view.snapshot, view.frame)
+                        if video is not None:
+                            video.submit(buffer)
+                done = target
+                if modification is not None:
+                    cells = select_cells(positions, modification)
+                    if not cells:
+                        print(f"Modification at step {target} selects no cells", file=sys.stderr)
+                    apply_cell_modification(automaton, cells,
+                                            depolarize=modification.get("depolarize", False),
+                                            necrosis=modification.get("necrosis", False),
+                                            global_parameters=modification.get("global"),
+                                            atrial_parameters=modification.get("atrial"),
+                                            pacemaker_parameters=modification.get("pacemaker"),
+                                            purkinje_parameters=modification.get("purkinje"))
+            elapsed = time.perf_counter() - started
+
+            if probe is not None:
+                frames, charges, states = probe.series()
+                np.savez(out / "probes.npz", frames=frames, charges=charges, states=states,
+                         positions=np.asarray(probe.positions, dtype=np.int32))
+                outputs.append("probes.npz")
+            if ecg is not None:
+                frames, values = ecg.series()
+                np.savez(out / "ecg.npz", frames=frames, values=values, leads=np.asarray(ecg.lead_names))
+                outputs.append("ecg.npz")
+            if regions is not None:
+                frames, counts, mean_charges = regions.series()
+                np.savez(out / "regions.npz", frames=frames, counts=counts, mean_charges=mean_charges,
+                         regions=np.asarray(regions.region_names), states=np.asarray(regions.state_names))
+                outputs.append("regions.npz")
+            if options["activation"]:
+                np.savez(out / "activation.npz", activation_map=automaton.activation_map(),
+                         cycle_length_map=automaton.cycle_length_map())
+                outputs.append("activation.npz")
+            if exporter is not None:
+                exporter.close()
+                outputs.append("recording")
+            if video is not None:
+                video.close()
+                outputs.append(options["video"])
+    except Exception as error:
+        # run.json records how far the run got, the listed outputs are complete
+        write_summary(out, {
+            "preset": options["preset"],
+            "steps": steps,
+            "steps_done": done,
+            "threads": options["threads"],
+            "outputs": outputs,
+            "error": f"{type(error).__name__}: {error}",
+        })
+        raise
+
+    summary = {
+        "preset": options["preset"],
+        "steps": steps,
+        "start_frame": start_frame,
+        "end_frame": automaton.get_frame_counter(),
+        "modifications": len(modifications),
+        "threads": options["threads"],
+        "elapsed_s": elapsed,
+        "steps_per_s": steps / elapsed if elapsed > 0 else None,
+        "outputs": outputs,
+    }
+    write_summary(out, summary)
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Entry point of the cardiomaton script. Paths given by the user are resolved against the current
+    directory, then the working directory is switched to the code root, where the database and the
+    resources are looked up.
+    """
+    parser = build_parser()
+    arguments = parser.parse_args(argv)
+    if ROOT.as_posix() not in sys.path:
+        sys.path.insert(0, ROOT.as_posix())
+
+    if arguments.command is None:
+        os.chdir(ROOT)
+        from main_with_front import main as gui
+        gui()
+        return 0
+
+    try:
+        options = resolve_options(arguments)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+    options["out"] = str(Path(options["out"]).resolve())
+    os.chdir(ROOT)
+
+    try:
+        summary = run(options)
+    except (OSError, RuntimeError, ValueError) as error:
+        print(f"{parser.prog}: error: {error}", file=sys.stderr)
+        return 1
+    print(f"{summary['steps']} steps in {summary['elapsed_s']:.2f} s, outputs in {options['out']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
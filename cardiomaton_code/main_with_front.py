@@ -1,16 +1,22 @@
 import sys
 from PyQt6.QtWidgets import QApplication
+from PyQt6.QtCore import QThread, QTimer
 from src.frontend.ui_components.loading_window import PlaceholderWindow
+from src.workers.backend_init_worker import BackendInitWorker
 
 
 
 
-def main():
+def main(exit_after_first_frame: bool = False):
     """
     Entry point for the Cardiomaton application.
 
-    Initializes the Qt application, shows a loading window,
-    and initializes the backend asynchronously in a separate thread.
+    Initializes the Qt application and shows a loading window. The backend (database, preset,
+    automaton) is built on a worker thread while the main window shell is built on the GUI thread,
+    the simulation view is attached once both are ready.
+
+    Args:
+        exit_after_first_frame - quits once the first simulated frame is displayed, for measuring the startup
     """
     K = 5
     SIZE = (292 * K, 400 * K)
@@ -23,34 +29,39 @@ def main():
 
     app.processEvents()
 
-    # --- Backend classes import ---
-    from PyQt6.QtGui import QImage
-    from src.backend.controllers.simulation_controller import SimulationController
-    from src.frontend.frame_rendering.frame_renderer import FrameRenderer
-    from src.backend.enums.cell_type import ConfigLoader
-    from src.database.db import init_db
+    # --- Backend initialization, runs in parallel with the frontend ---
+    thread = QThread()
+    worker = BackendInitWorker(BASE_FRAME_TIME, SIZE)
+    worker.moveToThread(thread)
+    thread.started.connect(worker.run)
 
-    app.processEvents()
-    # --- Backend initialization ---
-    ConfigLoader.loadConfig()
-    init_db()
-    image = QImage(SIZE[1], SIZE[0], QImage.Format.Format_RGBA8888)
-    sim = SimulationController(frame_time=BASE_FRAME_TIME, image=image)
-    renderer = FrameRenderer(sim, image)
+    def on_backend_ready(sim, renderer, image):
+        thread.quit()
+        thread.wait()
+        main_window.attach_simulation(sim, renderer, image)
+        loading.close()
+        main_window.show()
+        if exit_after_first_frame:
+            QTimer.singleShot(0, lambda: (main_window.simulation_window._update_live_frame(), app.quit()))
+
+    def on_backend_failed(error):
+        thread.quit()
+        thread.wait()
+        print(f"Failed to initialize the backend: {error}")
+        app.exit(1)
+
+    # Connected from the GUI thread, so the slots are queued and run there once the event loop starts,
+    # that is after the window shell below is built
+    worker.finished.connect(on_backend_ready)
+    worker.failed.connect(on_backend_failed)
+    thread.start()
 
-    app.processEvents()
     # --- Frontend initialization ---
     from src.frontend.main_window import MainWindow
-    main_window = MainWindow(
-        simulation_controller=sim,
-        frame_renderer=renderer,
-        image=image
-    )
-    loading.close()
-    main_window.show()
+    main_window = MainWindow()
 
     sys.exit(app.exec())
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,7 +1,17 @@
-from typing import Optional, Tuple, Dict
+from concurrent.futures import Future
+from typing import Iterable, Optional, Tuple, Dict
+from pathlib import Path
+import numpy as np
 from src.database.dto.automaton_dto import AutomatonDto
 from src.models.cell import CellDict
 from src.backend.services.simulation_service import SimulationService
+from src.backend.models.automaton import CellBatch, CellStatic
+from src.backend.models.probe_recorder import ProbeRecorder
+from src.backend.models.ecg_recorder import EcgRecorder
+from src.backend.models.region_recorder import RegionRecorder
+from src.backend.models.event_log import EventLog
+from src.backend.services.recording_export import RecordingExporter
+from src.backend.services.video_export import VideoExporter
 from PyQt6.QtGui import QImage
 
 class SimulationController:
@@ -39,6 +49,15 @@ class SimulationController:
     def save_automaton(self, entry: str) -> bool:
         return self.service.save_automaton(entry)
 
+    def save_automaton_async(self, entry: str) -> Future:
+        return self.service.save_automaton_async(entry)
+
+    def load_preset(self, entry: str) -> AutomatonDto:
+        return self.service.load_preset(entry)
+
+    def select_preset(self, entry: str) -> None:
+        self.service.select_preset(entry)
+
     def render_frame(self, idx, if_charged, drop_newer) -> int:
         return self.service.render_frame(idx, if_charged, drop_newer)
 
@@ -78,8 +97,60 @@ class SimulationController:
     def get_cell_data(self, position: Tuple[int, int]) -> Optional[Dict]:
         return self.service.get_cell_data(position)
     
+    def get_cells(self, positions) -> CellBatch:
+        return self.service.get_cells(positions)
+
+    def get_cell_static(self, position: Tuple[int, int]) -> Optional[CellStatic]:
+        return self.service.get_cell_static(position)
+
     def get_buffer_size(self) -> int:
         return self.service.get_buffer_size()
+
+    def add_probe(self, positions: Iterable[Tuple[int, int]], capacity: int = 500) -> ProbeRecorder:
+        return self.service.add_probe(positions, capacity)
+
+    def remove_probe(self, probe: ProbeRecorder) -> None:
+        self.service.remove_probe(probe)
+
+    def activation_map(self) -> np.ndarray:
+        return self.service.activation_map()
+
+    def cycle_length_map(self) -> np.ndarray:
+        return self.service.cycle_length_map()
+
+    def enable_ecg(self, capacity: int = 2000) -> EcgRecorder:
+        return self.service.enable_ecg(capacity)
+
+    def disable_ecg(self) -> None:
+        self.service.disable_ecg()
+
+    def enable_region_stats(self, capacity: int = 2000) -> RegionRecorder:
+        return self.service.enable_region_stats(capacity)
+
+    def disable_region_stats(self) -> None:
+        self.service.disable_region_stats()
+
+    def enable_event_log(self, path: Optional[str] = None) -> EventLog:
+        return self.service.enable_event_log(path)
+
+    def disable_event_log(self) -> None:
+        self.service.disable_event_log()
+
+    def start_export(self, path: str, chunk_frames: int = 256, compression: Optional[int] = None) -> RecordingExporter:
+        return self.service.start_export(path, chunk_frames, compression)
+
+    def stop_export(self) -> Optional[Path]:
+        return self.service.stop_export()
+
+    def export_recorded(self, path: str, chunk_frames: int = 256, compression: Optional[int] = None) -> Path:
+        return self.service.export_recorded(path, chunk_frames, compression)
+
+    def start_video(self, path: str, fps: float = 30.0, resolution: Optional[Tuple[int, int]] = None,
+                    stride: int = 1) -> VideoExporter:
+        return self.service.start_video(path, fps, resolution, stride)
+
+    def stop_video(self) -> Optional[Path]:
+        return self.service.stop_video()
     
     def set_frame_counter(self, idx: int):
         self.service.set_frame_counter(idx)
\ No newline at end of file
@@ -1,8 +1,19 @@
+from libc.stdint cimport uint8_t, int32_t
 from src.backend.structs.c_cell cimport CCell
 from src.models.cell import Cell
 from src.backend.structs.c_triangle cimport CTriangle
 from src.backend.utils.draw_functions cimport DrawFunc
 from src.backend.models.frame_recorder cimport FrameRecorder
+from src.backend.structs.cell_snapshot cimport CellSnapshot
+from src.backend.models.probe_recorder cimport ProbeRecorder
+from src.backend.models.ecg_recorder cimport EcgRecorder
+from src.backend.models.region_recorder cimport RegionRecorder
+from src.backend.models.event_log cimport EventLog
+
+cdef enum:
+    # Parts of the grid updated in parallel, the aggregates of the recorders are accumulated per part
+    UPDATE_CHUNKS = 64
+
 
 cdef class Automaton:
     # C exclusive attributes
@@ -16,18 +27,60 @@ cdef class Automaton:
 
     cdef FrameRecorder frame_recorder
 
+    # Snapshot of the current state for state_view, used when the newest recorded frame is out of date
+    cdef CellSnapshot* live_snapshot
+    cdef bint snapshot_current
+    cdef object static_view
+
+    # Lookups of the static per cell fields, built lazily: dense position -> grid index array
+    # and position -> CellStatic cache
+    cdef object index_grid
+    cdef dict static_cells
+
+    # Probes recorded at the end of every step, position_index maps positions to grid indices (built lazily)
+    cdef list probes
+    cdef list ecg_recorders
+    cdef list region_recorders
+    cdef list event_logs
+    cdef dict position_index
+
+    # Region aggregates of the step, indexed by [chunk, region, state] and [chunk, region], see RegionRecorder.store
+    cdef int32_t* chunk_counts
+    cdef double* chunk_charges
+    # Leads of all the ECG recorders of the step, indexed by [chunk, lead], lead_weights points at the weights of every lead
+    cdef double* chunk_leads
+    cdef const double** lead_weights
+    cdef int leads_capacity
+
+    # Frames of the last and the previous activation (transition into RAPID_DEPOLARIZATION) of every cell,
+    # -1 when the cell wasn't activated yet
+    cdef int32_t[::1] last_activation
+    cdef int32_t[::1] prev_activation
+    cdef object _last_activation
+    cdef object _prev_activation
+
     cdef unsigned char* img_buffer
     cdef int bytes_per_line 
 
     # Python helping attributes
     cdef public tuple size
-    cdef public dict cell_data
     cdef public dict dict_mapping
 
+    # Static per cell metadata: index of the config of every cell (grid order) into configs,
+    # the list of distinct config dicts, compared by identity
+    cdef int32_t* config_index
+    cdef list configs
+
     # Cell modification attributes
     cdef CCell ***modification_snapshot_grids
     cdef int buf_size
 
+    # Pool of charge tables shared by the cells, keyed by content in charge_table_index
+    cdef double** charge_tables
+    cdef int* charge_table_sizes
+    cdef int n_charge_tables
+    cdef dict charge_table_index
+
     # Smoothing triangles
 
     cdef CTriangle* smoothing_triangles
@@ -35,20 +88,28 @@ cdef class Automaton:
 
     # Public python API
     cpdef void update_grid(self, object show_charge)
+    cpdef int advance(self, int n_steps, bint show_charge=*)
     cpdef int to_cell_data(self)
 
     cpdef float get_frame_time(self)
     cpdef void set_frame_time(self, double)
     cpdef tuple get_shape(self)
     cpdef dict get_cell_data(self, tuple)
+    cpdef object get_cell_static(self, tuple)
+    cpdef object get_cells(self, object positions)
+    cpdef dict get_cell_config(self, tuple)
+    cpdef list get_neighbors(self, tuple)
 
     cpdef int get_buffer_size(self)
+    cpdef dict memory_report(self)
     cpdef int render_frame(self, int idx, bint if_charged, bint drop_newer)
     cpdef void set_frame_counter(self, int)
     cpdef dict serialize_automaton(self)
 
     cdef dict _serialize_automaton(self)
     cpdef int get_frame_counter(self)
+    cpdef list distinct_configs(self)
+    cpdef object to_blob(self, dict arg_ids)
 
 
     # Cell modification functions
@@ -59,6 +120,32 @@ cdef class Automaton:
 
     cpdef void commit_current_automaton(self)
     cpdef void undo_modification(self)
+    cpdef void reset_from(self, Automaton template)
+
+
+    # Probes
+    cpdef ProbeRecorder add_probe(self, object positions, int capacity=*)
+    cpdef void attach_probe(self, ProbeRecorder probe)
+    cpdef void remove_probe(self, ProbeRecorder probe)
+    cpdef list get_probes(self)
+    cpdef void attach_ecg(self, EcgRecorder recorder)
+    cpdef void remove_ecg(self, EcgRecorder recorder)
+    cpdef list get_ecg_recorders(self)
+    cpdef void attach_region_recorder(self, RegionRecorder recorder)
+    cpdef void remove_region_recorder(self, RegionRecorder recorder)
+    cpdef list get_region_recorders(self)
+    cpdef void attach_event_log(self, EventLog log)
+    cpdef void remove_event_log(self, EventLog log)
+    cpdef list get_event_logs(self)
+    cpdef object get_states(self)
+    cpdef object state_view(self)
+    cpdef object frame_view(self, int idx)
+    cpdef object get_positions(self)
+
+    # Activation maps
+    cpdef object activation_times(self)
+    cpdef object activation_map(self)
+    cpdef object cycle_length_map(self)
 
 
     # Private python compatible methods
@@ -67,7 +154,22 @@ cdef class Automaton:
 
     # C exclusive methods
     cdef void _dealloc_grid(self, CCell**)
-    cdef void _generate_grid(self, CCell**, list)
+    cdef double* _intern_charges(self, object, int*) except NULL
+    cdef int _mark_charge_tables(self, CCell**, uint8_t*) noexcept nogil
+    cdef void _compact_charge_tables(self)
+    cdef void _generate_grid(self, CCell**, list, int32_t*)
     cdef void _update_grid_nogil(self, DrawFunc)
     cdef void _init_img(self)
     cdef void _clear_img(self)
+    cdef void _clear_modifications(self)
+    cdef int _modification_capacity(self)
+    cdef void _shrink_modifications(self)
+    cdef bint _same_topology(self, Automaton other)
+    cdef dict _get_position_index(self)
+    cdef void _drop_activations_after(self, int frame)
+    cdef void _log_events(self)
+    cdef int _bind_leads(self) except -1
+    cdef object _to_dense(self, object values)
+    cdef tuple _static_arrays(self)
+    cdef object _get_index_grid(self)
+    cdef void _invalidate_static(self)
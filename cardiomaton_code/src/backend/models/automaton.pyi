@@ -1,25 +1,87 @@
-from typing import Dict, Tuple
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import numpy as np
 from src.models.cell import Cell
+from src.backend.models.probe_recorder import ProbeRecorder
+from src.backend.models.ecg_recorder import EcgRecorder
+from src.backend.models.region_recorder import RegionRecorder
+from src.backend.models.event_log import EventLog
 from PyQt6.QtGui import QImage
 
+@dataclass(frozen=True)
+class CellStatic:
+    cell_type: str
+    ccs_part: str
+    auto_polarization: bool
+
+@dataclass(frozen=True)
+class CellBatch:
+    positions: np.ndarray
+    index: np.ndarray
+    found: np.ndarray
+    state: np.ndarray
+    charge: np.ndarray
+    timer: np.ndarray
+    type: np.ndarray
+    auto_polarization: np.ndarray
+
+@dataclass(frozen=True)
+class StateView:
+    frame: int
+    state: np.ndarray
+    charge: np.ndarray
+    timer: np.ndarray
+    type: np.ndarray
+    positions: np.ndarray
+    snapshot: np.ndarray
+
 class Automaton:
     py_cell: Cell
 
-    def __init__(self, size: Tuple[int, int], cells: Dict[Tuple[int, int], Cell], img_ptr: int, img_bytes:int, frame_time: float) -> None: ...
+    def __init__(self, size: Tuple[int, int], cells: Dict[Tuple[int, int], Cell], img_ptr: int, img_bytes:int, frame: int = 0, frame_time: float = 0.2, buffer_size: int = 200, buffer_path: Optional[str] = None) -> None: ...
     def print_state(self) -> None: ...
     def update_grid(self, if_charged: bool) -> None: ...
+    def advance(self, n_steps: int, show_charge: bool = False) -> int: ...
     def to_cell_data(self) -> int: ...#Tuple[int, Dict[Tuple[int, int], Dict]]: ...
     def recreate_from_dict(self, vals) -> None: ...
     def get_frame_time(self) -> float: ...
     def set_frame_time(self, frame_time: float) -> None: ...
     def get_shape(self) -> Tuple[int, int]: ...
     def get_cell_data(self, position: Tuple[int, int]) -> Dict: ...
+    def get_cell_static(self, position: Tuple[int, int]) -> Optional[CellStatic]: ...
+    def get_cell_config(self, position: Tuple[int, int]) -> Optional[Dict]: ...
+    def get_neighbors(self, position: Tuple[int, int]) -> Optional[List[Tuple[int, int]]]: ...
+    def get_cells(self, positions: np.ndarray) -> CellBatch: ...
     def get_buffer_size(self) -> int: ...
+    def memory_report(self) -> Dict[str, int]: ...
     def render_frame(self, idx: int, if_charged: bool) -> int: ...
     def modify_cell_state(self, coords: set[tuple[int, int]], new_state: CellState) -> None: ...
     def commit_current_automaton(self) -> None: ...
     def undo_modification(self) -> None: ...
+    def reset_from(self, template: Automaton) -> None: ...
+    def add_probe(self, positions: List[Tuple[int, int]], capacity: int = 500) -> ProbeRecorder: ...
+    def attach_probe(self, probe: ProbeRecorder) -> None: ...
+    def remove_probe(self, probe: ProbeRecorder) -> None: ...
+    def get_probes(self) -> List[ProbeRecorder]: ...
+    def attach_ecg(self, recorder: EcgRecorder) -> None: ...
+    def remove_ecg(self, recorder: EcgRecorder) -> None: ...
+    def get_ecg_recorders(self) -> List[EcgRecorder]: ...
+    def attach_region_recorder(self, recorder: RegionRecorder) -> None: ...
+    def remove_region_recorder(self, recorder: RegionRecorder) -> None: ...
+    def get_region_recorders(self) -> List[RegionRecorder]: ...
+    def attach_event_log(self, log: EventLog) -> None: ...
+    def remove_event_log(self, log: EventLog) -> None: ...
+    def get_event_logs(self) -> List[EventLog]: ...
+    def get_states(self) -> np.ndarray: ...
+    def state_view(self) -> StateView: ...
+    def frame_view(self, idx: int) -> np.ndarray: ...
+    def get_positions(self) -> np.ndarray: ...
+    def activation_times(self) -> Tuple[np.ndarray, np.ndarray]: ...
+    def activation_map(self) -> np.ndarray: ...
+    def cycle_length_map(self) -> np.ndarray: ...
     def serialize_automaton(self) -> Dict: ...
     def get_frame_counter(self) -> int: ...
+    def distinct_configs(self) -> List[Dict]: ...
+    def to_blob(self, arg_ids: Dict[tuple, int]) -> np.ndarray: ...
 
 
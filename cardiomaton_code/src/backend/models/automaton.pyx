@@ -1,22 +1,27 @@
 from libc.stdio cimport printf
-from libc.stdlib cimport malloc, realloc, free
+from libc.stdlib cimport malloc, calloc, realloc, free
 from libc.string cimport memset, memcpy
-from libc.stdint cimport uintptr_t
+from libc.stdint cimport uintptr_t, uint8_t, uint16_t, uint32_t, int16_t, int32_t, int64_t
 from cython.parallel cimport prange
 
 
-from src.backend.structs.c_cell cimport CCell, create_c_cell, add_cell_charges, free_c_cell, allocate_neighbors, cell_to_dict, create_mimic_cell, recreate_cell_from_mimic
-from src.backend.enums.cell_state cimport CellStateC,state_to_cenum, state_to_pyenum
+from src.backend.structs.c_cell cimport CCell, create_c_cell, set_shared_charges, free_c_cell, allocate_neighbors, cell_to_dict, create_mimic_cell, recreate_cell_from_mimic, copy_cell_state
+from src.backend.enums.cell_state cimport CellStateC,state_to_cenum, state_to_pyenum, cell_state_name
 from src.backend.enums.cell_type cimport type_to_cenum, type_to_pyenum
 from src.backend.enums.cell_type cimport CellTypeC
 from src.backend.utils.charge_update cimport update_charge
 from src.backend.utils.draw_functions cimport draw_from_state, draw_from_charge, DrawFunc, draw_triangle_soft
-from src.backend.structs.cell_wrapper cimport CellWrapper
 from src.backend.structs.c_triangle cimport CTriangle, find_smoothing_triangles
 from src.backend.structs.cell_snapshot cimport CellSnapshot
-from src.backend.models.frame_recorder cimport FrameRecorder
+from src.backend.models.frame_recorder cimport FrameRecorder, snapshot_array
+from src.backend.models.probe_recorder cimport ProbeRecorder
+from src.backend.models.ecg_recorder cimport EcgRecorder
+from src.backend.models.region_recorder cimport RegionRecorder, N_REGIONS, N_STATES
+from src.backend.models.event_log cimport EventLog
 
 
+import copy
+import sys
 import numpy as np
 from dataclasses import dataclass
 from typing import Tuple, Dict
@@ -25,6 +30,7 @@ from src.backend.models.cell import Cell, CellDict
 from src.backend.enums.cell_type import CellType
 from src.backend.enums.cell_state import CellState
 from src.update_strategies.charge_approx.charge_update import ChargeUpdate
+from src.database.utils.cell_utils import cell_dtype, create_config_key
 
 
 @dataclass
@@ -32,13 +38,55 @@ class CellData:
     neighbors: list[Tuple[int, int]]
     cell_data: dict[str, float]
 
+@dataclass(frozen=True)
+class CellStatic:
+    """
+    Fields of the cell that don't change during the simulation, cached per position.
+    """
+    cell_type: str
+    ccs_part: str
+    auto_polarization: bool
+
+@dataclass(frozen=True)
+class CellBatch:
+    """
+    Struct of arrays with the data of the requested cells, in the order of the positions.
+    Positions without a cell have found set to False, index -1, state and timer -1, charge NaN and type 255.
+    """
+    positions: np.ndarray
+    index: np.ndarray
+    found: np.ndarray
+    state: np.ndarray
+    charge: np.ndarray
+    timer: np.ndarray
+    type: np.ndarray
+    auto_polarization: np.ndarray
+
+@dataclass(frozen=True)
+class StateView:
+    """
+    Read-only arrays with the state of all cells, in the order of the grid. The dynamic fields are
+    views of snapshot, which aliases the memory of the automaton.
+    """
+    frame: int
+    state: np.ndarray
+    charge: np.ndarray
+    timer: np.ndarray
+    type: np.ndarray
+    positions: np.ndarray
+    snapshot: np.ndarray
+
 cdef class Automaton:
 
     def __init__(self, size: Tuple[int, int], cells: dict[Tuple[int, int], Cell], img_ptr,
-            int img_bytes, frame: int = 0, frame_time: float = 0.2):
+            int img_bytes, frame: int = 0, frame_time: float = 0.2, int buffer_size = 200, buffer_path = None):
         """
         Constructor. Assumes size is the size of the image on which the grid is projected. Uses the same values
         as the previous version, but stores as much data as possible in c containers.
+        Passing 0 as img_ptr creates the automaton without the image, nothing is drawn then.
+        buffer_size is the number of frames kept by the frame recorder. With buffer_path the frames are kept
+        in the memory mapped file under this path instead of RAM, so long histories are limited by the disk.
+        The file is overwritten and must not be shared with another automaton.
         """
         cdef int i
         cdef uintptr_t addr_val
@@ -68,11 +116,32 @@ cdef class Automaton:
         self.frame_counter = <int> frame
 
 
-        self.cell_data = dict()
-        self._generate_grid(self.grid_a, cell_list)
-        self._generate_grid(self.grid_b, cell_list)
-
-        self.frame_recorder = FrameRecorder(len(cells), 200)
+        self.charge_table_index = dict()
+        self.n_charge_tables = 0
+
+        self.config_index = <int32_t*> malloc((self.n_nodes if self.n_nodes > 0 else 1) * sizeof(int32_t))
+        if self.config_index == NULL:
+            raise MemoryError("Failed to allocate the config index")
+        self.configs = []
+        self._generate_grid(self.grid_a, cell_list, self.config_index)
+        self._generate_grid(self.grid_b, cell_list, NULL)
+
+        self.frame_recorder = FrameRecorder(len(cells), buffer_size, buffer_path)
+        self.snapshot_current = False
+        self._invalidate_static()
+        self.probes = []
+        self.ecg_recorders = []
+        self.region_recorders = []
+        self.event_logs = []
+        self.chunk_counts = <int32_t*> malloc(UPDATE_CHUNKS * N_REGIONS * N_STATES * sizeof(int32_t))
+        self.chunk_charges = <double*> malloc(UPDATE_CHUNKS * N_REGIONS * sizeof(double))
+        if self.chunk_counts == NULL or self.chunk_charges == NULL:
+            raise MemoryError("Failed to allocate the chunk buffers of the recorders")
+        self._last_activation = np.full(self.n_nodes, -1, dtype=np.int32)
+        self._prev_activation = np.full(self.n_nodes, -1, dtype=np.int32)
+        self.last_activation = self._last_activation
+        self.prev_activation = self._prev_activation
+        self.position_index = None
 
         # Img setup
         addr_val = <uintptr_t> img_ptr
@@ -107,6 +176,7 @@ cdef class Automaton:
         """
         Destructor to free the resources for grids
         """
+        cdef int i
         if self.grid_a is not NULL:
             self._dealloc_grid(self.grid_a)
             self.grid_a = NULL
@@ -115,6 +185,37 @@ cdef class Automaton:
             self.grid_b = NULL
         if self.smoothing_triangles != NULL:
             free(self.smoothing_triangles)
+        if self.config_index != NULL:
+            free(self.config_index)
+            self.config_index = NULL
+        if self.live_snapshot != NULL:
+            free(self.live_snapshot)
+            self.live_snapshot = NULL
+        if self.chunk_counts != NULL:
+            free(self.chunk_counts)
+            self.chunk_counts = NULL
+        if self.chunk_charges != NULL:
+            free(self.chunk_charges)
+            self.chunk_charges = NULL
+        if self.chunk_leads != NULL:
+            free(self.chunk_leads)
+            self.chunk_leads = NULL
+        if self.lead_weights != NULL:
+            free(self.lead_weights)
+            self.lead_weights = NULL
+        if self.modification_snapshot_grids != NULL:
+            self._clear_modifications()
+            free(self.modification_snapshot_grids)
+            self.modification_snapshot_grids = NULL
+        # Tables go last, cells in the grids and snapshots point into them
+        if self.charge_tables != NULL:
+            for i in range(self.n_charge_tables):
+                free(self.charge_tables[i])
+            free(self.charge_tables)
+            free(self.charge_table_sizes)
+            self.charge_tables = NULL
+            self.charge_table_sizes = NULL
+            self.n_charge_tables = 0
 
     cdef void _dealloc_grid(self, CCell** grid):
         """
@@ -129,6 +230,117 @@ cdef class Automaton:
                     grid[i] = NULL
             free(grid)
 
+    cdef double* _intern_charges(self, object charges, int* n_charges) except NULL:
+        """
+        Returns the pooled copy of the charges table, adding it to the pool if it's not there yet.
+        Tables are keyed by their content and never modified or freed before the automaton itself,
+        so all the cells (and modification snapshots) with the same charge function share one table.
+
+        Args:
+            charges - sequence of floats
+            n_charges int* - output, length of the table
+        """
+        cdef double[::1] values = np.ascontiguousarray(charges, dtype=np.float64)
+        cdef bytes key = values.base.tobytes() if values.shape[0] > 0 else b""
+        cdef int idx
+        cdef double* table
+
+        n_charges[0] = <int> values.shape[0]
+        idx = self.charge_table_index.get(key, -1)
+        if idx >= 0:
+            return self.charge_tables[idx]
+
+        if self.n_charge_tables % 8 == 0:
+            tables = <double**> realloc(self.charge_tables, (self.n_charge_tables + 8) * sizeof(double*))
+            if tables == NULL:
+                raise MemoryError("Failed to grow the charge table pool")
+            self.charge_tables = tables
+            sizes = <int*> realloc(self.charge_table_sizes, (self.n_charge_tables + 8) * sizeof(int))
+            if sizes == NULL:
+                raise MemoryError("Failed to grow the charge table pool")
+            self.charge_table_sizes = sizes
+
+        table = <double*> malloc((values.shape[0] if values.shape[0] > 0 else 1) * sizeof(double))
+        if table == NULL:
+            raise MemoryError("Failed to allocate the charge table")
+        if values.shape[0] > 0:
+            memcpy(table, &values[0], values.shape[0] * sizeof(double))
+
+        idx = self.n_charge_tables
+        self.charge_tables[idx] = table
+        self.charge_table_sizes[idx] = n_charges[0]
+        self.n_charge_tables += 1
+        self.charge_table_index[key] = idx
+        return table
+
+    cdef int _mark_charge_tables(self, CCell** grid, uint8_t* used) noexcept nogil:
+        """
+        Sets used[k] for every pooled table referenced by the cells of the grid.
+        Neighboring cells mostly share a table, so the last match is checked first.
+
+        Returns:
+            int - index of the last matched table, -1 when none matched
+        """
+        cdef int i, k
+        cdef int last = -1
+        cdef double* charges
+        for i in range(self.n_nodes):
+            charges = grid[i].charges
+            if grid[i].owns_charges or charges == NULL:
+                continue
+            if last >= 0 and self.charge_tables[last] == charges:
+                continue
+            for k in range(self.n_charge_tables):
+                if self.charge_tables[k] == charges:
+                    used[k] = 1
+                    last = k
+                    break
+        return last
+
+    cdef void _compact_charge_tables(self):
+        """
+        Frees the pooled charge tables no longer referenced by the grids or the undo snapshots, so the pool
+        doesn't grow with every new set of charge parameters. Kept tables don't move, only their indices change.
+        """
+        cdef int i, k, n_kept
+        cdef int n_tables = self.n_charge_tables
+        cdef uint8_t* used
+        cdef int* remap
+        if n_tables == 0:
+            return
+
+        used = <uint8_t*> calloc(n_tables, sizeof(uint8_t))
+        remap = <int*> malloc(n_tables * sizeof(int))
+        if used == NULL or remap == NULL:
+            # Compaction is only an optimization, the pool stays as it is
+            free(used)
+            free(remap)
+            return
+
+        with nogil:
+            self._mark_charge_tables(self.grid_a, used)
+            self._mark_charge_tables(self.grid_b, used)
+            for i in range(self.buf_size):
+                self._mark_charge_tables(self.modification_snapshot_grids[i], used)
+
+            n_kept = 0
+            for k in range(n_tables):
+                if used[k]:
+                    remap[k] = n_kept
+                    self.charge_tables[n_kept] = self.charge_tables[k]
+                    self.charge_table_sizes[n_kept] = self.charge_table_sizes[k]
+                    n_kept += 1
+                else:
+                    remap[k] = -1
+                    free(self.charge_tables[k])
+            self.n_charge_tables = n_kept
+
+        if n_kept != n_tables:
+            self.charge_table_index = {key: remap[idx] for key, idx in self.charge_table_index.items()
+                                       if remap[idx] >= 0}
+        free(used)
+        free(remap)
+
     cpdef dict _create_data_map(self, dict cells):
         """
         Helper method to provide the python object with the data mapping.
@@ -142,16 +354,22 @@ cdef class Automaton:
             for pos, cell in cells.items()
         }
 
-    cdef void _generate_grid(self, CCell** grid, list py_cells): 
+    cdef void _generate_grid(self, CCell** grid, list py_cells, int32_t* config_index):
         """
         Automaton grid creator. Expects the caller to allocate the required memory for the CCell** grid.
         list py_cells should contain the python list of python Cell class objects.
         For each creates CCell object and maps the data from py_cells onto it.
+        When config_index isn't NULL, it's filled with the index of the config of each cell in self.configs,
+        so only one of the two grids has to pass it.
         """
         
         cdef dict pos_to_ccell = {}
+        cdef dict tables = {} # id of the python charges list -> pooled table, skips rehashing shared lists
+        cdef dict config_ids = {} # id of the python config dict -> index in self.configs
         cdef int n = len(py_cells)
         cdef int i, j 
+        cdef int n_charges
+        cdef double* table
 
         for i in range(n):
             py_cell = py_cells[i]
@@ -183,14 +401,25 @@ cdef class Automaton:
             grid[i].can_propagate = 0
             grid[i].propagation_time_max = <int> py_cell.config.get("propagation_time_max", 5)
 
-            self.cell_data[(py_cell.pos_x, py_cell.pos_y)] = CellWrapper(<uintptr_t> grid[i],
-                                        [(nei.pos_x, nei.pos_y) for nei in py_cell.neighbors],
-                                        py_cell.config)
-            
-            if py_cell.charges is not None:
-                add_cell_charges(grid[i], np.asarray(py_cell.charges, dtype=np.float64))
-            else:
+            if config_index != NULL:
+                config = py_cell.config
+                idx = config_ids.get(id(config))
+                if idx is None:
+                    idx = len(self.configs)
+                    config_ids[id(config)] = idx
+                    self.configs.append(config)
+                config_index[i] = <int32_t> idx
+
+            if py_cell.charges is None:
                 raise RuntimeError("Attempted construction of a cell with no charge function")
+            cached = tables.get(id(py_cell.charges))
+            if cached is None:
+                table = self._intern_charges(py_cell.charges, &n_charges)
+                tables[id(py_cell.charges)] = (<uintptr_t> table, n_charges)
+            else:
+                table = <double*> (<uintptr_t> cached[0])
+                n_charges = cached[1]
+            set_shared_charges(grid[i], table, n_charges)
 
         cdef CCell* this_c
 
@@ -214,6 +443,8 @@ cdef class Automaton:
     cdef void _init_img(self):
         cdef CCell* cell
         cdef int i
+        if self.img_buffer == NULL:
+            return
         self._clear_img()
         for i in range(self.n_nodes):
             cell = self.grid_a[i]
@@ -221,6 +452,8 @@ cdef class Automaton:
             draw_from_charge(self.img_buffer, self.bytes_per_line, cell)
     
     cdef void _clear_img(self):
+        if self.img_buffer == NULL:
+            return
         cdef size_t total_bytes = self.bytes_per_line * <int>self.size[0]
         memset(self.img_buffer, 0, total_bytes)
 
@@ -237,35 +470,130 @@ cdef class Automaton:
 
         cdef CellSnapshot* snapshot = self.frame_recorder.get_next_buffer()
         self.frame_counter += 1
+        for log in self.event_logs:
+            (<EventLog>log).reserve(self.n_nodes)
 
         cdef CCell* cell
         cdef unsigned char* img_buffer = self.img_buffer
         cdef int bytes_per_line = self.bytes_per_line
         cdef int n_nodes = self.n_nodes
+        cdef int32_t frame = self.frame_counter
+        cdef int32_t* last_activation = &self.last_activation[0] if n_nodes > 0 else NULL
+        cdef int32_t* prev_activation = &self.prev_activation[0] if n_nodes > 0 else NULL
+
+        # The region aggregates and the leads are accumulated in the update loop, per chunk of the grid,
+        # and merged after it
+        cdef int chunk, start, end, region, k, first
+        cdef bint count_regions = len(self.region_recorders) > 0
+        cdef int n_leads = self._bind_leads()
+        cdef int32_t* chunk_counts = self.chunk_counts
+        cdef double* chunk_charges = self.chunk_charges
+        cdef double* chunk_leads = self.chunk_leads
+        cdef const double** lead_weights = self.lead_weights
+        cdef int32_t* counts
+        cdef double* charges
+        cdef double* leads
+        if count_regions:
+            memset(chunk_counts, 0, UPDATE_CHUNKS * N_REGIONS * N_STATES * sizeof(int32_t))
+            memset(chunk_charges, 0, UPDATE_CHUNKS * N_REGIONS * sizeof(double))
+        if n_leads > 0:
+            memset(chunk_leads, 0, UPDATE_CHUNKS * n_leads * sizeof(double))
 
         with nogil:
-            for i in prange(n_nodes, schedule='static'):
-                cell_a = self.grid_a[i]
-                cell_b = self.grid_b[i]
-                update_charge(cell_a, cell_b)
-
-                draw_function(img_buffer, bytes_per_line, cell_b)
-
-                # Inline write to the buffer
-                snapshot[i].pos_x = cell_b.pos_x
-                snapshot[i].pos_y = cell_b.pos_y
-                snapshot[i].c_state = cell_b.c_state
-                snapshot[i].charge = cell_b.charge
-                snapshot[i].timer = cell_b.timer
-                snapshot[i].can_propagate = cell_b.can_propagate
-                snapshot[i].propagation_time = cell_b.propagation_time
-                snapshot[i].propagation_count = cell_b.propagation_count
-
-            for i in prange(self.n_triangles, schedule='static'):
-                triangle = self.smoothing_triangles[i]
-                draw_triangle_soft(self.img_buffer, self.bytes_per_line, triangle)
+            for chunk in prange(UPDATE_CHUNKS, schedule='static'):
+                start = <int> ((<long long> chunk * n_nodes) / UPDATE_CHUNKS)
+                end = <int> ((<long long> (chunk + 1) * n_nodes) / UPDATE_CHUNKS)
+                counts = chunk_counts + chunk * N_REGIONS * N_STATES
+                charges = chunk_charges + chunk * N_REGIONS
+                leads = chunk_leads + chunk * n_leads
+                for i in range(start, end):
+                    cell_a = self.grid_a[i]
+                    cell_b = self.grid_b[i]
+                    update_charge(cell_a, cell_b)
+
+                    if cell_b.c_state == CellStateC.RAPID_DEPOLARIZATION and cell_a.c_state != CellStateC.RAPID_DEPOLARIZATION:
+                        prev_activation[i] = last_activation[i]
+                        last_activation[i] = frame
+
+                    if img_buffer != NULL:
+                        draw_function(img_buffer, bytes_per_line, cell_b)
+
+                    # Inline write to the buffer
+                    snapshot[i].pos_x = cell_b.pos_x
+                    snapshot[i].pos_y = cell_b.pos_y
+                    snapshot[i].c_state = cell_b.c_state
+                    snapshot[i].charge = cell_b.charge
+                    snapshot[i].timer = cell_b.timer
+                    snapshot[i].can_propagate = cell_b.can_propagate
+                    snapshot[i].propagation_time = cell_b.propagation_time
+                    snapshot[i].propagation_count = cell_b.propagation_count
+
+                    if count_regions:
+                        region = <int> cell_b.c_type
+                        counts[region * N_STATES + <int> cell_b.c_state] += 1
+                        charges[region] += cell_b.charge
+                    for k in range(n_leads):
+                        leads[k] += lead_weights[k][i] * cell_b.charge
+
+            if img_buffer != NULL:
+                for i in prange(self.n_triangles, schedule='static'):
+                    triangle = self.smoothing_triangles[i]
+                    draw_triangle_soft(self.img_buffer, self.bytes_per_line, triangle)
+
+        for probe in self.probes:
+            with nogil:
+                (<ProbeRecorder>probe).record(self.grid_b, self.frame_counter)
+        first = 0
+        for recorder in self.ecg_recorders:
+            with nogil:
+                (<EcgRecorder>recorder).store(chunk_leads + first, n_leads, UPDATE_CHUNKS, self.frame_counter)
+            first += (<EcgRecorder>recorder).n_leads
+        for recorder in self.region_recorders:
+            with nogil:
+                (<RegionRecorder>recorder).store(chunk_counts, chunk_charges, UPDATE_CHUNKS, self.frame_counter)
+        for log in self.event_logs:
+            with nogil:
+                (<EventLog>log).record(self.grid_b, self.n_nodes, self.frame_counter)
+
         self.grid_a = self.grid_b
         self.grid_b = tmp
+        self.snapshot_current = True
+
+    cdef int _bind_leads(self) except -1:
+        """
+        Points lead_weights at the weights of the leads of all the ECG recorders, in the order of the recorders,
+        and makes room for their chunk sums. The weights are bound in every step, set_weights replaces them.
+
+        Returns:
+            int - number of the leads
+        Throws:
+            MemoryError - when the buffers can't be grown
+        """
+        cdef int n_leads = 0
+        cdef int k
+        cdef EcgRecorder ecg
+        cdef double* leads
+        cdef const double** weights
+        for recorder in self.ecg_recorders:
+            n_leads += (<EcgRecorder>recorder).n_leads
+        if n_leads > self.leads_capacity:
+            leads = <double*> realloc(self.chunk_leads, UPDATE_CHUNKS * n_leads * sizeof(double))
+            if leads == NULL:
+                raise MemoryError("Failed to allocate the chunk buffer of the leads")
+            self.chunk_leads = leads
+            weights = <const double**> realloc(self.lead_weights, n_leads * sizeof(double*))
+            if weights == NULL:
+                raise MemoryError("Failed to allocate the lead weights")
+            self.lead_weights = weights
+            self.leads_capacity = n_leads
+
+        n_leads = 0
+        for recorder in self.ecg_recorders:
+            ecg = <EcgRecorder> recorder
+            for k in range(ecg.n_leads):
+                self.lead_weights[n_leads] = &ecg.weights[k, 0]
+                n_leads += 1
+        return n_leads
 
     cpdef void update_grid(self, object show_charge):
         """
@@ -278,6 +606,20 @@ cdef class Automaton:
             func = draw_from_state
         self._update_grid_nogil(func)
 
+    cpdef int advance(self, int n_steps, bint show_charge=False):
+        """
+        Runs n_steps updates in one call, for the headless runs that don't look at the frames in between.
+        Recorders, probes and logs attached to the automaton still record every step.
+
+        Returns:
+            int - frame counter after the last step
+        """
+        cdef int step
+        cdef DrawFunc func = draw_from_charge if show_charge else draw_from_state
+        for step in range(n_steps):
+            self._update_grid_nogil(func)
+        return self.frame_counter
+
     cpdef int render_frame(self, int idx, bint if_charged, bint drop_newer):
         cdef int i
         cdef int n_nodes = self.n_nodes
@@ -299,7 +641,8 @@ cdef class Automaton:
                 cell.propagation_time = snapshots[i].propagation_time
                 cell.propagation_count = snapshots[i].propagation_count
 
-                func(self.img_buffer, self.bytes_per_line, cell)
+                if self.img_buffer != NULL:
+                    func(self.img_buffer, self.bytes_per_line, cell)
 
                 # Fix idea by Albert
                 cell = self.grid_b[i]
@@ -309,10 +652,12 @@ cdef class Automaton:
                 cell.can_propagate = snapshots[i].can_propagate
                 cell.propagation_count = snapshots[i].propagation_count
                 cell.propagation_time = snapshots[i].propagation_time
-            for i in prange(self.n_triangles, schedule='static'):
-                triangle = self.smoothing_triangles[i]
-                draw_triangle_soft(self.img_buffer, self.bytes_per_line, triangle)
+            if self.img_buffer != NULL:
+                for i in prange(self.n_triangles, schedule='static'):
+                    triangle = self.smoothing_triangles[i]
+                    draw_triangle_soft(self.img_buffer, self.bytes_per_line, triangle)
 
+        self.snapshot_current = False
         if drop_newer:
             self.frame_recorder.remove_newer(idx)
             self.frame_recorder.remove_older(idx)
@@ -354,6 +699,9 @@ cdef class Automaton:
             if (x, y) in coords:
                 cell.c_state = c_state_val
 
+        self.snapshot_current = False
+        self._log_events()
+
     cpdef void modify_charge_data(self, set coords, dict atrial_charge_parameters, dict pacemaker_charge_parameters,
     dict purkinje_charge_parameters):
         """
@@ -365,6 +713,8 @@ cdef class Automaton:
         cdef dict charge_params
         cdef dict cell_config
         cdef dict cell_data
+        cdef int n_charges
+        cdef double* table
 
         for i in range(self.n_nodes):
             cell = self.grid_a[i]
@@ -373,11 +723,7 @@ cdef class Automaton:
             if (x, y) not in coords:
                 continue
 
-            wrapper = self.cell_data.get((x, y), None)
-            if wrapper is None:
-                continue
-
-            config = wrapper.cell_data
+            config = self.configs[self.config_index[i]]
 
             if cell.c_type in {CellTypeC.HIS_LEFT, CellTypeC.HIS_RIGHT, CellTypeC.HIS_BUNDLE}:
                 # PURKINJE
@@ -398,9 +744,11 @@ cdef class Automaton:
             cell.ref_threshold = <double> ref_threshold
 
             if charges is not None:
-                add_cell_charges(cell, np.asarray(charges, dtype=np.float64))
+                table = self._intern_charges(charges, &n_charges)
+                set_shared_charges(cell, table, n_charges)
             else:
                 raise RuntimeError("Attempted construction of a cell with no charge function")
+        self._compact_charge_tables()
 
 
     cpdef void modify_propagation_time(self, set coords, int propagation_time_value):
@@ -417,6 +765,7 @@ cdef class Automaton:
 
             if (x, y) in coords:
                 cell.propagation_time = propagation_time_value
+        self.snapshot_current = False
 
     cpdef void commit_current_automaton(self):
         """
@@ -424,6 +773,7 @@ cdef class Automaton:
         It saves current automaton by copying CCell structures, without neighbours, just parameters.
         """
         cdef CCell** snap
+        cdef CCell*** grids
         cdef int i
 
         snap = <CCell**> malloc(self.n_nodes * sizeof(CCell*))
@@ -435,18 +785,19 @@ cdef class Automaton:
             if snap[i] == NULL:
                 while i > 0:
                     i -= 1
-                    free(snap[i].charges)
-                    free(snap[i])
+                    free_c_cell(snap[i])
                 free(snap)
                 raise MemoryError("Failed to create mimic cell")
 
         if self.buf_size % 8 == 0:
-            self.modification_snapshot_grids = <CCell***> realloc(
+            grids = <CCell***> realloc(
                 self.modification_snapshot_grids,
                 (self.buf_size + 8) * sizeof(CCell**)
             )
-            if self.modification_snapshot_grids == NULL:
+            if grids == NULL:
+                self._dealloc_grid(snap)
                 raise MemoryError("Failed to realloc snapshot buffer")
+            self.modification_snapshot_grids = grids
 
         self.modification_snapshot_grids[self.buf_size] = snap
         self.buf_size += 1
@@ -472,7 +823,419 @@ cdef class Automaton:
         self._dealloc_grid(snap)
 
         self.modification_snapshot_grids[self.buf_size] = NULL
+        self._shrink_modifications()
+        self._compact_charge_tables()
         self.frame_recorder.clear_all()
+        self.snapshot_current = False
+        self._invalidate_static()
+        self._log_events()
+
+    cdef void _clear_modifications(self):
+        """
+        Frees all the snapshots stored in the modification buffer.
+        """
+        while self.buf_size > 0:
+            self.buf_size -= 1
+            self._dealloc_grid(self.modification_snapshot_grids[self.buf_size])
+            self.modification_snapshot_grids[self.buf_size] = NULL
+        self._shrink_modifications()
+
+    cdef int _modification_capacity(self):
+        """
+        Number of slots in modification_snapshot_grids. It grows by 8 in commit_current_automaton
+        and _shrink_modifications keeps it at the smallest multiple of 8 that fits buf_size.
+        """
+        return 8 if self.buf_size <= 8 else (self.buf_size + 7) // 8 * 8
+
+    cdef void _shrink_modifications(self):
+        """
+        Gives back the slots of the modification buffer freed by undo, once a whole block of 8 is unused.
+        Failed realloc keeps the old, larger buffer.
+        """
+        cdef CCell*** grids
+        if self.modification_snapshot_grids == NULL or self.buf_size % 8 != 0:
+            return
+        grids = <CCell***> realloc(self.modification_snapshot_grids, self._modification_capacity() * sizeof(CCell**))
+        if grids != NULL:
+            self.modification_snapshot_grids = grids
+
+    cdef bint _same_topology(self, Automaton other):
+        """
+        Checks if both automatons have the same cells, in the same order and with the same neighbors.
+        """
+        cdef int i, j
+        cdef CCell* cell
+        cdef CCell* other_cell
+        cdef bint same = True
+
+        if self.n_nodes != other.n_nodes:
+            return False
+
+        with nogil:
+            for i in range(self.n_nodes):
+                cell = self.grid_a[i]
+                other_cell = other.grid_a[i]
+                if (cell.pos_x != other_cell.pos_x or cell.pos_y != other_cell.pos_y
+                        or cell.n_neighbors != other_cell.n_neighbors):
+                    same = False
+                    break
+                for j in range(cell.n_neighbors):
+                    if (cell.neighbors[j] == NULL) != (other_cell.neighbors[j] == NULL):
+                        same = False
+                        break
+                    if cell.neighbors[j] != NULL and (
+                            cell.neighbors[j].pos_x != other_cell.neighbors[j].pos_x
+                            or cell.neighbors[j].pos_y != other_cell.neighbors[j].pos_y):
+                        same = False
+                        break
+                if not same:
+                    break
+        return same
+
+    cpdef void reset_from(self, Automaton template):
+        """
+        Restores the state of the automaton from the template, without rebuilding the grids. Cell structs
+        are copied into the existing grids, keeping the neighbor pointers, so both automatons must share the
+        same topology (for example two presets built on the same mesh).
+        Charge tables of the template are interned into the pool of this automaton, so the template can
+        be freed afterwards.
+        Clears the recorded frames and the modification history. Frame time is kept.
+
+        Args:
+            template Automaton - source automaton, it's not modified
+
+        Throws:
+            ValueError - when the topologies differ
+            MemoryError - on the failed allocation of the charge tables
+        """
+        cdef int i, k
+        cdef int n_charges
+        cdef int n_tables = template.n_charge_tables
+        cdef double** mapped
+        cdef CCell* src
+
+        if not self._same_topology(template):
+            raise ValueError("Template automaton has a different topology")
+
+        mapped = <double**> malloc((n_tables if n_tables > 0 else 1) * sizeof(double*))
+        if mapped == NULL:
+            raise MemoryError("Failed to allocate the charge table mapping")
+        try:
+            for k in range(n_tables):
+                mapped[k] = self._intern_charges(
+                    np.asarray(<double[:template.charge_table_sizes[k]]> template.charge_tables[k])
+                    if template.charge_table_sizes[k] > 0 else (), &n_charges)
+
+            with nogil:
+                for i in range(self.n_nodes):
+                    src = template.grid_a[i]
+                    copy_cell_state(self.grid_a[i], src)
+                    for k in range(n_tables):
+                        if src.charges == template.charge_tables[k]:
+                            set_shared_charges(self.grid_a[i], mapped[k], src.n_charges)
+                            break
+                    src = template.grid_b[i]
+                    copy_cell_state(self.grid_b[i], src)
+                    for k in range(n_tables):
+                        if src.charges == template.charge_tables[k]:
+                            set_shared_charges(self.grid_b[i], mapped[k], src.n_charges)
+                            break
+        finally:
+            free(mapped)
+
+        # Configs are copied so that modifications of this automaton never reach the template.
+        # The index is copied as is, so the configs stay shared between cells the same way as in the template.
+        self.configs = copy.deepcopy(template.configs)
+        memcpy(self.config_index, template.config_index, self.n_nodes * sizeof(int32_t))
+
+        self.size = template.size
+        self.frame_counter = template.frame_counter
+        self.frame_recorder.clear_all()
+        self.snapshot_current = False
+        self._invalidate_static()
+        for probe in self.probes:
+            (<ProbeRecorder>probe).clear()
+        for recorder in self.ecg_recorders:
+            (<EcgRecorder>recorder).clear()
+        for recorder in self.region_recorders:
+            (<RegionRecorder>recorder).clear()
+        for log in self.event_logs:
+            (<EventLog>log).start(self.get_states(), self.frame_counter)
+        self._last_activation.fill(-1)
+        self._prev_activation.fill(-1)
+        self._clear_modifications()
+        self._compact_charge_tables()
+        self._init_img()
+
+    cpdef ProbeRecorder add_probe(self, object positions, int capacity=500):
+        """
+        Creates a probe recording the charge and the state of the given cells after every step.
+        Cheaper than polling get_cell_data every frame, the values are copied inside the step.
+
+        Args:
+            positions iterable - (x, y) positions of the recorded cells
+            capacity int - number of frames kept by the probe
+
+        Returns:
+            ProbeRecorder - the attached probe
+
+        Throws:
+            ValueError - when any of the positions is not a cell of the automaton
+        """
+        cdef ProbeRecorder probe = ProbeRecorder(positions, capacity)
+        self.attach_probe(probe)
+        return probe
+
+    cpdef void attach_probe(self, ProbeRecorder probe):
+        """
+        Attaches an existing probe, resolving its positions in this automaton. Used to move the probes
+        to a rebuilt automaton, the recorded frames are kept.
+
+        Throws:
+            ValueError - when any of the positions is not a cell of the automaton
+        """
+        cdef dict index = self._get_position_index()
+        cdef int i
+        cdef int* indices = <int*> malloc(len(probe.positions) * sizeof(int))
+        if indices == NULL:
+            raise MemoryError("Failed to allocate the probe indices")
+        try:
+            for i, pos in enumerate(probe.positions):
+                if pos not in index:
+                    raise ValueError(f"No cell at position {pos}")
+                indices[i] = <int> index[pos]
+            probe.bind(indices)
+        finally:
+            free(indices)
+        if probe not in self.probes:
+            self.probes.append(probe)
+
+    cpdef void remove_probe(self, ProbeRecorder probe):
+        if probe in self.probes:
+            self.probes.remove(probe)
+
+    cpdef list get_probes(self):
+        return list(self.probes)
+
+    cpdef void attach_ecg(self, EcgRecorder recorder):
+        """
+        Attaches the pseudo-ECG recorder, its leads are accumulated in the update loop of every step.
+
+        Throws:
+            ValueError - when the weights don't match the number of cells
+        """
+        if recorder.n_cells != self.n_nodes:
+            raise ValueError(f"ECG weights cover {recorder.n_cells} cells, the automaton has {self.n_nodes}")
+        if recorder not in self.ecg_recorders:
+            self.ecg_recorders.append(recorder)
+
+    cpdef void remove_ecg(self, EcgRecorder recorder):
+        if recorder in self.ecg_recorders:
+            self.ecg_recorders.remove(recorder)
+
+    cpdef list get_ecg_recorders(self):
+        return list(self.ecg_recorders)
+
+    cpdef void attach_region_recorder(self, RegionRecorder recorder):
+        """
+        Attaches the recorder of the per region aggregates, accumulated in the update loop of every step.
+        """
+        if recorder not in self.region_recorders:
+            self.region_recorders.append(recorder)
+
+    cpdef void remove_region_recorder(self, RegionRecorder recorder):
+        if recorder in self.region_recorders:
+            self.region_recorders.remove(recorder)
+
+    cpdef list get_region_recorders(self):
+        return list(self.region_recorders)
+
+    cpdef void attach_event_log(self, EventLog log):
+        """
+        Attaches the log of the state transitions, starting it from the current states of the cells.
+        """
+        log.start(self.get_states(), self.frame_counter)
+        if log not in self.event_logs:
+            self.event_logs.append(log)
+
+    cpdef void remove_event_log(self, EventLog log):
+        if log in self.event_logs:
+            self.event_logs.remove(log)
+
+    cpdef list get_event_logs(self):
+        return list(self.event_logs)
+
+    cdef void _log_events(self):
+        """
+        Logs the state changes made outside of the step, for example by the cell modifications.
+        """
+        for log in self.event_logs:
+            (<EventLog>log).reserve(self.n_nodes)
+            (<EventLog>log).record(self.grid_a, self.n_nodes, self.frame_counter)
+
+    cpdef object get_states(self):
+        """
+        Returns the states of the cells as the uint8 array, in the order of the grid.
+        """
+        cdef int i
+        cdef uint8_t[::1] view
+        states = np.empty(self.n_nodes, dtype=np.uint8)
+        view = states
+        for i in range(self.n_nodes):
+            view[i] = <uint8_t> self.grid_a[i].c_state
+        return states
+
+    cpdef object state_view(self):
+        """
+        Returns the StateView of the current state. When the state wasn't changed since the last step,
+        the arrays alias the newest frame of the frame recorder, otherwise the state is first copied into
+        the buffer of the automaton in a single C pass. In both cases no python objects are created per cell.
+        The arrays are overwritten by the following steps (and calls), copy them to keep the values.
+        """
+        cdef int i
+        cdef CCell* cell
+        cdef CellSnapshot* snapshots = NULL
+
+        if self.snapshot_current:
+            snapshots = self.frame_recorder.get_buffer(-1)
+        if snapshots == NULL:
+            if self.live_snapshot == NULL:
+                self.live_snapshot = <CellSnapshot*> malloc((self.n_nodes if self.n_nodes > 0 else 1) * sizeof(CellSnapshot))
+                if self.live_snapshot == NULL:
+                    raise MemoryError("Failed to allocate the state snapshot")
+            snapshots = self.live_snapshot
+            with nogil:
+                for i in range(self.n_nodes):
+                    cell = self.grid_a[i]
+                    snapshots[i].pos_x = cell.pos_x
+                    snapshots[i].pos_y = cell.pos_y
+                    snapshots[i].c_state = cell.c_state
+                    snapshots[i].charge = cell.charge
+                    snapshots[i].timer = cell.timer
+                    snapshots[i].can_propagate = cell.can_propagate
+                    snapshots[i].propagation_time = cell.propagation_time
+                    snapshots[i].propagation_count = cell.propagation_count
+
+        types, positions, _ = self._static_arrays()
+        snapshot = snapshot_array(self, snapshots, self.n_nodes)
+        return StateView(
+            frame=self.frame_counter,
+            state=snapshot["c_state"],
+            charge=snapshot["charge"],
+            timer=snapshot["timer"],
+            type=types,
+            positions=positions,
+            snapshot=snapshot,
+        )
+
+    cpdef object frame_view(self, int idx):
+        """
+        Returns the recorded frame as the read-only structured array aliasing the frame recorder,
+        see FrameRecorder.frame_view.
+        """
+        return self.frame_recorder.frame_view(idx)
+
+    cpdef object get_positions(self):
+        """
+        Returns the (n_cells, 2) array with the positions of the cells, in the order of the grid.
+        """
+        cdef int i
+        cdef int32_t[:, ::1] view
+        positions = np.empty((self.n_nodes, 2), dtype=np.int32)
+        view = positions
+        for i in range(self.n_nodes):
+            view[i, 0] = self.grid_a[i].pos_x
+            view[i, 1] = self.grid_a[i].pos_y
+        return positions
+
+    cpdef object activation_times(self):
+        """
+        Returns (last, previous) activation frames of the cells, in the order of the grid. Activation is the
+        transition into RAPID_DEPOLARIZATION, -1 marks the cells without one. The arrays are read-only views,
+        updated by the following steps.
+        """
+        last = self._last_activation.view()
+        prev = self._prev_activation.view()
+        last.flags.writeable = False
+        prev.flags.writeable = False
+        return last, prev
+
+    cpdef object activation_map(self):
+        """
+        Returns the frame of the last activation of every cell as the array of the automaton size,
+        indexed by the cell positions. -1 where there's no cell or it wasn't activated yet.
+        """
+        return self._to_dense(self._last_activation)
+
+    cpdef object cycle_length_map(self):
+        """
+        Returns the number of frames between the last two activations of every cell as the array of the
+        automaton size, indexed by the cell positions. -1 where there's no cell or less than two activations.
+        """
+        cycle = np.where(self._prev_activation >= 0, self._last_activation - self._prev_activation, -1)
+        return self._to_dense(cycle.astype(np.int32))
+
+    cdef object _to_dense(self, object values):
+        positions = self.get_positions()
+        dense = np.full(self.size, -1, dtype=np.int32)
+        dense[positions[:, 0], positions[:, 1]] = values
+        return dense
+
+    cdef void _drop_activations_after(self, int frame):
+        """
+        Forgets the activations newer than the frame, used when the simulation goes back in time.
+        """
+        cdef int i
+        for i in range(self.n_nodes):
+            if self.prev_activation[i] > frame:
+                self.prev_activation[i] = -1
+            if self.last_activation[i] > frame:
+                self.last_activation[i] = self.prev_activation[i]
+                self.prev_activation[i] = -1
+
+    cdef tuple _static_arrays(self):
+        """
+        Returns the read-only (types, positions, auto_polarization) arrays of the cells, in the order of the grid.
+        """
+        cdef int i
+        if self.static_view is None:
+            types = np.empty(self.n_nodes, dtype=np.uint8)
+            auto_polarization = np.empty(self.n_nodes, dtype=bool)
+            for i in range(self.n_nodes):
+                types[i] = <uint8_t> self.grid_a[i].c_type
+                auto_polarization[i] = self.grid_a[i].self_polarization != 0
+            positions = self.get_positions()
+            for array in (types, positions, auto_polarization):
+                array.flags.writeable = False
+            self.static_view = (types, positions, auto_polarization)
+        return self.static_view
+
+    cdef object _get_index_grid(self):
+        """
+        Returns the dense array mapping the positions to the grid indices, -1 where there's no cell.
+        """
+        if self.index_grid is None:
+            positions = self.get_positions()
+            shape = np.maximum(np.asarray(self.size, dtype=np.int64),
+                               positions.max(axis=0) + 1 if self.n_nodes > 0 else 0)
+            index_grid = np.full(tuple(shape), -1, dtype=np.int64)
+            index_grid[positions[:, 0], positions[:, 1]] = np.arange(self.n_nodes)
+            index_grid.flags.writeable = False
+            self.index_grid = index_grid
+        return self.index_grid
+
+    cdef void _invalidate_static(self):
+        self.static_view = None
+        self.static_cells = {}
+
+    cdef dict _get_position_index(self):
+        """
+        Maps the positions to the indices in the grids, the order of the cells in both grids is the same.
+        """
+        cdef int i
+        if self.position_index is None:
+            self.position_index = {(self.grid_a[i].pos_x, self.grid_a[i].pos_y): i for i in range(self.n_nodes)}
+        return self.position_index
 
     """
     Set of getters and setters for the python API
@@ -489,33 +1252,241 @@ cdef class Automaton:
     cpdef void set_frame_counter(self, int idx):
         self.frame_recorder.remove_newer(idx)
         self.frame_counter += idx
+        self._drop_activations_after(self.frame_counter)
+        self.snapshot_current = False
+        if self.event_logs:
+            states = self.get_states()
+            for log in self.event_logs:
+                (<EventLog>log).rewind(states, self.frame_counter)
 
     cpdef int get_frame_counter(self):
         return self.frame_counter
 
     cpdef dict get_cell_data(self, tuple position):
-        data = self.cell_data.get(position, None)
-        if data is not None:
-            return data.get_cell_dict()
-        return None
+        """
+        Returns the CellDict of the cell under the position, None if there's no cell.
+        Static fields come from the cache, the dynamic ones are read from the current grid.
+        """
+        index = self._get_position_index().get(position, None)
+        if index is None:
+            return None
+        static = self.get_cell_static(position)
+        cdef CCell* cell = self.grid_a[<int> index]
+        return CellDict(
+            position=position,
+            state_name=cell_state_name(cell.c_state),
+            state_value=cell.c_state + 1,
+            charge=float(cell.charge),
+            ccs_part=static.ccs_part,
+            cell_type=static.cell_type,
+            auto_polarization=static.auto_polarization
+        )
+
+    cpdef object get_cell_static(self, tuple position):
+        """
+        Returns the cached CellStatic of the cell under the position, None if there's no cell.
+        """
+        static = self.static_cells.get(position, None)
+        if static is not None:
+            return static
+        index = self._get_position_index().get(position, None)
+        if index is None:
+            return None
+        cdef CCell* cell = self.grid_a[<int> index]
+        py_type = type_to_pyenum(cell.c_type)
+        static = CellStatic(cell_type=py_type.name, ccs_part=py_type.value,
+                            auto_polarization=cell.self_polarization != 0)
+        self.static_cells[position] = static
+        return static
+
+    cpdef dict get_cell_config(self, tuple position):
+        """
+        Returns the config dict of the cell under the position, None if there's no cell.
+        The dict is shared by all cells with the same config.
+        """
+        index = self._get_position_index().get(position, None)
+        if index is None:
+            return None
+        return self.configs[self.config_index[<int> index]]
+
+    cpdef list get_neighbors(self, tuple position):
+        """
+        Returns the positions of the neighbors of the cell under the position, None if there's no cell.
+        """
+        cdef int j
+        index = self._get_position_index().get(position, None)
+        if index is None:
+            return None
+        cdef CCell* cell = self.grid_a[<int> index]
+        return [(cell.neighbors[j].pos_x, cell.neighbors[j].pos_y)
+                for j in range(cell.n_neighbors) if cell.neighbors[j] != NULL]
+
+    cpdef object get_cells(self, object positions):
+        """
+        Returns the CellBatch with the data of all cells under the positions in one call.
+
+        Args:
+            positions - (n, 2) array or a sequence of (x, y) positions
+        """
+        cdef int k, idx
+        cdef int n
+        cdef CCell* cell
+        cdef int64_t[::1] index_view
+        cdef int32_t[::1] state_view
+        cdef double[::1] charge_view
+        cdef int32_t[::1] timer_view
+
+        requested = np.asarray(positions, dtype=np.int64).reshape(-1, 2)
+        n = <int> requested.shape[0]
+        index_grid = self._get_index_grid()
+        rows, cols = requested[:, 0], requested[:, 1]
+        inside = (rows >= 0) & (rows < index_grid.shape[0]) & (cols >= 0) & (cols < index_grid.shape[1])
+        index = np.full(n, -1, dtype=np.int64)
+        index[inside] = index_grid[rows[inside], cols[inside]]
+
+        state = np.full(n, -1, dtype=np.int32)
+        charge = np.full(n, np.nan, dtype=np.float64)
+        timer = np.full(n, -1, dtype=np.int32)
+        index_view = index
+        state_view = state
+        charge_view = charge
+        timer_view = timer
+        with nogil:
+            for k in range(n):
+                idx = <int> index_view[k]
+                if idx < 0:
+                    continue
+                cell = self.grid_a[idx]
+                state_view[k] = <int32_t> cell.c_state
+                charge_view[k] = cell.charge
+                timer_view[k] = cell.timer
+
+        types, _, auto_polarization = self._static_arrays()
+        found = index >= 0
+        safe_index = np.where(found, index, 0)
+        return CellBatch(
+            positions=requested,
+            index=index,
+            found=found,
+            state=state,
+            charge=charge,
+            timer=timer,
+            type=np.where(found, types[safe_index], 255).astype(np.uint8),
+            auto_polarization=found & auto_polarization[safe_index],
+        )
 
     cpdef int get_buffer_size(self):
         return self.frame_recorder.get_count()
 
+    cpdef dict memory_report(self):
+        """
+        Returns the number of bytes held by each part of the automaton. The C allocations are counted
+        from the struct sizes, without the allocator overhead; python_caches is a shallow sys.getsizeof estimate
+        of the configs and the lazily built lookups.
+
+        Keys:
+            grids - both CCell grids with their pointer arrays
+            neighbors - neighbor pointer arrays of both grids
+            charge_tables - pooled charge tables and the charges owned by single cells
+            smoothing_triangles
+            frame_recorder - ring of the recorded frames, only its index when the frames are memory mapped
+            undo_snapshots - snapshots saved by commit_current_automaton, with the slots of the buffer
+            live_snapshot - gather buffer of state_view
+            activations - last and previous activation frames
+            config_index
+            recorders - probes, ECG and region recorders, event logs
+            python_caches
+            total - sum of the above
+            frame_file - size of the memory mapped frames, not counted in total since the OS pages them in and out
+        """
+        cdef int i, k
+        cdef CCell* cell
+        cdef Py_ssize_t neighbors = 0
+        cdef Py_ssize_t owned_charges = 0
+        cdef Py_ssize_t snapshot_bytes = 0
+        cdef Py_ssize_t cell_bytes = sizeof(CCell*) + sizeof(CCell)
+        cdef Py_ssize_t tables = self.n_charge_tables * (sizeof(double*) + sizeof(int))
+
+        with nogil:
+            for i in range(self.n_nodes):
+                cell = self.grid_a[i]
+                neighbors += cell.n_neighbors * sizeof(CCell*)
+                if cell.owns_charges and cell.charges != NULL:
+                    owned_charges += cell.n_charges * sizeof(double)
+                cell = self.grid_b[i]
+                neighbors += cell.n_neighbors * sizeof(CCell*)
+                if cell.owns_charges and cell.charges != NULL:
+                    owned_charges += cell.n_charges * sizeof(double)
+            for k in range(self.n_charge_tables):
+                tables += self.charge_table_sizes[k] * sizeof(double)
+            for k in range(self.buf_size):
+                snapshot_bytes += self.n_nodes * cell_bytes
+                for i in range(self.n_nodes):
+                    cell = self.modification_snapshot_grids[k][i]
+                    if cell.owns_charges and cell.charges != NULL:
+                        snapshot_bytes += cell.n_charges * sizeof(double)
+
+        recorders = (UPDATE_CHUNKS * N_REGIONS * (N_STATES * sizeof(int32_t) + sizeof(double))
+                     + self.leads_capacity * (UPDATE_CHUNKS * sizeof(double) + sizeof(double*)))
+        for probe in self.probes:
+            recorders += ((<ProbeRecorder>probe)._charges.nbytes + (<ProbeRecorder>probe)._states.nbytes
+                          + (<ProbeRecorder>probe)._frames.nbytes + (<ProbeRecorder>probe).n_cells * sizeof(int))
+        for recorder in self.ecg_recorders:
+            recorders += ((<EcgRecorder>recorder)._weights.nbytes + (<EcgRecorder>recorder)._values.nbytes
+                          + (<EcgRecorder>recorder)._frames.nbytes)
+        for recorder in self.region_recorders:
+            recorders += ((<RegionRecorder>recorder)._counts.nbytes + (<RegionRecorder>recorder)._mean_charges.nbytes
+                          + (<RegionRecorder>recorder)._frames.nbytes)
+        for log in self.event_logs:
+            recorders += ((<EventLog>log)._events.nbytes + (<EventLog>log)._last_states.nbytes
+                          + (<EventLog>log)._base_states.nbytes)
+
+        python_caches = sys.getsizeof(self.configs)
+        for config in self.configs:
+            python_caches += sys.getsizeof(config)
+        if self.position_index is not None:
+            python_caches += sys.getsizeof(self.position_index) + self.n_nodes * (sys.getsizeof((0, 0)) + 2 * sys.getsizeof(1))
+        if self.index_grid is not None:
+            python_caches += self.index_grid.nbytes
+        python_caches += sys.getsizeof(self.static_cells)
+
+        mapped = self.frame_recorder.mapping is not None
+        frame_bytes = <Py_ssize_t> self.frame_recorder.buff_size * self.frame_recorder.grid_size * sizeof(CellSnapshot)
+        report = {
+            "grids": 2 * self.n_nodes * cell_bytes,
+            "neighbors": neighbors,
+            "charge_tables": tables + owned_charges,
+            "smoothing_triangles": self.n_triangles * sizeof(CTriangle),
+            "frame_recorder": self.frame_recorder.buff_size * sizeof(CellSnapshot*) + (
+                0 if mapped else frame_bytes),
+            "undo_snapshots": snapshot_bytes + self._modification_capacity() * sizeof(CCell**),
+            "live_snapshot": self.n_nodes * sizeof(CellSnapshot) if self.live_snapshot != NULL else 0,
+            "activations": self._last_activation.nbytes + self._prev_activation.nbytes,
+            "config_index": self.n_nodes * sizeof(int32_t),
+            "recorders": recorders,
+            "python_caches": python_caches,
+        }
+        total = 0
+        for value in report.values():
+            total += value
+        report["total"] = total
+        report["frame_file"] = frame_bytes if mapped else 0
+        return report
+
     cdef dict _serialize_automaton(self):
         """
         Serializes the automaton grid to the format that is
         usable by the database.
         """
-        cdef int i
+        cdef int i, j
         cdef CCell* cell_a
         res = {}
 
-        for _, wrapper in self.cell_data.items():
-            cell_a = <CCell*>((<CellWrapper>wrapper).get_cell())
+        for i in range(self.n_nodes):
+            cell_a = self.grid_a[i]
             pos = (int(cell_a.pos_x), int(cell_a.pos_y))
             temp_cell = Cell(pos, type_to_pyenum(cell_a.c_type), 
-                            wrapper.cell_data,
+                            self.configs[self.config_index[i]],
                             state_to_pyenum(cell_a.c_state),
                             True if cell_a.self_polarization == 1 else 0,
                             int(cell_a.timer),
@@ -524,12 +1495,101 @@ cdef class Automaton:
             temp_cell.propagation_count = int(cell_a.propagation_count)
             res[pos] = temp_cell
         
-        for pos, wrapper in self.cell_data.items():
-            neis = wrapper.neighbors
-            for nei_pos in neis:
-                res[pos].add_neighbor(res[nei_pos])
+        for i in range(self.n_nodes):
+            cell_a = self.grid_a[i]
+            temp_cell = res[(int(cell_a.pos_x), int(cell_a.pos_y))]
+            for j in range(cell_a.n_neighbors):
+                if cell_a.neighbors[j] != NULL:
+                    temp_cell.add_neighbor(res[(int(cell_a.neighbors[j].pos_x), int(cell_a.neighbors[j].pos_y))])
         
         return res
 
     cpdef dict serialize_automaton(self):
-        return self._serialize_automaton()
\ No newline at end of file
+        return self._serialize_automaton()
+
+    cpdef list distinct_configs(self):
+        """
+        Returns the list of distinct cell configs used by the automaton. Configs are
+        compared with create_config_key, so the result maps one-to-one on the cell_arguments rows.
+        """
+        cdef dict seen_keys = {}
+
+        # configs are already distinct by identity, equal copies are merged by the key
+        for config in self.configs:
+            key = create_config_key(config)
+            if key not in seen_keys:
+                seen_keys[key] = config
+
+        return list(seen_keys.values())
+
+    cpdef object to_blob(self, dict arg_ids):
+        """
+        Serializes the automaton grid straight to the array of cell_dtype records used by the database.
+        Unlike serialize_automaton it doesn't build the python Cell graph, the records are written
+        from the grid into the preallocated numpy buffer.
+
+        Args:
+            arg_ids dict - maps create_config_key(config) to the id of the cell_arguments row
+
+        Returns:
+            np.ndarray - array of cell_dtype records, one per cell in the grid order
+
+        Throws:
+            KeyError - when a config used by the automaton has no entry in arg_ids
+        """
+        cdef int i, j, n_written
+        cdef int n_nodes = self.n_nodes
+        cdef CCell* cell
+        cdef CCell* nei
+        cdef uint32_t code
+        cdef list resolved
+
+        blob = np.empty(n_nodes, dtype=cell_dtype)
+        if n_nodes == 0:
+            return blob
+
+        cdef uint8_t[:] flags = blob["flags"]
+        cdef float[:] charge = blob["charge"]
+        cdef int16_t[:, :] position = blob["position"]
+        cdef uint32_t[:] neighbors = blob["neighbors"]
+        cdef uint8_t[:] n_neighbors = blob["n_neighbors"]
+        cdef int32_t[:] arg_id = blob["arg_id"]
+        cdef uint16_t[:] timer = blob["timer"]
+        cdef uint16_t[:] propagation_time = blob["propagation_time"]
+        cdef uint16_t[:] propagation_count = blob["propagation_count"]
+
+        # Cells share the config dicts, so the key is built once per config object
+        resolved = [arg_ids[create_config_key(config)] for config in self.configs]
+        for i in range(n_nodes):
+            arg_id[i] = <int32_t> resolved[self.config_index[i]]
+
+        with nogil:
+            for i in range(n_nodes):
+                cell = self.grid_a[i]
+
+                flags[i] = <uint8_t> ((<int>cell.c_state & 0b111)
+                                      | ((<int>cell.c_type & 0b1111) << 3)
+                                      | ((1 if cell.self_polarization != 0 else 0) << 7))
+                charge[i] = <float> cell.charge
+                position[i, 0] = <int16_t> cell.pos_x
+                position[i, 1] = <int16_t> cell.pos_y
+
+                # Relative position (self - neighbor) of each neighbor packed into 4 bit nibbles,
+                # same encoding as pack_neighbors in cell_utils
+                code = 0
+                n_written = 0
+                for j in range(cell.n_neighbors):
+                    nei = cell.neighbors[j]
+                    if nei == NULL or n_written >= 8:
+                        continue
+                    code |= (<uint32_t> ((cell.pos_x - nei.pos_x + 1) & 0x3)
+                             | (<uint32_t> ((cell.pos_y - nei.pos_y + 1) & 0x3) << 2)) << (4 * n_written)
+                    n_written += 1
+                neighbors[i] = code
+                n_neighbors[i] = <uint8_t> n_written
+
+                timer[i] = <uint16_t> cell.timer
+                propagation_time[i] = <uint16_t> cell.propagation_time
+                propagation_count[i] = <uint16_t> cell.propagation_count
+
+        return blob
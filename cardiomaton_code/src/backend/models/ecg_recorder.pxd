@@ -0,0 +1,18 @@
+from libc.stdint cimport int32_t
+from src.backend.models.ring_buffer cimport RingBuffer
+
+
+cdef class EcgRecorder(RingBuffer):
+    cdef:
+        int n_leads
+        int n_nodes
+        double[:, ::1] weights
+        double[:, ::1] values
+        int32_t[::1] frames
+        object _weights
+        object _values
+        object _frames
+        readonly tuple lead_names
+
+    cdef void store(self, const double* chunk_values, int stride, int n_chunks, int frame) noexcept nogil
+    cpdef void set_weights(self, object weights)
@@ -0,0 +1,14 @@
+from typing import Iterable, Optional, Tuple
+import numpy as np
+from src.backend.models.ring_buffer import RingBuffer
+
+class EcgRecorder(RingBuffer):
+    lead_names: Tuple[str, ...]
+    n_cells: int
+    weight_matrix: np.ndarray
+    value_buffer: np.ndarray
+    frame_buffer: np.ndarray
+
+    def __init__(self, weights: np.ndarray, lead_names: Optional[Iterable[str]] = None, capacity: int = 2000) -> None: ...
+    def set_weights(self, weights: np.ndarray) -> None: ...
+    def series(self) -> Tuple[np.ndarray, np.ndarray]: ...
@@ -0,0 +1,96 @@
+from libc.stdint cimport int32_t
+cimport cython
+
+from src.backend.models.ring_buffer cimport read_only
+
+import numpy as np
+
+
+cdef class EcgRecorder(RingBuffer):
+    """
+    Pseudo-ECG readout of the automaton. Every lead is a weighted sum of the cell charges, accumulated by the
+    automaton in the update loop of every step and stored in a ring buffer, one row per frame.
+    Weights are given in the order of the cells in the grid, see Automaton.get_positions.
+    """
+
+    def __init__(self, weights, lead_names = None, int capacity = 2000):
+        """
+        Args:
+            weights array - (n_leads, n_cells) weights of the leads
+            lead_names iterable - names of the leads, numbered from 0 when not given
+            capacity int - number of frames kept in the buffer
+        """
+        if capacity <= 0:
+            raise ValueError("ECG capacity must be positive")
+        self.n_leads = 0
+        self.set_weights(weights)
+        if lead_names is None:
+            lead_names = [str(k) for k in range(self.n_leads)]
+        self.lead_names = tuple(str(name) for name in lead_names)
+        if len(self.lead_names) != self.n_leads:
+            raise ValueError("Number of lead names differs from the number of leads")
+
+        super().__init__(capacity)
+        self._values = np.zeros((capacity, self.n_leads), dtype=np.float64)
+        self._frames = np.zeros(capacity, dtype=np.int32)
+        self.values = self._values
+        self.frames = self._frames
+
+    cpdef void set_weights(self, object weights):
+        """
+        Replaces the lead weights, for example after the automaton was rebuilt on another mesh.
+        The number of leads can't change once the recorder is created.
+
+        Throws:
+            ValueError - when the weights are not a 2D array or the number of leads differs
+        """
+        array = np.ascontiguousarray(weights, dtype=np.float64)
+        if array.ndim != 2 or array.shape[0] == 0:
+            raise ValueError("ECG weights must be a (n_leads, n_cells) array")
+        if self.n_leads != 0 and array.shape[0] != self.n_leads:
+            raise ValueError(f"Expected weights of {self.n_leads} leads, got {array.shape[0]}")
+        self._weights = array
+        self.weights = array
+        self.n_leads = <int> array.shape[0]
+        self.n_nodes = <int> array.shape[1]
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cdef void store(self, const double* chunk_values, int stride, int n_chunks, int frame) noexcept nogil:
+        """
+        Merges the sums of the leads accumulated per chunk of the grid into the row of the frame.
+        The sum of lead k in chunk c is chunk_values[c * stride + k].
+        """
+        cdef int chunk, k
+        cdef double total
+        cdef int row = self.head
+        for k in range(self.n_leads):
+            total = 0.0
+            for chunk in range(n_chunks):
+                total += chunk_values[chunk * stride + k]
+            self.values[row, k] = total
+        self.frames[row] = <int32_t> frame
+        self.advance()
+
+    @property
+    def n_cells(self):
+        return self.n_nodes
+
+    @property
+    def weight_matrix(self):
+        return read_only(self._weights)
+
+    @property
+    def value_buffer(self):
+        return read_only(self._values)
+
+    @property
+    def frame_buffer(self):
+        return read_only(self._frames)
+
+    def series(self):
+        """
+        Returns (frames, values) ordered from the oldest to the newest frame, values has one column per lead.
+        These are views of the buffers until they wrap around, copies afterwards.
+        """
+        return self._series(self._frames, self._values)
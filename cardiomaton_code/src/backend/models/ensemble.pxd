@@ -0,0 +1,90 @@
+from libc.stdint cimport uint8_t, int32_t
+
+
+# Charge parameters of the cell, shared by all the (cell, variant) pairs with the same values
+cdef struct VariantParams:
+    double* charges
+    int period
+    int charge_max
+    int self_polarization
+    double V_thresh
+    double V_rest
+    double V_peak
+    double ref_threshold
+    int propagation_time
+    int propagation_time_max
+
+
+# Dynamic fields of all the (cell, variant) pairs of one grid, indexed by cell * n_variants + variant
+cdef struct EnsembleGrid:
+    uint8_t* state
+    int32_t* timer
+    double* charge
+    uint8_t* can_propagate
+    int32_t* propagation_count
+
+
+cdef class Ensemble:
+    cdef:
+        readonly int n_variants
+        readonly int n_nodes
+        int frame_counter
+        tuple size
+
+        # Shared topology, neighbors of the cell i are neighbors[neighbor_offsets[i]:neighbor_offsets[i + 1]]
+        int32_t[::1] neighbor_offsets
+        int32_t[::1] neighbors
+        uint8_t[::1] cell_types
+        object _positions
+
+        # Parameters: pool of the distinct parameter sets and the index of the set of every (cell, variant)
+        VariantParams* params
+        int n_params
+        int32_t[:, ::1] param_index
+        list charge_tables
+
+        # Two grids of the dynamic fields, swapped after every step, current is the index of the grid_a
+        object _state
+        object _timer
+        object _charge
+        object _can_propagate
+        object _propagation_count
+        int current
+
+        int32_t[:, ::1] last_activation
+        int32_t[:, ::1] prev_activation
+        object _last_activation
+        object _prev_activation
+
+        # Recording of the per variant region counts and leads, capacity 0 when disabled
+        int capacity
+        int head
+        long long n_recorded
+        int n_chunks
+        int n_leads
+        double[:, ::1] weights
+        int32_t[:, :, :, ::1] counts
+        double[:, :, ::1] values
+        int32_t[::1] frames
+        object _counts
+        object _values
+        object _frames
+        int32_t* chunk_counts
+        double* chunk_values
+        readonly tuple lead_names
+        readonly tuple region_names
+        readonly tuple state_names
+
+    cdef EnsembleGrid _grid(self, int idx)
+    cdef void _step(self)
+    cdef void _record(self, EnsembleGrid grid) noexcept nogil
+
+    cpdef int advance(self, int n_steps)
+    cpdef void record(self, int capacity, object weights=*, object lead_names=*, int n_chunks=*)
+    cpdef int get_frame_counter(self)
+    cpdef tuple get_shape(self)
+    cpdef object get_positions(self)
+    cpdef object states(self)
+    cpdef object charges(self)
+    cpdef object timers(self)
+    cpdef object activation_times(self)
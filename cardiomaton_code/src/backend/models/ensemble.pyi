@@ -0,0 +1,23 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from src.models.cell import Cell
+
+class Ensemble:
+    n_variants: int
+    n_nodes: int
+    lead_names: Tuple[str, ...]
+    region_names: Tuple[str, ...]
+    state_names: Tuple[str, ...]
+
+    def __init__(self, size: Tuple[int, int], cell_maps: List[Dict[Tuple[int, int], Cell]], frame: int = 0) -> None: ...
+    def advance(self, n_steps: int) -> int: ...
+    def record(self, capacity: int, weights: Optional[np.ndarray] = None, lead_names: Optional[Iterable[str]] = None,
+               n_chunks: int = 16) -> None: ...
+    def series(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]: ...
+    def get_frame_counter(self) -> int: ...
+    def get_shape(self) -> Tuple[int, int]: ...
+    def get_positions(self) -> np.ndarray: ...
+    def states(self) -> np.ndarray: ...
+    def charges(self) -> np.ndarray: ...
+    def timers(self) -> np.ndarray: ...
+    def activation_times(self) -> Tuple[np.ndarray, np.ndarray]: ...
@@ -0,0 +1,534 @@
+from libc.stdlib cimport malloc, free
+from libc.string cimport memset
+from libc.stdint cimport uint8_t, int32_t
+from cython.parallel cimport prange
+cimport cython
+
+from src.backend.structs.c_cell cimport REFRACTION_POLAR, NEIGHBOR_REFRACTION_POLAR, NEIGHBOR_DEPOLARIZATION_COUNT
+from src.backend.enums.cell_state cimport CellStateC, state_to_cenum, cell_state_name
+from src.backend.enums.cell_type cimport CellTypeC, type_to_cenum, type_to_pyenum
+from src.backend.models.region_recorder cimport N_REGIONS, N_STATES
+from src.backend.models.ring_buffer cimport read_only, ordered
+
+import numpy as np
+
+cdef int eps = 1
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline int neighbor_depolarized(EnsembleGrid a, const VariantParams* params, const int32_t* param_index,
+                                     const int32_t* neighbors, int start, int end, int n_variants,
+                                     int variant) noexcept nogil:
+    """
+    Mirrors is_neighbor_depolarized of c_cell for one variant.
+    """
+    cdef int j, k
+    cdef int count = 0
+    for j in range(start, end):
+        k = neighbors[j] * n_variants + variant
+        if a.can_propagate[k] == 1 and a.propagation_count[k] > params[param_index[k]].propagation_time:
+            count += 1
+            if count >= NEIGHBOR_DEPOLARIZATION_COUNT:
+                return 1
+    return 0
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline int relative_repolarization(EnsembleGrid a, const int32_t* neighbors, int start, int end, int n_variants,
+                                        int variant, int k) noexcept nogil:
+    """
+    Mirrors is_relative_repolarization of c_cell for one variant.
+    """
+    cdef int j
+    cdef int count = 0
+    for j in range(start, end):
+        if a.charge[neighbors[j] * n_variants + variant] - a.charge[k] >= REFRACTION_POLAR:
+            count += 1
+            if count >= NEIGHBOR_REFRACTION_POLAR:
+                return 1
+    return 0
+
+
+@cython.cdivision(True)
+cdef inline int next_timer(int timer, int period) noexcept nogil:
+    """
+    (timer + 1) % period for the non negative timers, without the division in the common case.
+    """
+    timer += 1
+    if timer >= period:
+        timer = timer - period if timer - period < period else timer % period
+    return timer
+
+
+cdef inline void update_timer(EnsembleGrid a, EnsembleGrid b, const VariantParams* p, int k) noexcept nogil:
+    cdef int timer = next_timer(a.timer[k], p.period)
+    b.timer[k] = timer
+    a.timer[k] = timer
+    b.charge[k] = p.charges[timer]
+
+
+cdef inline void depolarize(EnsembleGrid a, EnsembleGrid b, const VariantParams* p, int k) noexcept nogil:
+    a.timer[k] = p.charge_max
+    b.timer[k] = p.charge_max
+    b.charge[k] = p.charges[p.charge_max]
+    b.state[k] = CellStateC.RAPID_DEPOLARIZATION
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline void update_variant(EnsembleGrid a, EnsembleGrid b, const VariantParams* params,
+                                const int32_t* param_index, const int32_t* neighbors, int start, int end,
+                                int n_variants, int variant, int k) noexcept nogil:
+    """
+    Mirrors update_charge of charge_update for the variant of the cell at k = cell * n_variants + variant,
+    including the writes to the current grid, so every variant evolves exactly like its own automaton.
+    """
+    cdef const VariantParams* p = &params[param_index[k]]
+    cdef int new_timer
+    cdef double new_charge
+    cdef uint8_t state = a.state[k]
+
+    if a.can_propagate[k] == 1:
+        if a.propagation_count[k] >= p.propagation_time_max:
+            b.can_propagate[k] = 0
+            a.can_propagate[k] = 0
+            a.propagation_count[k] = 1
+            b.propagation_count[k] = 1
+        else:
+            a.propagation_count[k] += 1
+            b.propagation_count[k] += 1
+
+    if state == CellStateC.NECROSIS:
+        b.charge[k] = 0
+        b.timer[k] = a.timer[k]
+        b.state[k] = state
+
+    elif state == CellStateC.REPOLARIZATION_ABSOLUTE_REFRACTION:
+        update_timer(a, b, p, k)
+        if b.charge[k] <= p.ref_threshold:
+            b.state[k] = CellStateC.REPOLARIZATION_RELATIVE_REFRACTION
+        else:
+            b.state[k] = state
+
+    elif state == CellStateC.REPOLARIZATION_RELATIVE_REFRACTION:
+        if relative_repolarization(a, neighbors, start, end, n_variants, variant, k) == 1:
+            depolarize(a, b, p, k)
+            return
+        new_timer = next_timer(a.timer[k], p.period)
+        new_charge = p.charges[new_timer]
+        a.timer[k] = new_timer
+        b.timer[k] = new_timer
+        if (new_charge - p.V_rest) <= eps:
+            b.charge[k] = p.V_rest
+            b.state[k] = CellStateC.SLOW_DEPOLARIZATION if p.self_polarization == 1 else CellStateC.POLARIZATION
+            return
+        b.charge[k] = new_charge
+        b.state[k] = state
+
+    elif state == CellStateC.POLARIZATION:
+        if neighbor_depolarized(a, params, param_index, neighbors, start, end, n_variants, variant) == 1:
+            depolarize(a, b, p, k)
+        elif p.self_polarization == 1:
+            update_timer(a, b, p, k)
+            b.state[k] = CellStateC.SLOW_DEPOLARIZATION
+        else:
+            b.charge[k] = a.charge[k]
+            b.state[k] = state
+            b.timer[k] = a.timer[k]
+
+    elif state == CellStateC.SLOW_DEPOLARIZATION:
+        if neighbor_depolarized(a, params, param_index, neighbors, start, end, n_variants, variant) == 1:
+            depolarize(a, b, p, k)
+        elif a.charge[k] >= p.V_peak:
+            b.charge[k] = p.V_peak
+            b.timer[k] = a.timer[k]
+            b.state[k] = CellStateC.RAPID_DEPOLARIZATION
+        else:
+            update_timer(a, b, p, k)
+            if a.charge[k] >= p.V_thresh:
+                b.state[k] = CellStateC.RAPID_DEPOLARIZATION
+            else:
+                b.state[k] = CellStateC.SLOW_DEPOLARIZATION
+
+    elif state == CellStateC.RAPID_DEPOLARIZATION:
+        if p.self_polarization == 1:
+            update_timer(a, b, p, k)
+        else:
+            b.charge[k] = a.charge[k]
+        b.can_propagate[k] = 1
+        a.can_propagate[k] = 1
+        b.state[k] = CellStateC.REPOLARIZATION_ABSOLUTE_REFRACTION
+
+
+cdef class Ensemble:
+    """
+    Advances many parameter variants of one automaton in a single pass. The variants share the topology
+    (cells and neighbors) and the pool of charge tables, only the dynamic fields and the index of the
+    parameter set are kept per variant. The fields are stored variant-inner, cell * n_variants + variant,
+    so the neighbor lookups and the loop overhead of one cell are shared by all of its variants.
+
+    Every variant follows the same update rules as the Automaton built from its cell map. There's no image,
+    frame recorder or modifications, the ensemble is meant for the headless parameter sweeps.
+    """
+
+    def __init__(self, size, cell_maps, int frame = 0):
+        """
+        Args:
+            size tuple - size of the image the grid is projected on, as in the Automaton
+            cell_maps list - one cell map per variant. All the maps need the same positions, cell types and
+                             neighbors, the cell order of the first map is the order of the grid
+            frame int - initial frame counter
+
+        Throws:
+            ValueError - when there are no variants or the maps differ in the topology
+        """
+        cdef int i, j, v, k
+        cell_maps = list(cell_maps)
+        if not cell_maps:
+            raise ValueError("Ensemble needs at least one variant")
+
+        self.size = tuple(size)
+        self.frame_counter = frame
+        self.n_variants = len(cell_maps)
+        base = list(cell_maps[0].values())
+        self.n_nodes = len(base)
+        cdef int n_variants = self.n_variants
+        cdef int n_nodes = self.n_nodes
+
+        positions = [(cell.pos_x, cell.pos_y) for cell in base]
+        index = {position: i for i, position in enumerate(positions)}
+        self._positions = np.asarray(positions, dtype=np.int32).reshape(n_nodes, 2)
+
+        offsets = np.zeros(n_nodes + 1, dtype=np.int32)
+        neighbor_list = []
+        base_neighbors = []
+        for i in range(n_nodes):
+            # Neighbors outside of the grid are skipped, as the NULL neighbors of the automaton
+            cell_neighbors = [] if base[i].neighbors is None else [
+                index[(neighbor.pos_x, neighbor.pos_y)] for neighbor in base[i].neighbors
+                if (neighbor.pos_x, neighbor.pos_y) in index]
+            base_neighbors.append(cell_neighbors)
+            neighbor_list.extend(cell_neighbors)
+            offsets[i + 1] = len(neighbor_list)
+        self.neighbor_offsets = offsets
+        self.neighbors = np.asarray(neighbor_list, dtype=np.int32) if neighbor_list else np.zeros(1, dtype=np.int32)
+        self.cell_types = np.asarray([type_to_cenum(cell.cell_type) for cell in base], dtype=np.uint8)
+
+        self._state = np.zeros((2, n_nodes, n_variants), dtype=np.uint8)
+        self._timer = np.zeros((2, n_nodes, n_variants), dtype=np.int32)
+        self._charge = np.zeros((2, n_nodes, n_variants), dtype=np.float64)
+        self._can_propagate = np.zeros((2, n_nodes, n_variants), dtype=np.uint8)
+        self._propagation_count = np.ones((2, n_nodes, n_variants), dtype=np.int32)
+        self.current = 0
+        self.param_index = np.zeros((n_nodes, n_variants), dtype=np.int32)
+
+        self.charge_tables = []
+        tables = {} # content of the charges -> index in charge_tables
+        charges_ids = {} # id of the python charges list -> index in charge_tables, skips rehashing shared lists
+        param_sets = {} # parameter tuple -> index in the pool
+        for v in range(n_variants):
+            cell_map = cell_maps[v]
+            for i in range(n_nodes):
+                cell = cell_map.get(positions[i]) if v > 0 else base[i]
+                if cell is None or (v > 0 and len(cell_map) != n_nodes):
+                    raise ValueError(f"Cell map of the variant {v} has different positions")
+                if v > 0 and type_to_cenum(cell.cell_type) != self.cell_types[i]:
+                    raise ValueError(f"Cell {positions[i]} of the variant {v} has a different type")
+                if v > 0 and cell.neighbors is not base[i].neighbors:
+                    cell_neighbors = [] if cell.neighbors is None else [
+                        index[(neighbor.pos_x, neighbor.pos_y)] for neighbor in cell.neighbors
+                        if (neighbor.pos_x, neighbor.pos_y) in index]
+                    if cell_neighbors != base_neighbors[i]:
+                        raise ValueError(f"Cell {positions[i]} of the variant {v} has different neighbors")
+                if cell.charges is None:
+                    raise RuntimeError("Attempted construction of a cell with no charge function")
+
+                table = charges_ids.get(id(cell.charges))
+                if table is None:
+                    values = np.ascontiguousarray(cell.charges, dtype=np.float64)
+                    table = tables.setdefault(values.tobytes(), len(self.charge_tables))
+                    if table == len(self.charge_tables):
+                        self.charge_tables.append(values)
+                    charges_ids[id(cell.charges)] = table
+                key = (table, int(cell.n_range), int(cell.max_charge), 1 if cell.self_polarization else 0,
+                       float(cell.cell_data.get("V_thresh", 0)), float(cell.cell_data.get("V_rest")),
+                       float(cell.cell_data.get("V_peak")), float(cell.ref_threshold),
+                       int(cell.config.get("propagation_time")), int(cell.config.get("propagation_time_max", 5)))
+                self.param_index[i, v] = param_sets.setdefault(key, len(param_sets))
+
+                for j in range(2):
+                    self._state[j, i, v] = <int> state_to_cenum(cell.state)
+                    self._timer[j, i, v] = <int> cell.timer
+                    self._charge[j, i, v] = <double> cell.charge
+
+        self.n_params = len(param_sets)
+        self.params = <VariantParams*> malloc(self.n_params * sizeof(VariantParams))
+        if self.params == NULL:
+            raise MemoryError("Failed to allocate the ensemble parameters")
+        cdef double[::1] table_view
+        for key, k in param_sets.items():
+            table_view = self.charge_tables[key[0]]
+            self.params[k].charges = &table_view[0]
+            self.params[k].period = key[1]
+            self.params[k].charge_max = key[2]
+            self.params[k].self_polarization = key[3]
+            self.params[k].V_thresh = key[4]
+            self.params[k].V_rest = key[5]
+            self.params[k].V_peak = key[6]
+            self.params[k].ref_threshold = key[7]
+            self.params[k].propagation_time = key[8]
+            self.params[k].propagation_time_max = key[9]
+
+        self._last_activation = np.full((n_nodes, n_variants), -1, dtype=np.int32)
+        self._prev_activation = np.full((n_nodes, n_variants), -1, dtype=np.int32)
+        self.last_activation = self._last_activation
+        self.prev_activation = self._prev_activation
+
+        self.capacity = 0
+        self.n_leads = 0
+        self.lead_names = ()
+        self.region_names = tuple(type_to_pyenum(<CellTypeC> k).name for k in range(N_REGIONS))
+        self.state_names = tuple(cell_state_name(<CellStateC> k) for k in range(N_STATES))
+
+    def __dealloc__(self):
+        if self.params != NULL:
+            free(self.params)
+            self.params = NULL
+        if self.chunk_counts != NULL:
+            free(self.chunk_counts)
+            self.chunk_counts = NULL
+        if self.chunk_values != NULL:
+            free(self.chunk_values)
+            self.chunk_values = NULL
+
+    cdef EnsembleGrid _grid(self, int idx):
+        cdef EnsembleGrid grid
+        cdef uint8_t[:, :, ::1] state = self._state
+        cdef int32_t[:, :, ::1] timer = self._timer
+        cdef double[:, :, ::1] charge = self._charge
+        cdef uint8_t[:, :, ::1] can_propagate = self._can_propagate
+        cdef int32_t[:, :, ::1] propagation_count = self._propagation_count
+        grid.state = &state[idx, 0, 0]
+        grid.timer = &timer[idx, 0, 0]
+        grid.charge = &charge[idx, 0, 0]
+        grid.can_propagate = &can_propagate[idx, 0, 0]
+        grid.propagation_count = &propagation_count[idx, 0, 0]
+        return grid
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cdef void _step(self):
+        cdef int i, v, k
+        cdef int n_nodes = self.n_nodes
+        cdef int n_variants = self.n_variants
+        if n_nodes == 0:
+            self.frame_counter += 1
+            return
+
+        cdef EnsembleGrid a = self._grid(self.current)
+        cdef EnsembleGrid b = self._grid(1 - self.current)
+        cdef const VariantParams* params = self.params
+        cdef const int32_t* param_index = &self.param_index[0, 0]
+        cdef const int32_t* offsets = &self.neighbor_offsets[0]
+        cdef const int32_t* neighbors = &self.neighbors[0]
+        cdef int32_t* last_activation = &self.last_activation[0, 0]
+        cdef int32_t* prev_activation = &self.prev_activation[0, 0]
+
+        self.frame_counter += 1
+        cdef int32_t frame = self.frame_counter
+
+        with nogil:
+            for i in prange(n_nodes, schedule='static'):
+                for v in range(n_variants):
+                    k = i * n_variants + v
+                    update_variant(a, b, params, param_index, neighbors, offsets[i], offsets[i + 1],
+                                   n_variants, v, k)
+                    if (b.state[k] == CellStateC.RAPID_DEPOLARIZATION
+                            and a.state[k] != CellStateC.RAPID_DEPOLARIZATION):
+                        prev_activation[k] = last_activation[k]
+                        last_activation[k] = frame
+
+            if self.capacity > 0:
+                self._record(b)
+
+        self.current = 1 - self.current
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    @cython.cdivision(True)
+    cdef void _record(self, EnsembleGrid grid) noexcept nogil:
+        cdef int chunk, i, v, k, lead, region, state, start, end
+        cdef int row = self.head
+        cdef int n_chunks = self.n_chunks
+        cdef int n_nodes = self.n_nodes
+        cdef int n_variants = self.n_variants
+        cdef int n_leads = self.n_leads
+        cdef int32_t* chunk_counts = self.chunk_counts
+        cdef double* chunk_values = self.chunk_values
+        cdef const uint8_t* cell_types = &self.cell_types[0]
+        cdef const double* weights = &self.weights[0, 0] if n_leads > 0 else NULL
+        cdef int32_t* counts
+        cdef double* values
+        cdef double weight
+
+        memset(chunk_counts, 0, n_chunks * n_variants * N_REGIONS * N_STATES * sizeof(int32_t))
+        if n_leads > 0:
+            memset(chunk_values, 0, n_chunks * n_variants * n_leads * sizeof(double))
+
+        for chunk in prange(n_chunks, schedule='static'):
+            start = <int> ((<long long> chunk * n_nodes) / n_chunks)
+            end = <int> ((<long long> (chunk + 1) * n_nodes) / n_chunks)
+            counts = chunk_counts + chunk * n_variants * N_REGIONS * N_STATES
+            values = chunk_values + chunk * n_variants * n_leads
+            for i in range(start, end):
+                region = cell_types[i]
+                k = i * n_variants
+                for v in range(n_variants):
+                    counts[(v * N_REGIONS + region) * N_STATES + grid.state[k + v]] += 1
+                for lead in range(n_leads):
+                    weight = weights[lead * n_nodes + i]
+                    for v in range(n_variants):
+                        values[v * n_leads + lead] += weight * grid.charge[k + v]
+
+        for v in range(n_variants):
+            for region in range(N_REGIONS):
+                for state in range(N_STATES):
+                    self.counts[row, v, region, state] = 0
+                    for chunk in range(n_chunks):
+                        self.counts[row, v, region, state] += chunk_counts[
+                            ((chunk * n_variants + v) * N_REGIONS + region) * N_STATES + state]
+            for lead in range(n_leads):
+                self.values[row, v, lead] = 0.0
+                for chunk in range(n_chunks):
+                    self.values[row, v, lead] += chunk_values[(chunk * n_variants + v) * n_leads + lead]
+
+        self.frames[row] = <int32_t> self.frame_counter
+        self.head = (row + 1) % self.capacity
+        self.n_recorded += 1
+
+    cpdef int advance(self, int n_steps):
+        """
+        Runs n_steps updates of all the variants.
+
+        Returns:
+            int - frame counter after the last step
+        """
+        cdef int step
+        for step in range(n_steps):
+            self._step()
+        return self.frame_counter
+
+    cpdef void record(self, int capacity, object weights=None, object lead_names=None, int n_chunks=16):
+        """
+        Starts recording, at the end of every step, the number of cells in every state per region
+        (as the RegionRecorder does) and the leads (as the EcgRecorder does) of every variant.
+        Replaces the previous recording, capacity 0 stops it.
+
+        Args:
+            capacity int - number of frames kept in the buffers
+            weights array - (n_leads, n_cells) weights of the leads, no leads are recorded without them
+            lead_names iterable - names of the leads, numbered from 0 when not given
+            n_chunks int - number of parts of the grid accumulated independently
+
+        Throws:
+            ValueError - on negative capacity, non positive n_chunks or weights not matching the grid
+        """
+        if capacity < 0:
+            raise ValueError("Recording capacity can't be negative")
+        if n_chunks <= 0:
+            raise ValueError("Number of chunks must be positive")
+
+        n_leads = 0
+        if weights is not None:
+            array = np.ascontiguousarray(weights, dtype=np.float64)
+            if array.ndim != 2 or array.shape[1] != self.n_nodes:
+                raise ValueError(f"Lead weights must be a (n_leads, {self.n_nodes}) array")
+            n_leads = array.shape[0]
+        else:
+            array = np.zeros((0, self.n_nodes), dtype=np.float64)
+        if lead_names is None:
+            lead_names = range(n_leads)
+        lead_names = tuple(map(str, lead_names))
+        if len(lead_names) != n_leads:
+            raise ValueError("Number of lead names differs from the number of leads")
+
+        if self.chunk_counts != NULL:
+            free(self.chunk_counts)
+            self.chunk_counts = NULL
+        if self.chunk_values != NULL:
+            free(self.chunk_values)
+            self.chunk_values = NULL
+        self.capacity = 0
+        if capacity == 0:
+            return
+
+        self.chunk_counts = <int32_t*> malloc(n_chunks * self.n_variants * N_REGIONS * N_STATES * sizeof(int32_t))
+        self.chunk_values = <double*> malloc((n_chunks * self.n_variants * n_leads or 1) * sizeof(double))
+        if self.chunk_counts == NULL or self.chunk_values == NULL:
+            raise MemoryError("Error [Ensemble]: Failed to allocate the chunk buffers")
+
+        self.weights = array
+        self.n_leads = n_leads
+        self.lead_names = lead_names
+        self.n_chunks = n_chunks
+        self._counts = np.zeros((capacity, self.n_variants, N_REGIONS, N_STATES), dtype=np.int32)
+        self._values = np.zeros((capacity, self.n_variants, n_leads), dtype=np.float64)
+        self._frames = np.zeros(capacity, dtype=np.int32)
+        self.counts = self._counts
+        self.values = self._values
+        self.frames = self._frames
+        self.head = 0
+        self.n_recorded = 0
+        self.capacity = capacity
+
+    def series(self):
+        """
+        Returns (frames, counts, values) of the recording ordered from the oldest to the newest frame.
+        counts is indexed by [frame, variant, region, state], values by [frame, variant, lead].
+        These are views of the buffers until they wrap around, copies afterwards.
+
+        Throws:
+            RuntimeError - when nothing is recorded
+        """
+        if self.capacity == 0:
+            raise RuntimeError("Ensemble isn't recording, call record first")
+        return ordered((self._frames, self._counts, self._values), self.head, self.capacity, self.n_recorded)
+
+    cpdef int get_frame_counter(self):
+        return self.frame_counter
+
+    cpdef tuple get_shape(self):
+        return self.size
+
+    cpdef object get_positions(self):
+        """
+        Returns the (n_nodes, 2) positions of the cells in the order of the grid.
+        """
+        return read_only(self._positions)
+
+    cpdef object states(self):
+        """
+        Returns the (n_variants, n_nodes) read-only view of the cell states, updated by the following steps.
+        """
+        return read_only(self._state[self.current].T)
+
+    cpdef object charges(self):
+        """
+        Returns the (n_variants, n_nodes) read-only view of the cell charges, updated by the following steps.
+        """
+        return read_only(self._charge[self.current].T)
+
+    cpdef object timers(self):
+        """
+        Returns the (n_variants, n_nodes) read-only view of the cell timers, updated by the following steps.
+        """
+        return read_only(self._timer[self.current].T)
+
+    cpdef object activation_times(self):
+        """
+        Returns (last, previous) activation frames as (n_variants, n_nodes) read-only views,
+        -1 marks the cells without one. See Automaton.activation_times.
+        """
+        return read_only(self._last_activation.T), read_only(self._prev_activation.T)
@@ -0,0 +1,29 @@
+from libc.stdint cimport uint8_t, int32_t
+from src.backend.structs.c_cell cimport CCell
+
+
+cdef packed struct StateEvent:
+    int32_t frame
+    int32_t cell
+    uint8_t state
+
+
+cdef class EventLog:
+    cdef:
+        Py_ssize_t size
+        Py_ssize_t n_flushed
+        Py_ssize_t flush_size
+        StateEvent[::1] events
+        uint8_t[::1] last_states
+        object _events
+        object _base_states
+        object _last_states
+        readonly int base_frame
+        readonly object path
+
+    cdef int reserve(self, Py_ssize_t n) except -1
+    cdef void record(self, CCell** grid, int n_nodes, int frame) noexcept nogil
+    cpdef void start(self, object states, int frame)
+    cpdef void rewind(self, object states, int frame)
+    cpdef void flush(self)
+    cpdef void clear(self)
@@ -0,0 +1,23 @@
+from typing import Optional
+import numpy as np
+
+event_dtype: np.dtype
+
+class EventLog:
+    base_frame: int
+    path: Optional[str]
+    total: int
+    base_states: np.ndarray
+    last_states: np.ndarray
+
+    def __init__(self, initial_capacity: int = 65536, path: Optional[str] = None, flush_size: int = 1 << 20) -> None: ...
+    def start(self, states: np.ndarray, frame: int) -> None: ...
+    def rewind(self, states: np.ndarray, frame: int) -> None: ...
+    def flush(self) -> None: ...
+    def clear(self) -> None: ...
+    def __len__(self) -> int: ...
+    def view(self) -> np.ndarray: ...
+    def between(self, first: int, last: int) -> np.ndarray: ...
+    def states_at(self, frame: int) -> np.ndarray: ...
+    @staticmethod
+    def read_file(path: str) -> np.ndarray: ...
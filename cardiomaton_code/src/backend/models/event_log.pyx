@@ -0,0 +1,204 @@
+from libc.stdint cimport uint8_t, int32_t
+cimport cython
+
+from src.backend.structs.c_cell cimport CCell
+from src.backend.models.ring_buffer cimport read_only
+
+import numpy as np
+
+# Layout of a single event, shared by the in-memory buffer and the streamed file
+event_dtype = np.dtype([("frame", "<i4"), ("cell", "<i4"), ("state", "u1")])
+
+# Cell index of the rewind markers in the streamed file, see EventLog.read_file
+REWIND = -1
+
+
+cdef class EventLog:
+    """
+    Log of the discrete state transitions, one (frame, cell index, new state) record per change.
+    Appended by the automaton at the end of every step, together with the states of the cells
+    when the log was started it's enough to rebuild the state of any later frame.
+    Optionally the events are streamed to a file, the buffer then only keeps the events since the last flush.
+    """
+
+    def __init__(self, int initial_capacity = 65536, path = None, Py_ssize_t flush_size = 1 << 20):
+        """
+        Args:
+            initial_capacity int - number of events allocated up front, the buffer grows when needed
+            path str - file the events are appended to, None keeps everything in memory
+            flush_size int - number of buffered events that triggers the write to the file
+        """
+        if initial_capacity <= 0:
+            raise ValueError("Event log capacity must be positive")
+        self._events = np.zeros(initial_capacity, dtype=event_dtype)
+        self.events = self._events
+        self.size = 0
+        self.n_flushed = 0
+        self.flush_size = flush_size
+        self.path = str(path) if path is not None else None
+        self._base_states = np.zeros(0, dtype=np.uint8)
+        self._last_states = np.zeros(0, dtype=np.uint8)
+        self.last_states = self._last_states
+        self.base_frame = 0
+        if self.path is not None:
+            open(self.path, "wb").close()
+
+    cdef int reserve(self, Py_ssize_t n) except -1:
+        """
+        Makes room for n more events. Grown buffer is a new array, views returned earlier stay valid.
+        """
+        if self.path is not None and self.size >= self.flush_size:
+            self.flush()
+        if self.size + n <= self._events.shape[0]:
+            return 0
+        grown = np.zeros(max(2 * self._events.shape[0], self.size + n), dtype=event_dtype)
+        grown[:self.size] = self._events[:self.size]
+        self._events = grown
+        self.events = grown
+        return 0
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cdef void record(self, CCell** grid, int n_nodes, int frame) noexcept nogil:
+        """
+        Appends the cells whose state differs from the last logged one. Requires reserve(n_nodes) beforehand
+        and the grid of the same size as the states the log was started from.
+        """
+        cdef int i
+        cdef uint8_t state
+        cdef Py_ssize_t size = self.size
+        for i in range(n_nodes):
+            state = <uint8_t> grid[i].c_state
+            if state != self.last_states[i]:
+                self.events[size].frame = frame
+                self.events[size].cell = i
+                self.events[size].state = state
+                self.last_states[i] = state
+                size += 1
+        self.size = size
+
+    cpdef void start(self, object states, int frame):
+        """
+        Drops the events and sets the states of the cells the log starts from.
+        """
+        self._base_states = np.array(states, dtype=np.uint8)
+        self._last_states = self._base_states.copy()
+        self.last_states = self._last_states
+        self.base_frame = frame
+        self.size = 0
+        self.n_flushed = 0
+        if self.path is not None:
+            open(self.path, "wb").close()
+
+    cpdef void rewind(self, object states, int frame):
+        """
+        Goes back to the frame, used when the simulation goes back in time. The buffered events newer than
+        the frame are dropped. When the frame is older than the base states, a log kept in memory starts
+        over from the given states, a streamed log appends the rewind marker to the file and continues
+        from them, see read_file.
+
+        Args:
+            states - states of the cells at the frame
+            frame int - frame the simulation went back to
+        """
+        frames = self._events["frame"][:self.size]
+        self.size = int(np.searchsorted(frames, frame, side="right"))
+        if frame < self.base_frame:
+            if self.path is None:
+                self.start(states, frame)
+                return
+            marker = np.zeros(1, dtype=event_dtype)
+            marker["frame"] = frame
+            marker["cell"] = REWIND
+            with open(self.path, "ab") as f:
+                marker.tofile(f)
+            self._base_states = np.array(states, dtype=np.uint8)
+            self.base_frame = frame
+        self._last_states[:] = states
+
+    cpdef void flush(self):
+        """
+        Appends the buffered events to the file and folds them into the base states.
+        Does nothing for the logs kept in memory.
+        """
+        if self.path is None or self.size == 0:
+            return
+        events = self._events[:self.size]
+        with open(self.path, "ab") as f:
+            events.tofile(f)
+        self._base_states[events["cell"]] = events["state"]
+        self.base_frame = int(events["frame"][-1])
+        self.n_flushed += self.size
+        self.size = 0
+
+    cpdef void clear(self):
+        self.start(self._base_states, self.base_frame)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def total(self):
+        """
+        Number of events since the start, including the streamed ones.
+        """
+        return self.n_flushed + self.size
+
+    @property
+    def base_states(self):
+        return read_only(self._base_states)
+
+    @property
+    def last_states(self):
+        """
+        States of the cells after the last logged event.
+        """
+        return read_only(self._last_states)
+
+    def view(self):
+        """
+        Returns the buffered events as a structured array with frame, cell and state fields.
+        It's a view of the buffer, later events are not visible in it.
+        """
+        return read_only(self._events[:self.size])
+
+    def between(self, int first, int last):
+        """
+        Returns the buffered events of the frames in [first, last].
+        """
+        events = self._events[:self.size]
+        frames = events["frame"]
+        lo = np.searchsorted(frames, first, side="left")
+        hi = np.searchsorted(frames, last, side="right")
+        return read_only(events[lo:hi])
+
+    def states_at(self, int frame):
+        """
+        Rebuilds the states of all cells at the given frame from the base states and the buffered events.
+
+        Throws:
+            ValueError - when the frame is older than the base states
+        """
+        if frame < self.base_frame:
+            raise ValueError(f"Frame {frame} is older than the start of the log ({self.base_frame})")
+        events = self.between(self.base_frame, frame)
+        states = self._base_states.copy()
+        states[events["cell"]] = events["state"]
+        return states
+
+    @staticmethod
+    def read_file(path):
+        """
+        Reads the events streamed to the file as a structured array, in the order of the frames.
+        Rewind markers are resolved: the events written before a marker for the frames newer than
+        its frame were abandoned when the simulation went back, they are left out with the marker.
+        """
+        events = np.fromfile(path, dtype=event_dtype)
+        markers = np.flatnonzero(events["cell"] == REWIND)
+        if len(markers) == 0:
+            return events
+        keep = np.ones(len(events), dtype=bool)
+        for marker in markers:
+            keep[:marker] &= events["frame"][:marker] <= events["frame"][marker]
+            keep[marker] = False
+        return events[keep]
@@ -1,6 +1,16 @@
 from src.backend.structs.cell_snapshot cimport CellSnapshot
 
 
+cdef class SnapshotBuffer:
+    cdef:
+        object owner
+        CellSnapshot* data
+        Py_ssize_t n_bytes
+
+
+cdef object snapshot_array(object owner, CellSnapshot* data, int n_cells)
+
+
 cdef class FrameRecorder:
     cdef:
         int buff_size
@@ -8,6 +18,9 @@ cdef class FrameRecorder:
         int current_idx
         int count
         CellSnapshot** frames
+        # np.memmap backing all the frames when the recorder spills to a file, None for malloc'd frames
+        object mapping
+        readonly object path
 
     cdef inline int _normalize_index(self, int)
 
@@ -16,4 +29,5 @@ cdef class FrameRecorder:
     cdef void remove_newer(self, int)
     cdef void remove_older(self, int)
     cdef int get_count(self)
-    cdef void clear_all(self)
\ No newline at end of file
+    cdef void clear_all(self)
+    cpdef void flush(self)
\ No newline at end of file
@@ -0,0 +1,10 @@
+from typing import Optional
+import numpy as np
+
+snapshot_dtype: np.dtype
+
+class FrameRecorder:
+    path: Optional[str]
+    def __init__(self, grid_size: int, buff_size: int, path: Optional[str] = None) -> None: ...
+    def flush(self) -> None: ...
+    def frame_view(self, idx: int) -> np.ndarray: ...
@@ -1,22 +1,109 @@
 from libc.stdlib cimport malloc, free
+from libc.stdint cimport uint8_t
 from cython cimport sizeof
+from cpython.buffer cimport PyBUF_WRITABLE
 
 from src.backend.structs.cell_snapshot cimport CellSnapshot
 
+import numpy as np
+
+# Numpy layout of the CellSnapshot struct, used by the views of the recorded frames
+snapshot_dtype = np.dtype([
+    ("pos_x", "<i4"),
+    ("pos_y", "<i4"),
+    ("c_state", "<i4"),
+    ("charge", "<f4"),
+    ("timer", "<i4"),
+    ("can_propagate", "<i4"),
+    ("propagation_count", "<i4"),
+    ("propagation_time", "<i4"),
+])
+if snapshot_dtype.itemsize != sizeof(CellSnapshot):
+    raise ImportError(f"CellSnapshot has {sizeof(CellSnapshot)} bytes, snapshot_dtype {snapshot_dtype.itemsize}")
+
+
+cdef class SnapshotBuffer:
+    """
+    Read-only buffer protocol over an array of snapshots. Keeps the owner of the memory alive
+    as long as any numpy array created from it exists.
+    """
+
+    def __getbuffer__(self, Py_buffer* buffer, int flags):
+        if flags & PyBUF_WRITABLE:
+            raise BufferError("Snapshot buffer is read-only")
+        buffer.buf = <void*> self.data
+        buffer.obj = self
+        buffer.len = self.n_bytes
+        buffer.readonly = 1
+        buffer.itemsize = 1
+        buffer.format = "B"
+        buffer.ndim = 1
+        buffer.shape = &self.n_bytes
+        buffer.strides = NULL
+        buffer.suboffsets = NULL
+        buffer.internal = NULL
+
+    def __releasebuffer__(self, Py_buffer* buffer):
+        pass
+
+
+cdef object snapshot_array(object owner, CellSnapshot* data, int n_cells):
+    """
+    Returns the read-only structured array (snapshot_dtype) aliasing n_cells snapshots, without copying.
+    """
+    cdef SnapshotBuffer buffer = SnapshotBuffer.__new__(SnapshotBuffer)
+    buffer.owner = owner
+    buffer.data = data
+    buffer.n_bytes = <Py_ssize_t> n_cells * sizeof(CellSnapshot)
+    return np.frombuffer(buffer, dtype=snapshot_dtype)
+
 
 cdef class FrameRecorder:
 
-    def __init__(self, int grid_size, int buff_size):
+    def __init__(self, int grid_size, int buff_size, object path = None):
+        """
+        Ring of buff_size frames with grid_size snapshots each.
+        With path the ring is one memory mapped file instead of the malloc'd frames, the file is created
+        (or overwritten) with the full size upfront. Written frames go to the disk with the regular writeback
+        of the OS and only the recently used pages stay in memory, so the depth of the history is limited
+        by the disk instead of RAM.
+
+        Throws:
+            ValueError - when a file backed recorder would be empty
+            MemoryError - on the failed allocation
+        """
         cdef int i
+        cdef CellSnapshot* base
+        cdef uint8_t[::1] mapped
         self.buff_size = buff_size
         self.grid_size = grid_size
         self.current_idx = -1
         self.count = 0
+        self.mapping = None
+        self.path = path
 
         # Got to find this warning, don't know what causes it
         self.frames = <CellSnapshot**> malloc(<size_t>self.buff_size * sizeof(CellSnapshot*))
         if self.frames == NULL:
             raise MemoryError("Error [FrameRecorder]: Failed to allocate buffer array")
+
+        if path is not None:
+            if buff_size <= 0 or grid_size <= 0:
+                free(self.frames)
+                self.frames = NULL
+                raise ValueError("Error [FrameRecorder]: Can't map an empty recorder")
+            try:
+                self.mapping = np.memmap(path, dtype=np.uint8, mode="w+",
+                                         shape=(<Py_ssize_t> buff_size * grid_size * sizeof(CellSnapshot),))
+            except BaseException:
+                free(self.frames)
+                self.frames = NULL
+                raise
+            mapped = self.mapping
+            base = <CellSnapshot*> &mapped[0]
+            for i in range(buff_size):
+                self.frames[i] = base + <Py_ssize_t> i * grid_size
+            return
         
         for i in range(buff_size):
             self.frames[i] = <CellSnapshot*> malloc(<size_t>self.grid_size * sizeof(CellSnapshot))
@@ -30,9 +117,11 @@ cdef class FrameRecorder:
     def __dealloc__(self):
         cdef int i
         if self.frames != NULL:
-            for i in range(self.buff_size):
-                if self.frames[i] != NULL:
-                    free(self.frames[i])
+            # Mapped frames belong to the mapping, it's closed with the last reference
+            if self.mapping is None:
+                for i in range(self.buff_size):
+                    if self.frames[i] != NULL:
+                        free(self.frames[i])
             free(self.frames)
             self.frames = NULL
 
@@ -94,6 +183,27 @@ cdef class FrameRecorder:
     cdef int get_count(self):
         return self.count
 
+    def frame_view(self, int idx):
+        """
+        Returns the recorded frame as the read-only structured array (snapshot_dtype) aliasing the buffer,
+        indexed the same way as render_frame (negative values count from the newest frame).
+        The view is overwritten once the buffer wraps around, copy it to keep the values.
+
+        Throws:
+            IndexError - when there's no such frame
+        """
+        cdef CellSnapshot* snapshots = self.get_buffer(idx)
+        if snapshots == NULL:
+            raise IndexError(f"No recorded frame at index {idx}")
+        return snapshot_array(self, snapshots, self.grid_size)
+
     cdef void clear_all(self):
         self.current_idx = -1
-        self.count = 0
\ No newline at end of file
+        self.count = 0
+
+    cpdef void flush(self):
+        """
+        Writes the dirty pages of the mapped frames to the file. No-op for malloc'd frames.
+        """
+        if self.mapping is not None:
+            self.mapping.flush()
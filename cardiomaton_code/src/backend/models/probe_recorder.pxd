@@ -0,0 +1,19 @@
+from libc.stdint cimport uint8_t, int32_t
+from src.backend.structs.c_cell cimport CCell
+from src.backend.models.ring_buffer cimport RingBuffer
+
+
+cdef class ProbeRecorder(RingBuffer):
+    cdef:
+        int n_cells
+        int* indices
+        double[:, ::1] charges
+        uint8_t[:, ::1] states
+        int32_t[::1] frames
+        object _charges
+        object _states
+        object _frames
+        readonly tuple positions
+
+    cdef void bind(self, int* indices)
+    cdef void record(self, CCell** grid, int frame) noexcept nogil
@@ -0,0 +1,13 @@
+from typing import Iterable, Optional, Tuple
+import numpy as np
+from src.backend.models.ring_buffer import RingBuffer
+
+class ProbeRecorder(RingBuffer):
+    positions: Tuple[Tuple[int, int], ...]
+    charge_buffer: np.ndarray
+    state_buffer: np.ndarray
+    frame_buffer: np.ndarray
+
+    def __init__(self, positions: Iterable[Tuple[int, int]], capacity: int = 500) -> None: ...
+    def series(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]: ...
+    def latest(self) -> Optional[Tuple[int, np.ndarray, np.ndarray]]: ...
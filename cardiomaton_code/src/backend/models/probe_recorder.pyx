@@ -0,0 +1,101 @@
+from libc.stdlib cimport malloc, free
+from libc.string cimport memcpy
+from libc.stdint cimport uint8_t, int32_t
+cimport cython
+
+from src.backend.structs.c_cell cimport CCell
+from src.backend.models.ring_buffer cimport read_only
+
+import numpy as np
+
+
+cdef class ProbeRecorder(RingBuffer):
+    """
+    Ring buffers with the charge and the state of a fixed set of cells, one row per simulated frame.
+    The automaton fills them at the end of every step, python reads them through numpy views
+    without copying the data.
+    """
+
+    def __init__(self, positions, int capacity = 500):
+        """
+        Args:
+            positions iterable - (x, y) positions of the probed cells, column order of the buffers
+            capacity int - number of frames kept in the buffers
+        """
+        cdef int i
+        self.positions = tuple((int(x), int(y)) for x, y in positions)
+        self.n_cells = <int> len(self.positions)
+        if self.n_cells == 0:
+            raise ValueError("Probe needs at least one cell")
+        if capacity <= 0:
+            raise ValueError("Probe capacity must be positive")
+
+        super().__init__(capacity)
+
+        self._charges = np.zeros((capacity, self.n_cells), dtype=np.float64)
+        self._states = np.zeros((capacity, self.n_cells), dtype=np.uint8)
+        self._frames = np.zeros(capacity, dtype=np.int32)
+        self.charges = self._charges
+        self.states = self._states
+        self.frames = self._frames
+
+        self.indices = <int*> malloc(self.n_cells * sizeof(int))
+        if self.indices == NULL:
+            raise MemoryError("Error [ProbeRecorder]: Failed to allocate cell indices")
+        for i in range(self.n_cells):
+            self.indices[i] = -1
+
+    def __dealloc__(self):
+        if self.indices != NULL:
+            free(self.indices)
+            self.indices = NULL
+
+    cdef void bind(self, int* indices):
+        """
+        Sets the grid indices of the probed cells, in the order of positions. -1 skips the cell.
+        """
+        memcpy(self.indices, indices, self.n_cells * sizeof(int))
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    cdef void record(self, CCell** grid, int frame) noexcept nogil:
+        cdef int i, idx
+        cdef int row = self.head
+        cdef CCell* cell
+        for i in range(self.n_cells):
+            idx = self.indices[i]
+            if idx < 0:
+                continue
+            cell = grid[idx]
+            self.charges[row, i] = cell.charge
+            self.states[row, i] = <uint8_t> cell.c_state
+        self.frames[row] = <int32_t> frame
+        self.advance()
+
+    @property
+    def charge_buffer(self):
+        return read_only(self._charges)
+
+    @property
+    def state_buffer(self):
+        return read_only(self._states)
+
+    @property
+    def frame_buffer(self):
+        return read_only(self._frames)
+
+    def series(self):
+        """
+        Returns (frames, charges, states) ordered from the oldest to the newest frame. These are views of
+        the buffers until they wrap around, copies afterwards.
+        """
+        return self._series(self._frames, self._charges, self._states)
+
+    def latest(self):
+        """
+        Returns (frame, charges, states) of the last recorded frame, None when nothing was recorded.
+        """
+        if self.n_recorded == 0:
+            return None
+        cdef int row = (self.head + self.capacity - 1) % self.capacity
+        return int(self._frames[row]), read_only(self._charges[row]), read_only(self._states[row])
@@ -0,0 +1,20 @@
+from libc.stdint cimport int32_t
+from src.backend.models.ring_buffer cimport RingBuffer
+
+cdef enum:
+    N_REGIONS = 10 # values of CellTypeC
+    N_STATES = 6 # values of CellStateC
+
+
+cdef class RegionRecorder(RingBuffer):
+    cdef:
+        int32_t[:, :, ::1] counts
+        double[:, ::1] mean_charges
+        int32_t[::1] frames
+        object _counts
+        object _mean_charges
+        object _frames
+        readonly tuple region_names
+        readonly tuple state_names
+
+    cdef void store(self, const int32_t* chunk_counts, const double* chunk_charges, int n_chunks, int frame) noexcept nogil
@@ -0,0 +1,14 @@
+from typing import Tuple
+import numpy as np
+from src.backend.models.ring_buffer import RingBuffer
+
+class RegionRecorder(RingBuffer):
+    region_names: Tuple[str, ...]
+    state_names: Tuple[str, ...]
+    count_buffer: np.ndarray
+    charge_buffer: np.ndarray
+    frame_buffer: np.ndarray
+
+    def __init__(self, capacity: int = 2000) -> None: ...
+    def series(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]: ...
+    def region(self, name: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]: ...
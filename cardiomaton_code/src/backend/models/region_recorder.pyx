@@ -0,0 +1,95 @@
+from libc.stdint cimport int32_t
+cimport cython
+
+from src.backend.enums.cell_type cimport CellTypeC, type_to_pyenum
+from src.backend.enums.cell_state cimport CellStateC, cell_state_name
+from src.backend.models.ring_buffer cimport read_only
+
+import numpy as np
+
+
+cdef class RegionRecorder(RingBuffer):
+    """
+    Aggregates of the cells grouped by the cell type (region of the conduction system), recorded by the
+    automaton in every step: number of cells in every state and the mean charge of the region.
+    The automaton accumulates them per chunk of the grid in its update loop, the recorder merges the chunks.
+    """
+
+    def __init__(self, int capacity = 2000):
+        """
+        Args:
+            capacity int - number of frames kept in the buffers
+        """
+        if capacity <= 0:
+            raise ValueError("Region recorder capacity must be positive")
+
+        super().__init__(capacity)
+        self.region_names = tuple(type_to_pyenum(<CellTypeC> k).name for k in range(N_REGIONS))
+        self.state_names = tuple(cell_state_name(<CellStateC> k) for k in range(N_STATES))
+
+        self._counts = np.zeros((capacity, N_REGIONS, N_STATES), dtype=np.int32)
+        self._mean_charges = np.zeros((capacity, N_REGIONS), dtype=np.float64)
+        self._frames = np.zeros(capacity, dtype=np.int32)
+        self.counts = self._counts
+        self.mean_charges = self._mean_charges
+        self.frames = self._frames
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    @cython.cdivision(True)
+    cdef void store(self, const int32_t* chunk_counts, const double* chunk_charges, int n_chunks, int frame) noexcept nogil:
+        """
+        Merges the chunks accumulated in the step into the row of the frame. chunk_counts is indexed
+        by [chunk, region, state], chunk_charges by [chunk, region], both hold sums over the cells of the chunk.
+        """
+        cdef int chunk, region, state, total
+        cdef int32_t count
+        cdef int row = self.head
+        cdef double charge
+
+        for region in range(N_REGIONS):
+            total = 0
+            charge = 0.0
+            for state in range(N_STATES):
+                count = 0
+                for chunk in range(n_chunks):
+                    count = count + chunk_counts[(chunk * N_REGIONS + region) * N_STATES + state]
+                self.counts[row, region, state] = count
+                total += count
+            for chunk in range(n_chunks):
+                charge += chunk_charges[chunk * N_REGIONS + region]
+            self.mean_charges[row, region] = charge / total if total > 0 else 0.0
+
+        self.frames[row] = <int32_t> frame
+        self.advance()
+
+    @property
+    def count_buffer(self):
+        return read_only(self._counts)
+
+    @property
+    def charge_buffer(self):
+        return read_only(self._mean_charges)
+
+    @property
+    def frame_buffer(self):
+        return read_only(self._frames)
+
+    def series(self):
+        """
+        Returns (frames, counts, mean_charges) ordered from the oldest to the newest frame.
+        counts is indexed by [frame, region, state], mean_charges by [frame, region].
+        These are views of the buffers until they wrap around, copies afterwards.
+        """
+        return self._series(self._frames, self._counts, self._mean_charges)
+
+    def region(self, name):
+        """
+        Returns (frames, counts, mean_charge) of a single region, counts is indexed by [frame, state].
+
+        Throws:
+            ValueError - when the region name is unknown
+        """
+        idx = self.region_names.index(name)
+        frames, counts, charges = self.series()
+        return frames, counts[:, idx], charges[:, idx]
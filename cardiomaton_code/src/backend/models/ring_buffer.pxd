@@ -0,0 +1,13 @@
+cdef class RingBuffer:
+    cdef:
+        readonly int capacity
+        readonly int head
+        long long n_recorded
+
+    cdef void advance(self) noexcept nogil
+
+    cpdef void clear(self)
+
+
+cpdef object read_only(object array)
+cpdef tuple ordered(tuple buffers, int head, int capacity, long long n_recorded)
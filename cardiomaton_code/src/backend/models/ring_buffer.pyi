@@ -0,0 +1,14 @@
+from typing import Tuple
+import numpy as np
+
+class RingBuffer:
+    capacity: int
+    head: int
+    count: int
+    total: int
+
+    def __init__(self, capacity: int) -> None: ...
+    def clear(self) -> None: ...
+
+def read_only(array: np.ndarray) -> np.ndarray: ...
+def ordered(buffers: Tuple[np.ndarray, ...], head: int, capacity: int, n_recorded: int) -> Tuple[np.ndarray, ...]: ...
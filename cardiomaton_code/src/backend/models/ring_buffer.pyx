@@ -0,0 +1,71 @@
+import numpy as np
+
+
+cdef class RingBuffer:
+    """
+    Base of the recorders keeping one row per frame in numpy ring buffers. The subclass writes the row
+    at head and calls advance, python reads the buffers through read-only views.
+    """
+
+    def __init__(self, int capacity):
+        """
+        Args:
+            capacity int - number of frames kept in the buffers, checked by the subclass
+        """
+        self.capacity = capacity
+        self.head = 0
+        self.n_recorded = 0
+
+    cdef void advance(self) noexcept nogil:
+        """
+        Moves to the next row, called after the row at head is written.
+        """
+        self.head = (self.head + 1) % self.capacity
+        self.n_recorded += 1
+
+    @property
+    def count(self):
+        """
+        Number of valid rows in the buffers.
+        """
+        return <int> min(self.n_recorded, self.capacity)
+
+    @property
+    def total(self):
+        """
+        Number of frames recorded since the last clear, including the overwritten ones.
+        """
+        return self.n_recorded
+
+    cpdef void clear(self):
+        self.head = 0
+        self.n_recorded = 0
+
+    def _series(self, *buffers):
+        return ordered(buffers, self.head, self.capacity, self.n_recorded)
+
+
+cpdef object read_only(object array):
+    """
+    Returns the view of the array that can't be written through.
+    """
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+cpdef tuple ordered(tuple buffers, int head, int capacity, long long n_recorded):
+    """
+    Returns the rows of the ring buffers ordered from the oldest to the newest frame. These are read-only
+    views of the buffers until they wrap around, copies afterwards.
+
+    Args:
+        buffers tuple - arrays with one row per frame in the first axis
+        head int - row the next frame is written to
+        capacity int - number of rows of the buffers
+        n_recorded int - number of frames written since the last clear
+    """
+    if n_recorded <= capacity:
+        return tuple([read_only(buffer[:n_recorded]) for buffer in buffers])
+    order = np.r_[head:capacity, 0:head]
+    return tuple([buffer[order] for buffer in buffers])
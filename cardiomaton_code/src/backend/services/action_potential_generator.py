@@ -1,6 +1,6 @@
 import numpy as np
-from scipy.interpolate import PchipInterpolator
 from scipy.special import expit
+from src.update_strategies.charge_approx.pchip import pchip
 
 
 class ActionPotentialGenerator:
@@ -57,8 +57,7 @@ class ActionPotentialGenerator:
         knots_t = [t01, t12, t23, t34]
         knots_V = [V01, V12, V23, V34]
 
-        spline = PchipInterpolator(knots_t, knots_V)
-        P13 = spline(t_shift)
+        P13 = pchip(knots_t, knots_V, t_shift)
 
         V_cycle = np.where(t < t_rest, V34,
                            np.where(t_shift < t01, P0, P13))
@@ -94,8 +93,7 @@ class ActionPotentialGenerator:
 
         knots_t = [t01, t12, t23, t34]
         knots_V = [V01, V12, V23, V34]
-        spline = PchipInterpolator(knots_t, knots_V)
-        P13 = spline(t_shift)
+        P13 = pchip(knots_t, knots_V, t_shift)
 
         w40 = self._smooth_transition(t, t40, eps)
         P40 = (1 - w40) * P4 + w40 * P0
@@ -0,0 +1,35 @@
+from typing import Dict, Iterable, Optional, Tuple
+
+from src.backend.models.automaton import Automaton
+from src.backend.enums.cell_state import CellState
+
+
+def apply_cell_modification(automaton: Automaton, cells: Iterable[Tuple[int, int]], depolarize: bool = False,
+                            necrosis: bool = False, global_parameters: Optional[Dict[str, float]] = None,
+                            atrial_parameters: Optional[Dict[str, float]] = None,
+                            pacemaker_parameters: Optional[Dict[str, float]] = None,
+                            purkinje_parameters: Optional[Dict[str, float]] = None) -> None:
+    """
+    Applies the modification of the cells the same way as the parameter panel does. Depolarization only
+    changes the state of the cells. Other modifications commit the current automaton first, so they can be undone.
+
+    Args:
+        cells - positions of the modified cells
+        depolarize - depolarizes the cells and skips the other changes
+        necrosis - turns the cells into necrosis
+        global_parameters - parameters shared by all cell types, only propagation_time is used
+        atrial_parameters, pacemaker_parameters, purkinje_parameters - charge parameters of the cell types
+    """
+    positions = set(map(tuple, cells))
+    if depolarize:
+        automaton.modify_cell_state(positions, CellState.RAPID_DEPOLARIZATION)
+        return
+
+    automaton.commit_current_automaton()
+    if necrosis:
+        automaton.modify_cell_state(positions, CellState.NECROSIS)
+    global_parameters = global_parameters or {}
+    if "propagation_time" in global_parameters.keys():
+        automaton.modify_propagation_time(positions, global_parameters["propagation_time"])
+    automaton.modify_charge_data(positions, atrial_parameters or {}, pacemaker_parameters or {},
+                                 purkinje_parameters or {})
@@ -0,0 +1,79 @@
+from typing import Dict, List, Tuple
+import numpy as np
+
+# Electrode positions as fractions of the (rows, cols) shape of the automaton. Rows grow downwards and,
+# as in the anatomical view, the right side of the patient is on the left side of the image.
+LIMB_ELECTRODES: Dict[str, Tuple[float, float]] = {
+    "RA": (-0.1, -0.1),
+    "LA": (-0.1, 1.1),
+    "LL": (1.1, 0.6),
+}
+
+# Bipolar limb leads as (positive, negative) electrodes
+LIMB_LEADS: Dict[str, Tuple[str, str]] = {
+    "I": ("LA", "RA"),
+    "II": ("LL", "RA"),
+    "III": ("LL", "LA"),
+}
+
+_LATTICE_OFFSETS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+def electrode_field(positions: np.ndarray, electrode: Tuple[float, float], height: float) -> np.ndarray:
+    """
+    1/r of every cell to the electrode placed at the given height above the tissue plane,
+    the height keeps the field finite under the electrode.
+    """
+    diff = positions.astype(np.float64) - np.asarray(electrode, dtype=np.float64)
+    return 1.0 / np.sqrt(np.einsum("ij,ij->i", diff, diff) + height * height)
+
+
+def lattice_laplacian(positions: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Graph laplacian of the values over the 4-neighbourhood of the cell positions, missing neighbours
+    are skipped, so the laplacian of a constant is zero.
+    """
+    origin = positions.min(axis=0)
+    local = positions - origin
+    index = np.full(local.max(axis=0) + 3, -1, dtype=np.int64)
+    local = local + 1 # padding, the neighbours of the border cells stay inside the index
+    index[local[:, 0], local[:, 1]] = np.arange(len(positions))
+
+    result = np.zeros(len(positions), dtype=np.float64)
+    for dx, dy in _LATTICE_OFFSETS:
+        neighbours = index[local[:, 0] + dx, local[:, 1] + dy]
+        present = neighbours >= 0
+        result[present] += values[present] - values[neighbours[present]]
+    return result
+
+
+def lead_weights(positions: np.ndarray, shape: Tuple[int, int], leads: Dict[str, Tuple[str, str]] = LIMB_LEADS,
+                 electrodes: Dict[str, Tuple[float, float]] = LIMB_ELECTRODES,
+                 height: float = 10.0) -> Tuple[List[str], np.ndarray]:
+    """
+    Builds the weights of the pseudo-ECG leads, so that a lead is the weighted sum of the cell charges.
+    Pseudo-ECG is the integral of -grad(V) * grad(1/r), which on the lattice becomes the sum of V times the
+    laplacian of 1/r. Bipolar leads use the difference of the fields of both electrodes.
+
+    Args:
+        positions np.ndarray - (n_cells, 2) positions of the cells, in the order of the grid
+        shape tuple - (rows, cols) of the automaton, electrodes are placed relative to it
+        leads dict - lead name -> (positive, negative) electrode names
+        electrodes dict - electrode name -> (row, col) as fractions of the shape
+        height float - distance of the electrodes from the tissue plane, in cells
+
+    Returns:
+        (names, weights) - names of the leads and the (n_leads, n_cells) weight matrix
+    """
+    positions = np.asarray(positions)
+    rows, cols = shape
+    fields = {
+        name: electrode_field(positions, (fx * rows, fy * cols), height)
+        for name, (fx, fy) in electrodes.items()
+    }
+    names = list(leads.keys())
+    weights = np.empty((len(names), len(positions)), dtype=np.float64)
+    for k, name in enumerate(names):
+        positive, negative = leads[name]
+        weights[k] = -lattice_laplacian(positions, fields[positive] - fields[negative])
+    return names, weights
@@ -0,0 +1,358 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import copy
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import sqlite3
+import numpy as np
+
+# The backend is imported inside the functions, so a spawned worker can set OMP_NUM_THREADS
+# before the OpenMP runtime is loaded with the compiled modules.
+
+# Config keys outside of cell_data that can be swept, the rest of the names refer to cell_data
+CONFIG_KEYS = ("period", "range", "propagation_time", "propagation_time_max")
+ALL_TYPES = "*"
+
+# Metrics of every run, beats_<region> is added for each region of the RegionRecorder
+BASE_METRICS = ("activated_fraction", "mean_cycle_length", "ecg_ii_ptp")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sweep_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS sweep_runs (point INTEGER PRIMARY KEY, parameters TEXT NOT NULL, metrics TEXT NOT NULL);
+"""
+
+
+def grid(space: Dict[str, Sequence[float]]) -> List[Dict[str, float]]:
+    """
+    Returns the cartesian product of the values, e.g. grid({"SA_NODE.t40": [0.5, 0.7], "AV_NODE.range": [1800, 2200]}).
+    Keys are <cell type>.<parameter>, with * as the cell type for all cells.
+    """
+    keys = list(space)
+    return [dict(zip(keys, map(float, values))) for values in itertools.product(*(space[key] for key in keys))]
+
+
+def random_sample(space: Dict[str, Tuple[float, float]], n_points: int, seed: int = 0) -> List[Dict[str, float]]:
+    """
+    Returns n_points drawn uniformly from the (low, high) ranges. The same seed gives the same points,
+    which is what keeps a random sweep resumable.
+    """
+    rng = np.random.default_rng(seed)
+    keys = list(space)
+    values = rng.uniform([space[key][0] for key in keys], [space[key][1] for key in keys], size=(n_points, len(keys)))
+    return [dict(zip(keys, map(float, row))) for row in values]
+
+
+def parse_key(key: str) -> Tuple[str, str]:
+    """
+    Splits the sweep key into (cell type, parameter).
+
+    Throws:
+        ValueError - when the key is not in the <cell type>.<parameter> format
+    """
+    cell_type, _, parameter = key.partition(".")
+    if not cell_type or not parameter:
+        raise ValueError(f"Sweep key {key!r} has to be <cell type>.<parameter>")
+    return cell_type, parameter
+
+
+def apply_parameters(cell_map: Dict, parameters: Dict[str, float]) -> Dict:
+    """
+    Returns the cell map with the parameters applied. Only the cells of the swept types are copied, each of their
+    configs is copied once, and the charges are rebuilt with ChargeUpdate, whose cache keeps the tables of the
+    repeated configs. The cells in cell_map are not modified.
+
+    Throws:
+        ValueError - when a parameter isn't used by any config of the swept cell type
+    """
+    from src.update_strategies.charge_approx.charge_update import ChargeUpdate
+
+    updates: Dict[str, Dict[str, float]] = {}
+    for key, value in parameters.items():
+        cell_type, parameter = parse_key(key)
+        updates.setdefault(cell_type, {})[parameter] = value
+
+    patched_configs: Dict[int, Dict] = {}
+    used = set()
+    result = dict(cell_map)
+    for position, cell in cell_map.items():
+        changes = {**updates.get(ALL_TYPES, {}), **updates.get(cell.cell_type.name, {})}
+        if not changes:
+            continue
+        config = patched_configs.get(id(cell.config))
+        if config is None:
+            config = copy.deepcopy(cell.config)
+            for parameter, value in changes.items():
+                if parameter in CONFIG_KEYS:
+                    config[parameter] = value
+                elif parameter in config["cell_data"]:
+                    config["cell_data"][parameter] = value
+                else:
+                    continue
+                used.add((cell.cell_type.name, parameter))
+            patched_configs[id(cell.config)] = config
+
+        patched = copy.copy(cell)
+        patched.config = config
+        patched.cell_data = config["cell_data"]
+        patched.period = config["period"]
+        patched.n_range = config["range"]
+        patched.propagation_time = config.get("propagation_time")
+        patched.charges, patched.max_charge, patched.ref_threshold = ChargeUpdate.get_func(config)
+        patched.timer = min(cell.timer, len(patched.charges) - 1)
+        result[position] = patched
+
+    for cell_type, changes in updates.items():
+        for parameter in changes:
+            if not any(p == parameter and (cell_type == ALL_TYPES or t == cell_type) for t, p in used):
+                raise ValueError(f"No cell of type {cell_type} has the parameter {parameter}")
+    return result
+
+
+def run_point(cell_map: Dict, shape: Tuple[int, int], frame: int, parameters: Dict[str, float], steps: int,
+              warmup: int = 0) -> Dict[str, float]:
+    """
+    Simulates one point of the sweep headless and returns its summary metrics. The first warmup steps are
+    simulated but not measured.
+
+    Metrics:
+        activated_fraction - fraction of the cells activated during the measured steps
+        mean_cycle_length - mean frames between the last two activations, over the cells activated twice
+        ecg_ii_ptp - peak to peak amplitude of the lead II of the pseudo-ECG
+        beats_<region> - number of the activation waves in the region, counted as the frames in which the region
+                         goes from no cell in RAPID_DEPOLARIZATION or REPOLARIZATION_ABS_REF to at least one
+    """
+    from src.backend.models.automaton import Automaton
+    from src.backend.models.ecg_recorder import EcgRecorder
+    from src.backend.models.region_recorder import RegionRecorder
+    from src.backend.services.ecg_leads import lead_weights
+
+    automaton = Automaton(shape, apply_parameters(cell_map, parameters), img_ptr=0, img_bytes=0, frame=frame,
+                          buffer_size=1)
+    automaton.advance(warmup)
+    start = automaton.get_frame_counter()
+
+    capacity = max(steps, 1)
+    names, weights = lead_weights(automaton.get_positions(), automaton.get_shape())
+    ecg = EcgRecorder(weights, names, capacity)
+    regions = RegionRecorder(capacity)
+    automaton.attach_ecg(ecg)
+    automaton.attach_region_recorder(regions)
+    automaton.advance(steps)
+
+    last, previous = automaton.activation_times()
+    _, values = ecg.series()
+    _, counts, _ = regions.series()
+    return summarize(start, last, previous, values[:, list(ecg.lead_names).index("II")], counts,
+                     regions.region_names, regions.state_names)
+
+
+def run_batch(cell_map: Dict, shape: Tuple[int, int], frame: int, points: List[Dict[str, float]], steps: int,
+              warmup: int = 0) -> List[Dict[str, float]]:
+    """
+    Simulates the points together in one Ensemble, which shares the topology and the loop over the cells
+    between them, and returns the metrics of every point, the same as run_point would.
+    """
+    from src.backend.models.ensemble import Ensemble
+    from src.backend.services.ecg_leads import lead_weights
+
+    ensemble = Ensemble(shape, [apply_parameters(cell_map, parameters) for parameters in points], frame=frame)
+    ensemble.advance(warmup)
+    start = ensemble.get_frame_counter()
+
+    names, weights = lead_weights(ensemble.get_positions(), ensemble.get_shape())
+    ensemble.record(max(steps, 1), weights, names)
+    ensemble.advance(steps)
+
+    last, previous = ensemble.activation_times()
+    _, counts, values = ensemble.series()
+    lead = list(ensemble.lead_names).index("II")
+    return [summarize(start, last[k], previous[k], values[:, k, lead], counts[:, k], ensemble.region_names,
+                      ensemble.state_names) for k in range(len(points))]
+
+
+def summarize(start: int, last: np.ndarray, previous: np.ndarray, lead: np.ndarray, counts: np.ndarray,
+              region_names: Sequence[str], state_names: Sequence[str]) -> Dict[str, float]:
+    """
+    Computes the metrics of run_point from the activation times, the lead II series and the
+    [frame, region, state] counts of the measured steps, start is the frame before them.
+    """
+    activated = last > start
+    twice = activated & (previous >= 0)
+    # The absolute refractory period follows the depolarization, so a passing wave keeps the region active
+    states = list(state_names)
+    excited = (counts[:, :, states.index("RAPID_DEPOLARIZATION")]
+               + counts[:, :, states.index("REPOLARIZATION_ABS_REF")]) > 0
+
+    metrics = {
+        "activated_fraction": float(activated.mean()) if len(activated) else 0.0,
+        "mean_cycle_length": float((last - previous)[twice].mean()) if twice.any() else float("nan"),
+        "ecg_ii_ptp": float(np.ptp(lead)) if len(lead) else 0.0,
+    }
+    for k, region in enumerate(region_names):
+        active = excited[:, k]
+        metrics[f"beats_{region}"] = int(active[0]) + int(np.count_nonzero(active[1:] & ~active[:-1])) if len(active) else 0
+    return metrics
+
+
+# Per process state of the workers: (preset, cell map, shape, frame) of the loaded preset
+_worker_preset: Optional[Tuple] = None
+
+
+def _init_worker(threads: Optional[int]) -> None:
+    if threads is not None:
+        os.environ["OMP_NUM_THREADS"] = str(threads)
+    from src.backend.enums.cell_type import ConfigLoader
+    ConfigLoader.loadConfig()
+
+
+def _load_preset(preset: str) -> Tuple:
+    """
+    Returns the (cell map, shape, frame) of the preset, loaded once per process.
+    """
+    global _worker_preset
+    if _worker_preset is None or _worker_preset[0] != preset:
+        from src.database.repository.automaton_repository import get_repository
+        dto = get_repository().get_automaton(preset)
+        _worker_preset = (preset, dto.cell_map, dto.shape, dto.frame)
+    return _worker_preset[1:]
+
+
+def _run_task(preset: str, indices: List[int], points: List[Dict[str, float]], steps: int,
+              warmup: int) -> List[Tuple[int, Dict]]:
+    cell_map, shape, frame = _load_preset(preset)
+    if len(points) == 1:
+        return [(indices[0], run_point(cell_map, shape, frame, points[0], steps, warmup))]
+    return list(zip(indices, run_batch(cell_map, shape, frame, points, steps, warmup)))
+
+
+class ParameterSweep:
+    """
+    Runs the points of the sweep on a pool of worker processes and stores the metrics in a sqlite table.
+
+    Every worker loads the preset once and keeps it, together with the charge table cache of ChargeUpdate,
+    for all the points it runs. Each finished point is committed right away, so an interrupted sweep resumes
+    from the points missing in the table when it's run again with the same arguments.
+
+    With batch_size above 1 the points are sent to the workers in groups, each simulated in one Ensemble.
+    A group is committed when all of its points are finished.
+
+    The workers are spawned, so the script starting the sweep has to guard it with if __name__ == "__main__".
+    """
+
+    def __init__(self, preset: str, points: List[Dict[str, float]], steps: int, results_path: str, warmup: int = 0,
+                 workers: Optional[int] = None, threads_per_worker: Optional[int] = 1, batch_size: int = 1) -> None:
+        """
+        Args:
+            preset - name of the base preset in the database
+            points - parameters of the runs, see grid and random_sample
+            steps - number of measured steps of every run
+            results_path - sqlite file with the results, created when missing
+            warmup - steps simulated before the measurement
+            workers - number of processes, os.cpu_count() by default
+            threads_per_worker - OpenMP threads of every worker, None keeps the default of the runtime
+            batch_size - number of points simulated together by one worker
+
+        Throws:
+            ValueError - when the results file belongs to a different sweep or batch_size isn't positive
+        """
+        if batch_size <= 0:
+            raise ValueError("Batch size must be positive")
+        self.preset = preset
+        self.points = [dict(point) for point in points]
+        self.steps = steps
+        self.warmup = warmup
+        self.results_path = results_path
+        self.workers = workers or os.cpu_count() or 1
+        self.threads_per_worker = threads_per_worker
+        self.batch_size = batch_size
+        for point in self.points:
+            for key in point:
+                parse_key(key)
+
+        self._connection = sqlite3.connect(results_path)
+        self._connection.executescript(_SCHEMA)
+        self._check_meta()
+
+    def _check_meta(self) -> None:
+        description = json.dumps({"preset": self.preset, "steps": self.steps, "warmup": self.warmup,
+                                  "points": self.points}, sort_keys=True)
+        digest = hashlib.sha256(description.encode()).hexdigest()
+        row = self._connection.execute("SELECT value FROM sweep_meta WHERE key = 'digest'").fetchone()
+        if row is None:
+            with self._connection:
+                self._connection.execute("INSERT INTO sweep_meta VALUES ('digest', ?), ('description', ?)",
+                                         (digest, description))
+        elif row[0] != digest:
+            raise ValueError(f"{self.results_path} holds the results of a different sweep")
+
+    def completed(self) -> List[int]:
+        return [row[0] for row in self._connection.execute("SELECT point FROM sweep_runs ORDER BY point")]
+
+    def run(self, progress: Optional[Callable[[int, int], None]] = None) -> np.ndarray:
+        """
+        Runs the points missing in the results table. progress is called with (finished, total) after every point.
+
+        Returns:
+            np.ndarray - the results table, see load_results
+
+        Throws:
+            Exception - the first error of a worker, the points finished before it stay in the table
+        """
+        done = set(self.completed())
+        pending = [k for k in range(len(self.points)) if k not in done]
+        finished = len(done)
+        if progress is not None:
+            progress(finished, len(self.points))
+
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(self.workers, max(len(pending), 1)), mp_context=context,
+                                 initializer=_init_worker, initargs=(self.threads_per_worker,)) as pool:
+            batches = [pending[k:k + self.batch_size] for k in range(0, len(pending), self.batch_size)]
+            futures = {pool.submit(_run_task, self.preset, batch, [self.points[k] for k in batch], self.steps,
+                                   self.warmup) for batch in batches}
+            try:
+                while futures:
+                    completed, futures = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in completed:
+                        for point, metrics in future.result():
+                            with self._connection:
+                                self._connection.execute("INSERT OR REPLACE INTO sweep_runs VALUES (?, ?, ?)",
+                                                         (point, json.dumps(self.points[point]), json.dumps(metrics)))
+                            finished += 1
+                            if progress is not None:
+                                progress(finished, len(self.points))
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+        return load_results(self.results_path)
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+def load_results(results_path: str) -> np.ndarray:
+    """
+    Returns the results of the sweep as a structured array with the point index, one column per parameter
+    and one per metric, ordered by the point.
+    """
+    with sqlite3.connect(results_path) as connection:
+        rows = connection.execute("SELECT point, parameters, metrics FROM sweep_runs ORDER BY point").fetchall()
+    if not rows:
+        return np.zeros(0, dtype=[("point", np.int64)])
+    parameters = [json.loads(row[1]) for row in rows]
+    metrics = [json.loads(row[2]) for row in rows]
+    parameter_names = list(parameters[0])
+    metric_names = list(metrics[0])
+    dtype = [("point", np.int64), *((name, np.float64) for name in parameter_names),
+             *((name, np.float64) for name in metric_names)]
+    table = np.zeros(len(rows), dtype=dtype)
+    table["point"] = [row[0] for row in rows]
+    for name in parameter_names:
+        table[name] = [values[name] for values in parameters]
+    for name in metric_names:
+        table[name] = [values[name] for values in metrics]
+    return table
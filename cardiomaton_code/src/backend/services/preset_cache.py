@@ -0,0 +1,62 @@
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from datetime import datetime
+import threading
+
+from src.backend.models.automaton import Automaton
+from src.database.repository.automaton_repository import AutomatonRepository
+
+
+class PresetTemplateCache:
+    """
+    LRU cache of automaton templates, keyed by the preset name and its modification timestamp.
+
+    A template is an automaton built straight from the database entry, without the image and with a
+    minimal frame recorder. It's never stepped or modified, live automatons are restored from it with
+    Automaton.reset_from. Overwriting a preset changes its timestamp, so the stale template is never hit.
+    """
+
+    def __init__(self, repository: AutomatonRepository, capacity: int = 4) -> None:
+        self._repository = repository
+        self._capacity = capacity
+        self._templates: "OrderedDict[Tuple[str, Optional[datetime]], Automaton]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Automaton:
+        """
+        Returns the template for the preset, loading it from the database on a miss.
+
+        Throws:
+            RuntimeError - when there's no preset with the given name
+        """
+        key = (name, self._modified_at(name))
+        with self._lock:
+            template = self._templates.get(key)
+            if template is not None:
+                self._templates.move_to_end(key)
+                return template
+
+        dto = self._repository.get_automaton(name)
+        template = Automaton(dto.shape, dto.cell_map, img_ptr=0, img_bytes=0, frame=dto.frame, buffer_size=1)
+
+        with self._lock:
+            # Older versions of the same preset can't be hit anymore
+            for stale in [k for k in self._templates if k[0] == name]:
+                del self._templates[stale]
+            self._templates[key] = template
+            while len(self._templates) > self._capacity:
+                self._templates.popitem(last=False)
+        return template
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """
+        Drops the template of the given preset, or all of them if name is None.
+        """
+        with self._lock:
+            for key in [k for k in self._templates if name is None or k[0] == name]:
+                del self._templates[key]
+
+    def _modified_at(self, name: str) -> Optional[datetime]:
+        entries: Dict[str, Dict] = {entry["name"]: entry for entry in self._repository.list_entries()}
+        entry = entries.get(name)
+        return entry["modified_at"] if entry is not None else None
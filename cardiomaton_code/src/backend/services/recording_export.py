@@ -0,0 +1,261 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+import json
+import threading
+import zipfile
+import numpy as np
+
+from src.backend.models.automaton import Automaton
+
+# Columns of the exported frames as (column, field of snapshot_dtype, stored dtype). The state and
+# can_propagate fit in a byte, the remaining fields keep the width of the recorder.
+COLUMNS = (
+    ("state", "c_state", np.uint8),
+    ("charge", "charge", np.float32),
+    ("timer", "timer", np.int32),
+    ("can_propagate", "can_propagate", np.uint8),
+    ("propagation_count", "propagation_count", np.int32),
+    ("propagation_time", "propagation_time", np.int32),
+)
+
+INDEX_FILE = "index.json"
+POSITIONS_FILE = "positions.npy"
+FORMAT_VERSION = 1
+
+
+class RecordingExporter:
+    """
+    Streams frames to a directory of chunked columnar files. Every chunk holds up to chunk_frames frames
+    with one (n_frames, n_cells) array per column and the frame numbers. Without compression a chunk is
+    a directory of raw .npy files, which the readers can memory map, with a compression level (0-9) it's
+    a deflated .npz file. index.json lists the chunks and is written by close.
+
+    submit copies the frame into the current chunk on the calling thread, full chunks are written on one
+    background writer thread. At most max_pending chunks wait for the writer, submit blocks when the writer
+    falls behind, so the memory used by the exporter is bounded.
+    """
+
+    def __init__(self, path: Union[str, Path], positions: np.ndarray, chunk_frames: int = 256,
+                 compression: Optional[int] = None, max_pending: int = 4) -> None:
+        """
+        Throws:
+            ValueError - on the non positive chunk_frames or max_pending, or the compression level outside 0-9
+        """
+        if chunk_frames <= 0 or max_pending <= 0:
+            raise ValueError("chunk_frames and max_pending have to be positive")
+        if compression is not None and not 0 <= compression <= 9:
+            raise ValueError(f"Compression level has to be between 0 and 9, got {compression}")
+
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.chunk_frames = chunk_frames
+        self.compression = compression
+        self.positions = np.ascontiguousarray(positions, dtype=np.int32)
+        self.n_cells = len(self.positions)
+        np.save(self.path / POSITIONS_FILE, self.positions)
+
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="export-writer")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._chunks: List[Dict] = []
+        self._error: Optional[BaseException] = None
+        self._n_chunks = 0
+        self._closed = False
+        self.frames_written = 0
+        self._new_chunk()
+
+    def _new_chunk(self) -> None:
+        self._frames = np.empty(self.chunk_frames, dtype=np.int32)
+        self._columns = {name: np.empty((self.chunk_frames, self.n_cells), dtype=dtype)
+                         for name, _, dtype in COLUMNS}
+        self._size = 0
+
+    def submit(self, snapshot: np.ndarray, frame: int) -> None:
+        """
+        Adds one frame to the export.
+
+        Args:
+            snapshot np.ndarray - snapshot_dtype array of all cells (state_view().snapshot or frame_view)
+            frame int - number of the frame
+
+        Throws:
+            RuntimeError - when the exporter is closed or a previous chunk failed to write
+        """
+        self._check()
+        row = self._size
+        self._frames[row] = frame
+        for name, field, _ in COLUMNS:
+            self._columns[name][row] = snapshot[field]
+        self._size += 1
+        self.frames_written += 1
+        if self._size == self.chunk_frames:
+            self._queue_chunk()
+
+    def submit_many(self, snapshots: Iterable[np.ndarray], frames: Iterable[int]) -> None:
+        for snapshot, frame in zip(snapshots, frames):
+            self.submit(snapshot, frame)
+
+    def _check(self) -> None:
+        if self._closed:
+            raise RuntimeError("Exporter is closed")
+        if self._error is not None:
+            raise RuntimeError(f"Failed to write the chunk: {self._error}") from self._error
+
+    def _queue_chunk(self) -> None:
+        if self._size == 0:
+            return
+        number = self._n_chunks
+        self._n_chunks += 1
+        frames, columns, size = self._frames, self._columns, self._size
+        # The writer owns the arrays of the queued chunk, the next one gets new buffers
+        self._slots.acquire()
+        future = self._writer.submit(self._write_chunk, number, frames[:size], {k: v[:size] for k, v in columns.items()})
+        future.add_done_callback(self._chunk_done)
+        self._new_chunk()
+
+    def _chunk_done(self, future) -> None:
+        self._slots.release()
+        error = future.exception()
+        if error is not None and self._error is None:
+            self._error = error
+
+    def _write_chunk(self, number: int, frames: np.ndarray, columns: Dict[str, np.ndarray]) -> None:
+        if self.compression is None:
+            name = f"chunk_{number:05d}"
+            directory = self.path / name
+            directory.mkdir(exist_ok=True)
+            np.save(directory / "frame.npy", frames)
+            for column, values in columns.items():
+                np.save(directory / f"{column}.npy", values)
+        else:
+            name = f"chunk_{number:05d}.npz"
+            method = zipfile.ZIP_STORED if self.compression == 0 else zipfile.ZIP_DEFLATED
+            with zipfile.ZipFile(self.path / name, "w", compression=method, compresslevel=self.compression) as archive:
+                for column, values in (("frame", frames), *columns.items()):
+                    with archive.open(f"{column}.npy", "w", force_zip64=True) as file:
+                        np.lib.format.write_array(file, np.ascontiguousarray(values), allow_pickle=False)
+
+        with self._lock:
+            self._chunks.append({
+                "number": number,
+                "file": name,
+                "n_frames": int(len(frames)),
+                "first_frame": int(frames[0]),
+                "last_frame": int(frames[-1]),
+            })
+
+    def close(self) -> Path:
+        """
+        Writes the partial chunk, waits for the writer and writes the index. Safe to call repeatedly.
+
+        Returns:
+            Path - path of the index file
+
+        Throws:
+            RuntimeError - when any chunk failed to write, the index is not written then
+        """
+        if not self._closed:
+            if self._error is None:
+                self._queue_chunk()
+            self._closed = True
+            self._writer.shutdown(wait=True)
+            if self._error is not None:
+                raise RuntimeError(f"Failed to write the chunk: {self._error}") from self._error
+
+            with self._lock:
+                chunks = sorted(self._chunks, key=lambda chunk: chunk["number"])
+            index = {
+                "version": FORMAT_VERSION,
+                "n_cells": self.n_cells,
+                "n_frames": self.frames_written,
+                "compression": self.compression,
+                "positions": POSITIONS_FILE,
+                "columns": {"frame": np.dtype(np.int32).str,
+                            **{name: np.dtype(dtype).str for name, _, dtype in COLUMNS}},
+                "chunks": chunks,
+            }
+            with open(self.path / INDEX_FILE, "w") as file:
+                json.dump(index, file, indent=1)
+        return self.path / INDEX_FILE
+
+    def __enter__(self) -> "RecordingExporter":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            # Don't mask the original error, the export is incomplete anyway
+            self._closed = True
+            self._writer.shutdown(wait=True)
+
+
+def export_recorded(automaton: Automaton, path: Union[str, Path], **options) -> Path:
+    """
+    Exports the frames kept by the frame recorder of the automaton, from the oldest to the newest.
+    options are passed to RecordingExporter.
+
+    Returns:
+        Path - path of the index file
+    """
+    count = automaton.get_buffer_size()
+    newest = automaton.get_frame_counter()
+    with RecordingExporter(path, automaton.get_positions(), **options) as exporter:
+        for back in range(count, 0, -1):
+            exporter.submit(automaton.frame_view(-back), newest - back + 1)
+    return exporter.close()
+
+
+def export_run(automaton: Automaton, path: Union[str, Path], n_frames: int, show_charge: bool = False,
+               **options) -> Path:
+    """
+    Advances the automaton by n_frames, exporting every frame. The frames are read straight from the recorder,
+    the simulation only waits for the writer when it's more than max_pending chunks behind.
+    options are passed to RecordingExporter.
+
+    Returns:
+        Path - path of the index file
+    """
+    with RecordingExporter(path, automaton.get_positions(), **options) as exporter:
+        for _ in range(n_frames):
+            automaton.update_grid(show_charge)
+            view = automaton.state_view()
+            exporter.submit(view.snapshot, view.frame)
+    return exporter.close()
+
+
+def read_recording(path: Union[str, Path], columns: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+    """
+    Reads the exported recording back as one array per column, (n_frames, n_cells) for the cell columns
+    and (n_frames,) for frame, plus the (n_cells, 2) positions.
+
+    Args:
+        path - directory of the export
+        columns - names of the columns to read, all of them by default
+
+    Throws:
+        FileNotFoundError - when the export has no index, e.g. it wasn't closed
+    """
+    path = Path(path)
+    with open(path / INDEX_FILE) as file:
+        index = json.load(file)
+    names = list(index["columns"]) if columns is None else ["frame", *[c for c in columns if c != "frame"]]
+
+    parts: Dict[str, List[np.ndarray]] = {name: [] for name in names}
+    for chunk in index["chunks"]:
+        if index["compression"] is None:
+            for name in names:
+                parts[name].append(np.load(path / chunk["file"] / f"{name}.npy", mmap_mode="r"))
+        else:
+            with np.load(path / chunk["file"]) as archive:
+                for name in names:
+                    parts[name].append(archive[name])
+
+    result = {}
+    for name in names:
+        dtype = np.dtype(index["columns"][name])
+        shape = (0,) if name == "frame" else (0, index["n_cells"])
+        result[name] = np.concatenate(parts[name]) if parts[name] else np.empty(shape, dtype=dtype)
+    result["positions"] = np.load(path / index["positions"])
+    return result
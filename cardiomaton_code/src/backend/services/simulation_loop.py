@@ -1,6 +1,10 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
 from PyQt6.QtCore import QTimer, QObject, pyqtSignal
 
-from src.backend.controllers.simulation_controller import SimulationController
+if TYPE_CHECKING:
+    from src.backend.controllers.simulation_controller import SimulationController
+
 
 class SimulationRunner(QObject):
     frame_tick = pyqtSignal()
@@ -1,13 +1,22 @@
-from typing import Dict, Optional, Tuple
+from typing import Dict, Iterable, Optional, Tuple
+from pathlib import Path
+import numpy as np
 from src.models.cell import CellDict
-from src.utils.graph_builder import extract_conduction_pixels
-from src.models.cellular_graph import Space
-from src.backend.models.automaton import Automaton
-from src.backend.enums.cell_state import CellState
+from src.backend.models.automaton import Automaton, CellBatch, CellStatic
+from src.backend.models.probe_recorder import ProbeRecorder
+from src.backend.models.ecg_recorder import EcgRecorder
+from src.backend.models.region_recorder import RegionRecorder
+from src.backend.models.event_log import EventLog
+from src.backend.services.ecg_leads import lead_weights
+from src.backend.services.recording_export import RecordingExporter, export_recorded
+from src.backend.services.video_export import VideoExporter, rgba_view
+from src.backend.services.cell_modifications import apply_cell_modification
 from PyQt6.QtGui import QImage
 
-from src.database.db import init_db, SessionLocal
-from src.database.crud.automaton_crud import get_automaton, create_or_overwrite_entry
+from concurrent.futures import Future
+
+from src.database.repository.automaton_repository import get_repository
+from src.backend.services.preset_cache import PresetTemplateCache
 from src.database.dto.automaton_dto import AutomatonDto
 
 class SimulationService:
@@ -30,35 +39,45 @@ class SimulationService:
         ptr = image.bits()
         if hasattr(ptr, "setsize"):
             ptr.setsize(image.bytesPerLine() * image.height())
-        init_db()
-        db = SessionLocal()
+        self.repository = get_repository()
+        self.templates = PresetTemplateCache(self.repository)
         self.current_automaton_preset = "PHYSIOLOGICAL"
-        dto = get_automaton(db, "PHYSIOLOGICAL")
+        dto = self.repository.get_automaton("PHYSIOLOGICAL")
 
 
         self.automaton = Automaton(dto.shape, dto.cell_map, img_ptr = int(ptr), img_bytes=image.bytesPerLine(), frame=dto.frame, frame_time=self.ft)
+        self.ecg: Optional[EcgRecorder] = None
+        self.region_stats: Optional[RegionRecorder] = None
+        self.event_log: Optional[EventLog] = None
+        self.exporter: Optional[RecordingExporter] = None
+        self.video: Optional[VideoExporter] = None
         # self.automaton = Automaton(graph.shape, cell_map, int(ptr), image.bytesPerLine(), frame_time=self.frame_time)
 
     def update_automaton(self, automaton: AutomatonDto, image: QImage):
         ptr = image.bits()
         if hasattr(ptr, "setsize"):
             ptr.setsize(image.bytesPerLine() * image.height())
-        self.automaton = Automaton(automaton.shape, automaton.cell_map, img_ptr=int(ptr), img_bytes=image.bytesPerLine(), frame=automaton.frame)
+        self._replace_automaton(Automaton(automaton.shape, automaton.cell_map, img_ptr=int(ptr), img_bytes=image.bytesPerLine(), frame=automaton.frame))
         self.current_automaton_preset = automaton.name
 
-    def save_automaton(self, entry: str) -> bool:
-        automaton = self.automaton.serialize_automaton()
-        shape = self.automaton.get_shape()
-        frame = self.automaton.get_frame_counter()
+    def load_preset(self, entry: str) -> AutomatonDto:
+        return self.repository.get_automaton(entry)
 
+    def save_automaton(self, entry: str) -> bool:
         try:
-            db = SessionLocal()
-            res = create_or_overwrite_entry(db, entry, automaton.values(), shape[0], shape[1], frame)
-            return True
+            return self.save_automaton_async(entry).result()
         except Exception as e:
             print(f"Failed to save the entry: {e}")
             return False
 
+    def save_automaton_async(self, entry: str) -> Future:
+        """
+        Copies the automaton and queues the save on the database writer thread.
+
+        Returns:
+            Future[bool] - resolves when the entry is committed
+        """
+        return self.repository.save_automaton(entry, self.automaton)
 
     def step(self, if_charged: bool) -> int:#Tuple[int, Dict[Tuple[int, int], CellDict]]:
         """
@@ -68,6 +87,11 @@ class SimulationService:
             mapping of the cell position to the cell state
         """
         self.automaton.update_grid(if_charged)
+        if self.exporter is not None:
+            view = self.automaton.state_view()
+            self.exporter.submit(view.snapshot, view.frame)
+        if self.video is not None:
+            self.video.submit(self._image_view())
         return self.automaton.to_cell_data()
 
     def update_cell(self, data: CellDict) -> None:
@@ -81,43 +105,208 @@ class SimulationService:
         #self.automaton.update_cell_from_dict(data)
 
     def modify_cells(self, modification):
-        cells_positions = modification.cells
-        if modification.depolarize: # cell depolarization
-            self.automaton.modify_cell_state(cells_positions, CellState.RAPID_DEPOLARIZATION)
-            return
-
-        self.automaton.commit_current_automaton() # cell modification
-        if modification.necrosis_enabled:
-            self.automaton.modify_cell_state(cells_positions, CellState.NECROSIS)
-        if "propagation_time" in modification.global_parameters.keys():
-            self.automaton.modify_propagation_time(cells_positions, modification.global_parameters["propagation_time"])
-        self.automaton.modify_charge_data(cells_positions,
-                                          modification.atrial_charge_parameters,
-                                          modification.pacemaker_charge_parameters,
-                                          modification.purkinje_charge_parameters)
+        apply_cell_modification(self.automaton, modification.cells,
+                                depolarize=modification.depolarize,
+                                necrosis=modification.necrosis_enabled,
+                                global_parameters=modification.global_parameters,
+                                atrial_parameters=modification.atrial_charge_parameters,
+                                pacemaker_parameters=modification.pacemaker_charge_parameters,
+                                purkinje_parameters=modification.purkinje_charge_parameters)
         # self.automaton.modify_cells(modification)
 
     def undo_modification(self):
         self.automaton.undo_modification()
 
     def restart_automaton(self):
-        init_db()
-        db = SessionLocal()
+        self._restore_preset(self.current_automaton_preset)
 
-        dto = get_automaton(db, self.current_automaton_preset)
+    def select_preset(self, entry: str) -> None:
+        """
+        Switches the simulation to the preset with the given name.
+        """
+        self._restore_preset(entry)
+        self.current_automaton_preset = entry
+
+    def _restore_preset(self, entry: str) -> None:
+        """
+        Restores the automaton from the cached template of the preset. Presets built on the same
+        mesh are copied into the current grids, otherwise a new automaton is constructed straight
+        from the database entry, without building the template that couldn't be used.
+        """
+        if self._same_mesh(entry):
+            try:
+                self.automaton.reset_from(self.templates.get(entry))
+                return
+            except ValueError:
+                pass
+
+        dto = self.repository.get_automaton(entry)
 
         ptr = self.image.bits()
         if hasattr(ptr, "setsize"):
             ptr.setsize(self.image.bytesPerLine() * self.image.height())
 
-        self.automaton = Automaton(
+        self._replace_automaton(Automaton(
             dto.shape,
             dto.cell_map,
             img_ptr=int(ptr),
             img_bytes=self.image.bytesPerLine(),
             frame=dto.frame,
             frame_time=self.ft
-        )
+        ))
+
+    def _same_mesh(self, entry: str) -> bool:
+        """
+        Checks from the cached listing if the preset shares the topology of the current one.
+        Entries saved without the topology (older format) are treated as a different mesh.
+        """
+        if entry == self.current_automaton_preset:
+            return True
+        topologies = {e["name"]: e.get("topology_id") for e in self.repository.list_entries()}
+        current = topologies.get(self.current_automaton_preset)
+        return current is not None and current == topologies.get(entry)
+
+    def _replace_automaton(self, automaton: Automaton) -> None:
+        """
+        Swaps the simulated automaton, moving the probes to the new one. Probes on the cells missing
+        in the new mesh are dropped.
+        """
+        for probe in self.automaton.get_probes():
+            probe.clear()
+            try:
+                automaton.attach_probe(probe)
+            except ValueError:
+                pass
+        if self.ecg is not None:
+            self.ecg.clear()
+            self.ecg.set_weights(lead_weights(automaton.get_positions(), automaton.get_shape())[1])
+            automaton.attach_ecg(self.ecg)
+        if self.region_stats is not None:
+            self.region_stats.clear()
+            automaton.attach_region_recorder(self.region_stats)
+        if self.event_log is not None:
+            automaton.attach_event_log(self.event_log)
+        if self.exporter is not None and not np.array_equal(self.exporter.positions, automaton.get_positions()):
+            # Columns of the export are laid out for the old mesh
+            self.stop_export()
+        self.automaton = automaton
+
+    def add_probe(self, positions: Iterable[Tuple[int, int]], capacity: int = 500) -> ProbeRecorder:
+        """
+        Starts recording the charge and the state of the given cells, see Automaton.add_probe.
+        """
+        return self.automaton.add_probe(list(positions), capacity)
+
+    def remove_probe(self, probe: ProbeRecorder) -> None:
+        self.automaton.remove_probe(probe)
+
+    def activation_map(self) -> np.ndarray:
+        return self.automaton.activation_map()
+
+    def cycle_length_map(self) -> np.ndarray:
+        return self.automaton.cycle_length_map()
+
+    def enable_ecg(self, capacity: int = 2000) -> EcgRecorder:
+        """
+        Starts computing the pseudo-ECG limb leads in every step. The recorder is kept when the automaton
+        is replaced, its weights are rebuilt for the new mesh.
+        """
+        if self.ecg is None:
+            names, weights = lead_weights(self.automaton.get_positions(), self.automaton.get_shape())
+            self.ecg = EcgRecorder(weights, names, capacity)
+            self.automaton.attach_ecg(self.ecg)
+        return self.ecg
+
+    def disable_ecg(self) -> None:
+        if self.ecg is not None:
+            self.automaton.remove_ecg(self.ecg)
+            self.ecg = None
+
+    def enable_region_stats(self, capacity: int = 2000) -> RegionRecorder:
+        """
+        Starts recording the state counts and the mean charge of every region in each step.
+        The recorder is kept when the automaton is replaced.
+        """
+        if self.region_stats is None:
+            self.region_stats = RegionRecorder(capacity)
+            self.automaton.attach_region_recorder(self.region_stats)
+        return self.region_stats
+
+    def disable_region_stats(self) -> None:
+        if self.region_stats is not None:
+            self.automaton.remove_region_recorder(self.region_stats)
+            self.region_stats = None
+
+    def enable_event_log(self, path: Optional[str] = None) -> EventLog:
+        """
+        Starts logging the state transitions of the cells, streamed to the file when the path is given.
+        The log restarts from the new states when the automaton is replaced.
+        """
+        if self.event_log is None:
+            self.event_log = EventLog(path=path)
+            self.automaton.attach_event_log(self.event_log)
+        return self.event_log
+
+    def disable_event_log(self) -> None:
+        if self.event_log is not None:
+            self.automaton.remove_event_log(self.event_log)
+            self.event_log.flush()
+            self.event_log = None
+
+    def start_export(self, path: str, chunk_frames: int = 256, compression: Optional[int] = None) -> RecordingExporter:
+        """
+        Starts streaming every simulated frame to the chunked export in the given directory,
+        see RecordingExporter. The export is stopped when the automaton is replaced with a different mesh.
+        """
+        if self.exporter is None:
+            self.exporter = RecordingExporter(path, self.automaton.get_positions(), chunk_frames, compression)
+        return self.exporter
+
+    def stop_export(self) -> Optional[Path]:
+        """
+        Finishes the export started with start_export.
+
+        Returns:
+            Path - path of the index file, None when nothing was exported
+        """
+        if self.exporter is None:
+            return None
+        exporter, self.exporter = self.exporter, None
+        return exporter.close()
+
+    def export_recorded(self, path: str, chunk_frames: int = 256, compression: Optional[int] = None) -> Path:
+        """
+        Exports the frames kept by the frame recorder, see recording_export.export_recorded.
+        """
+        return export_recorded(self.automaton, path, chunk_frames=chunk_frames, compression=compression)
+
+    def start_video(self, path: str, fps: float = 30.0, resolution: Optional[Tuple[int, int]] = None,
+                    stride: int = 1) -> VideoExporter:
+        """
+        Starts encoding the image drawn in every step to the video file, see VideoExporter.
+        The render mode follows the if_charged argument of step.
+        """
+        if self.video is None:
+            self.video = VideoExporter(path, (self.image.width(), self.image.height()), fps, resolution, stride)
+        return self.video
+
+    def stop_video(self) -> Optional[Path]:
+        """
+        Finishes the video started with start_video.
+
+        Returns:
+            Path - path of the video, None when nothing was recorded
+        """
+        if self.video is None:
+            return None
+        video, self.video = self.video, None
+        return video.close()
+
+    def _image_view(self) -> np.ndarray:
+        ptr = self.image.bits()
+        if hasattr(ptr, "setsize"):
+            ptr.setsize(self.image.bytesPerLine() * self.image.height())
+        return rgba_view(ptr, self.image.height(), self.image.width(), self.image.bytesPerLine())
 
     @property
     def frame_time(self) -> float:
@@ -148,6 +337,15 @@ class SimulationService:
         """
         return self.automaton.get_cell_data(position)
     
+    def get_cells(self, positions) -> CellBatch:
+        """
+        Returns the data of all cells under the positions in one call, see Automaton.get_cells.
+        """
+        return self.automaton.get_cells(positions)
+
+    def get_cell_static(self, position: Tuple[int, int]) -> Optional[CellStatic]:
+        return self.automaton.get_cell_static(position)
+
     def get_buffer_size(self) -> int:
         return self.automaton.get_buffer_size()
     
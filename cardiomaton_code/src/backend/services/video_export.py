@@ -0,0 +1,162 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Tuple, Union
+import threading
+import numpy as np
+
+from src.backend.models.automaton import Automaton
+from src.backend.utils.draw_functions import IMAGE_SHAPE
+
+# FourCC codes picked from the extension of the output file
+CODECS = {
+    ".mp4": "mp4v",
+    ".avi": "MJPG",
+}
+
+
+def create_frame_buffer() -> np.ndarray:
+    """
+    Returns the zeroed (height, width, 4) RGBA buffer the automaton can draw on, for headless runs.
+    Pass buffer.ctypes.data as img_ptr and buffer.strides[0] as img_bytes to the Automaton.
+    """
+    return np.zeros((*IMAGE_SHAPE, 4), dtype=np.uint8)
+
+
+def rgba_view(ptr, height: int, width: int, bytes_per_line: int) -> np.ndarray:
+    """
+    Returns the (height, width, 4) array aliasing an RGBA image with the given stride, e.g. the bits of a QImage.
+    """
+    rows = np.frombuffer(ptr, dtype=np.uint8, count=height * bytes_per_line).reshape(height, bytes_per_line)
+    return rows[:, :width * 4].reshape(height, width, 4)
+
+
+class VideoExporter:
+    """
+    Encodes the rendered RGBA frames to a video file with OpenCV's VideoWriter.
+
+    submit keeps every stride-th frame, scales it to the output resolution and converts it to BGR on
+    the calling thread, one vectorized pass that also copies the frame out of the drawn buffer. Encoding
+    runs on one background writer thread. At most max_pending converted frames wait for the encoder,
+    submit blocks when it falls behind, so the memory is bounded.
+    """
+
+    def __init__(self, path: Union[str, Path], source_size: Tuple[int, int] = (IMAGE_SHAPE[1], IMAGE_SHAPE[0]),
+                 fps: float = 30.0, resolution: Optional[Tuple[int, int]] = None, stride: int = 1,
+                 codec: Optional[str] = None, max_pending: int = 8) -> None:
+        """
+        Args:
+            path - output file, the codec is picked from its extension (.mp4 or .avi) unless given
+            source_size - (width, height) of the submitted frames
+            fps - frame rate of the video
+            resolution - (width, height) of the video, source_size by default
+            stride - every stride-th submitted frame is encoded
+            codec - FourCC code, overrides the one picked from the extension
+
+        Throws:
+            ValueError - on the unknown extension without the codec, or non positive stride, fps or max_pending
+            RuntimeError - when OpenCV can't open the writer
+        """
+        # OpenCV loads only when the video is exported, it's not on the startup path of the GUI
+        import cv2
+
+        self.path = Path(path)
+        if codec is None:
+            codec = CODECS.get(self.path.suffix.lower())
+            if codec is None:
+                raise ValueError(f"Unknown video extension {self.path.suffix!r}, pass the codec")
+        if stride <= 0 or fps <= 0 or max_pending <= 0:
+            raise ValueError("stride, fps and max_pending have to be positive")
+
+        self.source_size = tuple(source_size)
+        self.resolution = tuple(resolution) if resolution is not None else self.source_size
+        self.stride = stride
+        self.frames_submitted = 0
+        self.frames_written = 0
+
+        self._video = cv2.VideoWriter(str(self.path), cv2.VideoWriter_fourcc(*codec), fps, self.resolution)
+        if not self._video.isOpened():
+            raise RuntimeError(f"Failed to open the video writer for {self.path} ({codec})")
+
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="video-writer")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._error: Optional[BaseException] = None
+        self._closed = False
+
+    def submit(self, rgba: np.ndarray) -> None:
+        """
+        Adds one (height, width, 4) RGBA frame. The frame is converted before returning,
+        so the buffer can be drawn on right after.
+
+        Throws:
+            RuntimeError - when the exporter is closed or the encoding failed
+        """
+        if self._closed:
+            raise RuntimeError("Exporter is closed")
+        if self._error is not None:
+            raise RuntimeError(f"Failed to encode the frame: {self._error}") from self._error
+
+        self.frames_submitted += 1
+        if (self.frames_submitted - 1) % self.stride != 0:
+            return
+
+        import cv2
+
+        if self.resolution != self.source_size:
+            # Downscaling before the conversion, so the color pass runs on the smaller image
+            rgba = cv2.resize(rgba, self.resolution, interpolation=cv2.INTER_AREA)
+        bgr = cv2.cvtColor(rgba, cv2.COLOR_RGBA2BGR)
+
+        self._slots.acquire()
+        future = self._writer.submit(self._video.write, bgr)
+        future.add_done_callback(self._frame_done)
+        self.frames_written += 1
+
+    def _frame_done(self, future) -> None:
+        self._slots.release()
+        error = future.exception()
+        if error is not None and self._error is None:
+            self._error = error
+
+    def close(self) -> Path:
+        """
+        Waits for the queued frames and finalizes the file. Safe to call repeatedly.
+
+        Throws:
+            RuntimeError - when any frame failed to encode
+        """
+        if not self._closed:
+            self._closed = True
+            self._writer.shutdown(wait=True)
+            self._video.release()
+            if self._error is not None:
+                raise RuntimeError(f"Failed to encode the frame: {self._error}") from self._error
+        return self.path
+
+    def __enter__(self) -> "VideoExporter":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._closed = True
+            self._writer.shutdown(wait=True)
+            self._video.release()
+
+
+def export_video_run(automaton: Automaton, buffer: np.ndarray, path: Union[str, Path], n_frames: int,
+                     show_charge: bool = False, **options) -> Path:
+    """
+    Advances the automaton by n_frames and encodes every drawn frame.
+    The automaton has to draw on the buffer, see create_frame_buffer.
+    options are passed to VideoExporter.
+
+    Args:
+        show_charge - render mode, charge colors instead of the state colors
+    """
+    height, width = buffer.shape[:2]
+    with VideoExporter(path, (width, height), **options) as exporter:
+        for _ in range(n_frames):
+            automaton.update_grid(show_charge)
+            exporter.submit(buffer)
+    return exporter.close()
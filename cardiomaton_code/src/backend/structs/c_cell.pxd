@@ -1,4 +1,4 @@
-from libc.stdlib cimport malloc, free
+from libc.stdlib cimport malloc, realloc, free
 from libc.string cimport memcpy
 
 from src.backend.enums.cell_state cimport CellStateC
@@ -33,8 +33,9 @@ cdef struct CCell:
     int period
     int timer 
 
-    double* charges # Needs manual allocation and deallocation!
+    double* charges # Needs manual allocation and deallocation when owns_charges is set!
     int n_charges
+    int owns_charges # 0 when charges point to a table shared between cells
     int charge_max
 
     double V_thresh
@@ -53,11 +54,13 @@ cdef struct CCell:
 # helper functions
 cdef CCell* create_c_cell(int, int)
 cdef void add_cell_charges(CCell*, double[:])
+cdef void set_shared_charges(CCell*, double*, int) noexcept nogil
 cdef void allocate_neighbors(CCell*, int)
 cdef void free_cell_charges(CCell*)
 cdef void free_c_cell(CCell*)
 cdef CCell* create_mimic_cell(CCell* src)
 cdef void recreate_cell_from_mimic(CCell* dst, CCell* src)
+cdef void copy_cell_state(CCell* dst, CCell* src) noexcept nogil
 
 cdef dict cell_to_dict(CCell*, dict)
 
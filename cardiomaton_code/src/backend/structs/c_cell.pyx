@@ -1,4 +1,4 @@
-from libc.stdlib cimport malloc, free
+from libc.stdlib cimport malloc, realloc, free
 from libc.string cimport memcpy
 from libc.stdio cimport printf
 from src.backend.enums.cell_state cimport CellStateC, cell_state_name
@@ -50,6 +50,7 @@ cdef CCell* create_c_cell(int pos_x, int pos_y):
 
     c_cell.charges = NULL
     c_cell.n_charges = 0
+    c_cell.owns_charges = 0
     c_cell.charge_max = 0
 
     return c_cell 
@@ -78,11 +79,29 @@ cdef void add_cell_charges(CCell* cell, double[:] py_charges):
     if cell.n_charges > 0 and cell.charges == NULL:
         free(cell)
         raise MemoryError()
+    cell.owns_charges = 1
 
     cdef int i
     for i in range(cell.n_charges):
         cell.charges[i] = py_charges[i]
 
+cdef void set_shared_charges(CCell* cell, double* charges, int n_charges) noexcept nogil:
+    """
+    Points the cell to the charges table owned by someone else (for example the charge table pool
+    of the automaton), so that cells with the same config don't hold copies of the same table.
+    Frees the previous table if the cell owned it.
+
+    Args:
+        cell CCell* - pointer to the cell
+        charges double* - shared table, must outlive the cell
+        n_charges int - length of the table
+    """
+    if cell.owns_charges and cell.charges != NULL:
+        free(cell.charges)
+    cell.charges = charges
+    cell.n_charges = n_charges
+    cell.owns_charges = 0
+
 cdef void allocate_neighbors(CCell* cell, int size):
     """
     Function to allocate the memory for the cell neighbors.
@@ -122,9 +141,11 @@ cdef void free_cell_charges(CCell* cell):
     if cell == NULL:
         raise RuntimeWarning("Trying to free memory from the NULL pointer")
     if cell.charges != NULL:
-        free(cell.charges)
+        if cell.owns_charges:
+            free(cell.charges)
         cell.charges = NULL
         cell.n_charges = 0
+        cell.owns_charges = 0
 
 cdef void free_c_cell(CCell* cell):
     """
@@ -242,9 +263,10 @@ cdef CCell* create_mimic_cell(CCell* src):
     memcpy(dst, src, sizeof(CCell))
 
     dst.neighbors = NULL
+    dst.n_neighbors = 0
 
-
-    if src.charges != NULL:
+    # Shared tables are never modified in place, so the snapshot can point to the same one
+    if src.charges != NULL and src.owns_charges:
         dst.charges = <double*> malloc(src.n_charges * sizeof(double))
         memcpy(dst.charges, src.charges, src.n_charges * sizeof(double))
 
@@ -271,24 +293,35 @@ cdef void recreate_cell_from_mimic(CCell* dst, CCell* mimic):
     dst.period = mimic.period
     dst.timer = mimic.timer
 
-    dst.n_charges = mimic.n_charges
     dst.charge_max = mimic.charge_max
 
-    if mimic.charges != NULL and mimic.n_charges > 0:
+    if mimic.charges != NULL and mimic.n_charges > 0 and not mimic.owns_charges:
+        set_shared_charges(dst, mimic.charges, mimic.n_charges)
 
+    elif mimic.charges != NULL and mimic.n_charges > 0:
+
+        if not dst.owns_charges:
+            # Never write into the shared table
+            dst.charges = NULL
         if dst.charges == NULL or dst.n_charges != mimic.n_charges:
             if dst.charges != NULL:
                 free(dst.charges)
             dst.charges = <double*> malloc(mimic.n_charges * sizeof(double))
             if dst.charges == NULL:
+                dst.n_charges = 0
+                dst.owns_charges = 0
                 return
 
         memcpy(dst.charges, mimic.charges, mimic.n_charges * sizeof(double))
+        dst.n_charges = mimic.n_charges
+        dst.owns_charges = 1
 
     else:
-        if dst.charges != NULL:
+        if dst.charges != NULL and dst.owns_charges:
             free(dst.charges)
         dst.charges = NULL
+        dst.n_charges = 0
+        dst.owns_charges = 0
 
     # Voltage model parameters
     dst.V_thresh = mimic.V_thresh
@@ -300,4 +333,27 @@ cdef void recreate_cell_from_mimic(CCell* dst, CCell* mimic):
     dst.propagation_time = mimic.propagation_time
     dst.propagation_time_max = mimic.propagation_time_max
     dst.can_propagate = mimic.can_propagate
-    dst.propagation_count = mimic.propagation_count
\ No newline at end of file
+    dst.propagation_count = mimic.propagation_count
+
+cdef void copy_cell_state(CCell* dst, CCell* src) noexcept nogil:
+    """
+    Copies the whole state of src into dst, except for the neighbors and the charges table.
+    Caller is responsible for pointing dst to the right charges table.
+
+    Args:
+        dst CCell* - target cell
+        src CCell* - source cell
+    """
+    cdef CCell** neighbors = dst.neighbors
+    cdef int n_neighbors = dst.n_neighbors
+    cdef double* charges = dst.charges
+    cdef int n_charges = dst.n_charges
+    cdef int owns_charges = dst.owns_charges
+
+    memcpy(dst, src, sizeof(CCell))
+
+    dst.neighbors = neighbors
+    dst.n_neighbors = n_neighbors
+    dst.charges = charges
+    dst.n_charges = n_charges
+    dst.owns_charges = owns_charges
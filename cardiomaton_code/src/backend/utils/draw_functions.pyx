@@ -26,6 +26,9 @@ cdef int K = 5
 cdef int img_height = 292 * K
 cdef int img_width = 400 * K
 
+# (height, width) of the image the cells are drawn on, for the python side buffers
+IMAGE_SHAPE = (img_height, img_width)
+
 cdef float RADIUS = 1.5
 cdef float INV_RADIUS = 1.0 / RADIUS
 
@@ -1,8 +1,13 @@
 from typing import Optional, Dict, Any, Callable, List, Set, Tuple
-from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy.orm import Session, defer
+from sqlalchemy import event, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from collections import OrderedDict
 from datetime import datetime
 import numpy as np
+import threading
+import json
+import copy
 
 from src.backend.models.automaton import Automaton
 from src.backend.models.cell import Cell
@@ -10,9 +15,13 @@ from src.backend.models.cell import Cell
 from src.database.models.automaton_cell_args import AutomatonCellArgs
 from src.database.models.cell_arguments import CellArguments
 from src.database.models.automaton import AutomatonTable
-from src.database.utils.cell_utils import deserialize_cells, decode_cell, cell_dtype, encode_cell
+from src.database.models.topology import TopologyTable
+from src.database.utils.cell_utils import (deserialize_cells, decode_cell, decode_cells, cell_dtype, encode_cell,
+                                          create_config_key, cell_type_index, pack_enums_array, pack_neighbors_array,
+                                          topology_dtype, state_dtype, split_cells, join_cells, topology_hash,
+                                          decode_neighbors_csr, config_hash, encode_columns, decode_columns)
 
-from src.database.dto.automaton_dto import AutomatonDto
+from src.database.dto.automaton_dto import AutomatonDto, AutomatonSnapshot, TopologyDto
 
 
 """
@@ -20,50 +29,156 @@ from src.database.dto.automaton_dto import AutomatonDto
     in the project.
 """
 
+# Compression of the written blobs, one of cell_utils.BLOB_CODECS. Blobs are readable regardless of the codec.
+BLOB_CODEC = "zlib"
+
 def get_or_create_cell_arguments(db: Session,
                                  cell_data_dict: Dict[str, Any]) -> int:
     """
-    Get or create for a set of cell arguments. First performs the query on the first layer of the
-    dict and then filters the result on the contents of the cell_data dictionary.
+    Get or create for a set of cell arguments.
     Returns the id of the corresponding entry (either created or already existing one)
     """
-    flat = {
-        'period': cell_data_dict['period'],
-        'range': cell_data_dict['range'],
-        'propagation_time': cell_data_dict['propagation_time'],
-        'propagation_time_max': cell_data_dict['propagation_time_max'],
-        'self_polarization': cell_data_dict['self_polarization'],
-        'charge_function': cell_data_dict['charge_function'],
-        'name': cell_data_dict['name']
-    }
-    
-    stmt = select(CellArguments).filter_by(**flat)
-    existing = db.execute(stmt).scalars().first()
-    if existing:
-        existing_data = existing.get_cell_data()
-        if existing_data == cell_data_dict['cell_data']:
-            return existing.id
-    
-    new_row = CellArguments(**flat)
-    new_row.set_cell_data(cell_data_dict['cell_data'])
+    return get_or_create_cell_arguments_bulk(db, [cell_data_dict])[0]
+
+def get_or_create_cell_arguments_bulk(db: Session,
+                                      configs: List[Dict[str, Any]]) -> List[int]:
+    """
+    Get or create for many sets of cell arguments at once. Rows are identified by the canonical
+    content hash with the unique index, so the cost is a constant number of queries regardless
+    of the number of configs, and equal configs always resolve to the same row.
 
-    db.add(new_row)
+    Args:
+        db: Session - database session
+        configs: List[Dict] - cell configs, duplicates are allowed
+
+    Returns:
+        List[int] - ids of the entries, in the order of configs
+    """
+    if not configs:
+        return []
+    _backfill_cell_argument_hashes(db)
+
+    hashes = [config_hash(config) for config in configs]
+    distinct = dict(zip(hashes, configs))
+
+    ids = _cell_argument_ids(db, distinct.keys())
+    missing = [h for h in distinct if h not in ids]
+    if missing:
+        rows = []
+        for h in missing:
+            config = distinct[h]
+            rows.append({
+                'hash': h,
+                'cell_data': json.dumps(config['cell_data']),
+                'period': config['period'],
+                'range': config['range'],
+                'propagation_time': config['propagation_time'],
+                'propagation_time_max': config['propagation_time_max'],
+                'self_polarization': config['self_polarization'],
+                'charge_function': config['charge_function'],
+                'name': config['name']
+            })
+        db.execute(sqlite_insert(CellArguments).on_conflict_do_nothing(index_elements=['hash']), rows)
+        ids.update(_cell_argument_ids(db, missing))
+
+    return [ids[h] for h in hashes]
+
+def _cell_argument_ids(db: Session, hashes) -> Dict[str, int]:
+    """
+    Maps the hashes to the ids of the existing rows, in one query.
+    """
+    stmt = select(CellArguments.hash, CellArguments.id).where(CellArguments.hash.in_(list(hashes)))
+    return {row.hash: row.id for row in db.execute(stmt)}
+
+_hashes_backfilled = False
+# Key in Session.info marking the transaction that ran the backfill, the flag above is set once it commits
+_BACKFILL_PENDING = "cell_argument_hashes_backfilled"
+
+def _backfill_cell_argument_hashes(db: Session) -> None:
+    """
+    Fills in the hashes of the rows written before the hash column existed. Only the first row
+    with the given content gets the hash, later duplicates keep NULL and are never matched again.
+    Runs once per process, unless the transaction that ran it is rolled back.
+    """
+    if _hashes_backfilled or db.info.get(_BACKFILL_PENDING):
+        return
+
+    taken = {h for (h,) in db.execute(select(CellArguments.hash).where(CellArguments.hash.is_not(None)))}
+    rows = db.execute(select(CellArguments).where(CellArguments.hash.is_(None)).order_by(CellArguments.id)).scalars()
+    for row in rows:
+        h = config_hash(row.to_dict())
+        if h not in taken:
+            row.hash = h
+            taken.add(h)
     db.flush()
-    return new_row.id
+    db.info[_BACKFILL_PENDING] = True
 
-def create_config_key(cell_config: Dict[str, Any]) -> tuple:
-    """Create a unique tuple key from cell_config that handles nested dictionaries"""
-    key_parts = []
-    
-    for field in ['period', 'range', 'self_polarization', 'charge_function', 'name']:
-        key_parts.append((field, cell_config.get(field)))
-    
-    cell_data = cell_config.get('cell_data', {})
-    if cell_data:
-        sorted_cell_data = sorted(cell_data.items())
-        key_parts.append(('cell_data', tuple(sorted_cell_data)))
-    
-    return tuple(key_parts)
+@event.listens_for(Session, "after_commit")
+def _backfill_committed(db: Session) -> None:
+    global _hashes_backfilled
+    if db.info.pop(_BACKFILL_PENDING, False):
+        _hashes_backfilled = True
+
+@event.listens_for(Session, "after_rollback")
+def _backfill_rolled_back(db: Session) -> None:
+    db.info.pop(_BACKFILL_PENDING, None)
+
+def get_or_create_topology(db: Session, topology: np.ndarray) -> int:
+    """
+    Get or create for the topology records. Topologies are identified by the content hash,
+    so all the automatons built on the same mesh share one row.
+    Returns the id of the corresponding entry.
+    """
+    digest = topology_hash(topology)
+    existing = db.execute(select(TopologyTable.id).where(TopologyTable.hash == digest)).scalar_one_or_none()
+    if existing is not None:
+        return existing
+
+    row = TopologyTable(hash = digest, n_cells = len(topology), data = encode_columns(topology, BLOB_CODEC))
+    db.add(row)
+    db.flush()
+    return row.id
+
+# Decoded topologies by their hash. Content addressed, so the entries never go stale.
+_TOPOLOGY_CACHE_SIZE = 4
+_topology_cache: "OrderedDict[str, TopologyDto]" = OrderedDict()
+_topology_cache_lock = threading.Lock()
+
+def get_topology(db: Session, topology_id: int) -> TopologyDto:
+    """
+    Returns the decoded topology. The neighbors are resolved once per topology and reused by
+    every automaton that references it, the blob is only read on a cache miss.
+    """
+    digest = db.execute(select(TopologyTable.hash).where(TopologyTable.id == topology_id)).scalar_one_or_none()
+    if digest is None:
+        raise RuntimeError(f"No topology with id {topology_id} found")
+
+    with _topology_cache_lock:
+        cached = _topology_cache.get(digest)
+        if cached is not None:
+            _topology_cache.move_to_end(digest)
+            return cached
+
+    data = db.execute(select(TopologyTable.data).where(TopologyTable.id == topology_id)).scalar_one()
+    cells = decode_columns(data, topology_dtype)
+    indptr, indices = decode_neighbors_csr(cells)
+    topology = TopologyDto(hash = digest, cells = cells, indptr = indptr, indices = indices)
+
+    with _topology_cache_lock:
+        _topology_cache[digest] = topology
+        while len(_topology_cache) > _TOPOLOGY_CACHE_SIZE:
+            _topology_cache.popitem(last=False)
+    return topology
+
+def _delete_unused_topology(db: Session, topology_id: Optional[int]) -> None:
+    """
+    Removes the topology if no automaton references it anymore.
+    """
+    if topology_id is None:
+        return
+    in_use = db.execute(select(AutomatonTable.id).where(AutomatonTable.topology_id == topology_id).limit(1)).first()
+    if in_use is None:
+        db.query(TopologyTable).filter(TopologyTable.id == topology_id).delete()
 
 def serialize_cells(cells: List[Cell], arg_dict: Dict) -> bytes:
     """
@@ -77,18 +192,34 @@ def serialize_cells(cells: List[Cell], arg_dict: Dict) -> bytes:
         Returns:
             bytes - a byte array with encoded cells
     """
+    cells = list(cells)
     n = len(cells)
     if n == 0:
         return b""
-    
-    arr = np.empty(n, dtype=cell_dtype)
-    for i, c in enumerate(cells):
-        encoded = encode_cell(c, arg_dict[create_config_key(c.config)])
-        if isinstance(encoded, np.ndarray):
-            arr[i] = encoded[0]
-        else:
-            arr[i] = encoded
 
+    arr = np.empty(n, dtype=cell_dtype)
+    arr["flags"] = pack_enums_array([c.state.value for c in cells],
+                                    [cell_type_index(c.cell_type) for c in cells],
+                                    [bool(c.self_polarization) for c in cells])
+    arr["charge"] = [c.charge for c in cells]
+    arr["position"] = [c.get_position() for c in cells]
+
+    counts = [len(c.neighbors) for c in cells]
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    offsets = [rel for c in cells for rel in c.neighbors_to_tuple_list()]
+    arr["neighbors"], arr["n_neighbors"] = pack_neighbors_array(indptr, offsets)
+
+    # Configs are shared between cells, so the key is created once per config object
+    keys: Dict[int, int] = {}
+    for c in cells:
+        if id(c.config) not in keys:
+            keys[id(c.config)] = arg_dict[create_config_key(c.config)]
+    arr["arg_id"] = [keys[id(c.config)] for c in cells]
+
+    arr["timer"] = [c.timer for c in cells]
+    arr["propagation_time"] = [c.propagation_time for c in cells]
+    arr["propagation_count"] = [c.propagation_count for c in cells]
     return arr
 
 def create_or_overwrite_entry(
@@ -115,24 +246,117 @@ def create_or_overwrite_entry(
         Returns:
             AutomatonTable - created automaton table
     """
-    mapping: Dict[tuple, int] = {}
+    configs: Dict[tuple, Dict] = {}
     for cell in cells:
         frozen = create_config_key(cell.config)
-        if frozen not in mapping:
-            arg_id = get_or_create_cell_arguments(db, cell.config)
-            mapping[frozen] = arg_id
+        if frozen not in configs:
+            configs[frozen] = cell.config
+    mapping = dict(zip(configs.keys(), get_or_create_cell_arguments_bulk(db, list(configs.values()))))
 
     blob = serialize_cells(cells, mapping)
+    return _write_entry(db, name, blob, set(mapping.values()), width, height, frames, is_preset)
+
+def snapshot_automaton(automaton: Automaton) -> AutomatonSnapshot:
+    """
+        Takes a copy of the automaton that can be written to the database later, possibly from
+        another thread. Doesn't touch the database.
+
+        Args:
+            automaton: Automaton - automaton to be copied
+
+        Returns:
+            AutomatonSnapshot - encoded cells with the configs they reference
+    """
+    configs = copy.deepcopy(automaton.distinct_configs())
+    local_ids = {create_config_key(config): i for i, config in enumerate(configs)}
+    return AutomatonSnapshot(
+        blob = automaton.to_blob(local_ids),
+        configs = configs,
+        shape = automaton.get_shape(),
+        frame = automaton.get_frame_counter()
+    )
+
+def create_or_overwrite_snapshot(
+        db: Session,
+        name: str,
+        snapshot: AutomatonSnapshot,
+        is_preset: bool = False
+) -> AutomatonTable:
+    """
+        Creates a new automaton entry from the snapshot. If the entry under the specified
+        name already exists it is overwritten.
+
+        Args:
+            db: Session - database session
+            name: str - string with entries name
+            snapshot: AutomatonSnapshot - snapshot created with snapshot_automaton
+            is_preset: bool - marks the entry as one of the default presets
+
+        Returns:
+            AutomatonTable - created automaton table
+    """
+    arg_ids = np.array(get_or_create_cell_arguments_bulk(db, snapshot.configs), dtype=np.int32)
+    blob = snapshot.blob.copy()
+    if len(blob) > 0:
+        blob["arg_id"] = arg_ids[blob["arg_id"]]
+
+    width, height = snapshot.shape
+    return _write_entry(db, name, blob, set(arg_ids.tolist()), width, height, snapshot.frame, is_preset)
+
+def create_or_overwrite_automaton(
+        db: Session,
+        name: str,
+        automaton: Automaton,
+        is_preset: bool = False
+) -> AutomatonTable:
+    """
+        Creates a new automaton entry straight from the running automaton. If the entry under the specified
+        name already exists it is overwritten. The blob is written by Automaton.to_blob, so no python
+        Cell objects are created on the way.
+
+        Args:
+            db: Session - database session
+            name: str - string with entries name
+            automaton: Automaton - automaton to be saved
+            is_preset: bool - marks the entry as one of the default presets
+
+        Returns:
+            AutomatonTable - created automaton table
+    """
+    return create_or_overwrite_snapshot(db, name, snapshot_automaton(automaton), is_preset)
+
+def _write_entry(
+        db: Session,
+        name: str,
+        blob: bytes,
+        arg_ids: Set[int],
+        width: int,
+        height: int,
+        frames: int,
+        is_preset: bool
+) -> AutomatonTable:
+    """
+        Helper that writes the encoded automaton and its joiner rows, overwriting the entry
+        with the same name. The blob is split, topology goes to the shared topology table and
+        only the state is stored in the automaton row. Commits the session.
+    """
+    topology, state = split_cells(blob)
+    topology_id = get_or_create_topology(db, topology)
+
     existing = db.query(AutomatonTable).filter(AutomatonTable.name == name).one_or_none()
 
     if existing is not None:
+        old_topology_id = existing.topology_id
         db.query(AutomatonCellArgs).filter_by(automaton_id=existing.id).delete()
         db.delete(existing)
         db.flush()
+        if old_topology_id != topology_id:
+            _delete_unused_topology(db, old_topology_id)
 
     row = AutomatonTable(
         name = name,
-        data = blob,
+        data = encode_columns(state, BLOB_CODEC),
+        topology_id = topology_id,
         width = width,
         height = height,
         frames = frames,
@@ -141,7 +365,6 @@ def create_or_overwrite_entry(
     db.add(row)
     db.flush()
 
-    arg_ids = set(mapping.values())
     joiners = [AutomatonCellArgs(automaton_id = row.id, arg_id = aid) for aid in arg_ids]
     db.bulk_save_objects(joiners)
 
@@ -165,7 +388,10 @@ def get_entry(
         Returns:
             Dictionary representation of the AutomatonTable
     """
-    row = db.query(AutomatonTable).filter(AutomatonTable.name == name).one_or_none()
+    query = db.query(AutomatonTable).filter(AutomatonTable.name == name)
+    if not include_blob:
+        query = query.options(defer(AutomatonTable.data))
+    row = query.one_or_none()
     if row is None:
         return None
     
@@ -176,10 +402,20 @@ def get_entry(
         "height": row.height,
         "frames": row.frames,
         "modified_at": row.modified_at,
-        "cells": deserialize_cells(row.data) if include_blob else None,
+        "cells": _load_cells(db, row) if include_blob else None,
+        "topology_id": row.topology_id,
         "is_default": row.is_default
     }
 
+def _load_cells(db: Session, row: AutomatonTable) -> Optional[np.ndarray]:
+    """
+        Returns the cell_dtype records of the entry. Rows without the topology store the full records.
+    """
+    if row.topology_id is None:
+        return deserialize_cells(row.data)
+    topology = get_topology(db, row.topology_id)
+    return join_cells(topology.cells, decode_columns(row.data, state_dtype))
+
 def get_arguments_for_automaton(db: Session, automaton_id: int):
     """
         Helper query
@@ -213,19 +449,12 @@ def get_automaton(db: Session, name: str) -> AutomatonDto:
         id = a.pop("id")
         mapping[id] = a 
 
-    positions: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
-    cells: Dict[Tuple[int, int], Cell] = {}
-
-    for cell in dictionary["cells"]:
-        c, nei = decode_cell(cell, mapping)
-        position = (c.pos_x, c.pos_y)
-        positions[position] = nei
-        cells[position] = c
+    neighbors = None
+    if dictionary["topology_id"] is not None:
+        topology = get_topology(db, dictionary["topology_id"])
+        neighbors = (topology.indptr, topology.indices)
 
-    for pos, cell in cells.items():
-        neis = positions[pos]
-        for nei in neis:
-            cell.add_neighbor(cells[nei])
+    cells = {(c.pos_x, c.pos_y): c for c in decode_cells(dictionary["cells"], mapping, neighbors)}
 
     return AutomatonDto(
         cell_map = cells,
@@ -250,15 +479,19 @@ def delete_entry(db: Session, name: str) -> bool:
         return False
     
     automaton_id = row.id
+    topology_id = row.topology_id
     db.query(AutomatonCellArgs).filter(AutomatonCellArgs.automaton_id == automaton_id).delete()
 
     db.delete(row)
+    db.flush()
+    _delete_unused_topology(db, topology_id)
     db.commit()
     return True
 
 def list_entries(db: Session) -> List[Dict]:
     """
     Returns the entries from the database in the dictionary format and without the binary data.
+    Runs a single query that selects only the metadata columns, the blob is never loaded.
 
     Arguments:
         db: Session - database session
@@ -266,10 +499,28 @@ def list_entries(db: Session) -> List[Dict]:
     Returns:
         List[Dict] - list of automatons in the dictionary format and without the binary data (see get_entry for the details)
     """
-    entries = db.query(AutomatonTable).all()
-    if entries is None:
-        return None
-    res = []
-    for entry in entries:
-        res.append(get_entry(db, entry.name, False))
-    return res
\ No newline at end of file
+    stmt = select(
+        AutomatonTable.id,
+        AutomatonTable.name,
+        AutomatonTable.width,
+        AutomatonTable.height,
+        AutomatonTable.frames,
+        AutomatonTable.modified_at,
+        AutomatonTable.is_default,
+        AutomatonTable.topology_id
+    ).order_by(AutomatonTable.id)
+
+    return [
+        {
+            "id": row.id,
+            "name": row.name,
+            "width": row.width,
+            "height": row.height,
+            "frames": row.frames,
+            "modified_at": row.modified_at,
+            "cells": None,
+            "is_default": row.is_default,
+            "topology_id": row.topology_id
+        }
+        for row in db.execute(stmt)
+    ]
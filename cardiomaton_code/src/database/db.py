@@ -1,25 +1,93 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
-from typing import Generator
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.orm import declarative_base, sessionmaker, scoped_session, Session
+from typing import Generator, Iterator
+from contextlib import contextmanager
 from pathlib import Path
+import threading
 
 DATABASE_URL = "sqlite:///./resources/db/cardiomaton.db"
 RESOURCES_DIR = Path("resources/db")
 
 RESOURCES_DIR.mkdir(parents=True, exist_ok=True)
 
+# Pragmas applied to every new sqlite connection. WAL lets the background writer
+# commit while the GUI thread keeps reading, NORMAL synchronous is safe with WAL.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "cache_size": -16000, # in KiB
+    "busy_timeout": 5000, # in ms
+}
+
 engine = create_engine(DATABASE_URL, echo=False, connect_args={"check_same_thread": False})
 
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {pragma}={value}")
+    cursor.close()
+
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+# Thread local registry of sessions. Each thread reuses its own session instead of opening a new one per call.
+ScopedSession = scoped_session(SessionLocal)
+
 Base = declarative_base()
 
+_init_lock = threading.Lock()
+_initialized = False
+
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    """
+    Creates the missing tables. Only the first call touches the database, so it's safe to call it repeatedly.
+    """
+    global _initialized
+    with _init_lock:
+        if _initialized:
+            return
+        Base.metadata.create_all(bind=engine)
+        _add_missing_columns()
+        _initialized = True
+
+def _add_missing_columns():
+    """
+    create_all doesn't alter the existing tables, so columns added to the models later are appended here,
+    together with their indexes. Only works for nullable columns without the server defaults, which is enough
+    for sqlite databases created by the older versions.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            for index in table.indexes:
+                index.create(bind=connection, checkfirst=True)
 
 def get_db() -> Generator:
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+@contextmanager
+def session_scope() -> Iterator[Session]:
+    """
+    Provides the session of the current thread. The transaction is rolled back on error and the session is
+    closed on exit, which returns the connection to the pool but keeps the session object for reuse.
+    """
+    db = ScopedSession()
+    try:
+        yield db
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        ScopedSession.close()
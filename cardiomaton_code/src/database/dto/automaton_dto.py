@@ -1,5 +1,6 @@
 from dataclasses import dataclass
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
+import numpy as np
 
 from src.backend.models.cell import Cell
 
@@ -10,3 +11,27 @@ class AutomatonDto():
     shape: Tuple[int, int]
     frame: int
     name: str
+
+
+@dataclass
+class AutomatonSnapshot():
+    """
+    Copy of the automaton taken for saving. Arg ids in the blob index the configs list,
+    they are replaced with the cell_arguments ids when the snapshot is written.
+    """
+    blob: np.ndarray
+    configs: List[Dict]
+    shape: Tuple[int, int]
+    frame: int
+
+
+@dataclass
+class TopologyDto():
+    """
+    Decoded topology shared by the automatons built on the same mesh. Neighbors are in the CSR format,
+    indices[indptr[i]:indptr[i + 1]] are the record indices of the neighbors of the i-th cell.
+    """
+    hash: str
+    cells: np.ndarray
+    indptr: np.ndarray
+    indices: np.ndarray
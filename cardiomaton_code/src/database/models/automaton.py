@@ -1,17 +1,20 @@
 from datetime import datetime, timezone
-from sqlalchemy import Column, Integer, String, LargeBinary, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, LargeBinary, DateTime, Boolean, ForeignKey
 from src.database.db import Base
+from src.database.models.topology import TopologyTable
 
 class AutomatonTable(Base):
     __tablename__ = "automaton_table"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String, unique=True, index=True, nullable=False)
+    # Per cell dynamic state. Rows without the topology hold the full cell records (older format)
     data = Column(LargeBinary, nullable=False)
+    topology_id = Column(Integer, ForeignKey("topology_table.id", ondelete="RESTRICT"), nullable=True, index=True)
     width = Column(Integer, nullable=False)
     height = Column(Integer, nullable=False)
     frames = Column(Integer, nullable=False)
-    modified_at = Column(DateTime, nullable=False, default=datetime.now(timezone.utc))
+    modified_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
     is_default = Column(Boolean)
 
     def __repr__(self) -> str:
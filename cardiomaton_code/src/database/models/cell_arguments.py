@@ -6,6 +6,8 @@ class CellArguments(Base):
     __tablename__ = "cell_arguments"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
+    # Canonical content hash of the row (see config_hash), rows from older versions are filled in lazily
+    hash = Column(String(64), unique=True, index=True, nullable=True)
 
     cell_data = Column(String)
     period = Column(Float, nullable=False)
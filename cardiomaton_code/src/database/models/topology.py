@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, LargeBinary
+from src.database.db import Base
+
+class TopologyTable(Base):
+    """
+    Static part of the automaton - positions, types and neighbors of the cells. Stored once and
+    shared by all the automatons built on the same mesh, rows are identified by the hash of the data.
+    """
+    __tablename__ = "topology_table"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    hash = Column(String(64), unique=True, index=True, nullable=False)
+    n_cells = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<TopologyTable(id={self.id} hash={self.hash[:12]!r} n_cells={self.n_cells})>"
@@ -0,0 +1,115 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+import threading
+
+from src.backend.models.automaton import Automaton
+from src.database.db import init_db, session_scope
+from src.database.crud.automaton_crud import (get_automaton, list_entries, delete_entry,
+                                              snapshot_automaton, create_or_overwrite_snapshot)
+from src.database.dto.automaton_dto import AutomatonDto
+
+
+class AutomatonRepository:
+    """
+    Single entry point to the automaton storage for the application.
+
+    Reads run on the calling thread and reuse the session of that thread. Writes (saves and deletes)
+    are serialized on one background writer thread and return futures, so a large commit never blocks
+    the caller. The automaton is copied on the calling thread before the save is queued, so it can keep
+    running while the snapshot is written.
+    """
+
+    def __init__(self) -> None:
+        init_db()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+
+        self._cache_lock = threading.Lock()
+        self._entries: Optional[List[Dict]] = None
+        self._generation = 0
+
+    def get_automaton(self, name: str) -> AutomatonDto:
+        with session_scope() as db:
+            return get_automaton(db, name)
+
+    def list_entries(self) -> List[Dict]:
+        """
+        Returns the metadata of all entries. The listing is cached until the next write.
+        """
+        with self._cache_lock:
+            if self._entries is not None:
+                return [dict(entry) for entry in self._entries]
+            generation = self._generation
+
+        with session_scope() as db:
+            entries = list_entries(db)
+
+        with self._cache_lock:
+            # A write that finished during the query makes this listing stale, don't cache it
+            if generation == self._generation:
+                self._entries = entries
+        return [dict(entry) for entry in entries]
+
+    def invalidate(self) -> None:
+        """
+        Drops the cached listing, so the next call reads it from the database.
+        """
+        with self._cache_lock:
+            self._entries = None
+            self._generation += 1
+
+    def save_automaton(self, name: str, automaton: Automaton, is_preset: bool = False) -> Future:
+        """
+        Queues the save of the automaton under the given name.
+
+        Returns:
+            Future[bool] - resolves to True once the entry is committed
+        """
+        snapshot = snapshot_automaton(automaton)
+        return self._writer.submit(self._write_snapshot, name, snapshot, is_preset)
+
+    def delete_entry(self, name: str) -> Future:
+        """
+        Queues the removal of the entry.
+
+        Returns:
+            Future[bool] - resolves to the status of the operation
+        """
+        return self._writer.submit(self._delete, name)
+
+    def flush(self) -> None:
+        """
+        Blocks until all queued writes are done.
+        """
+        self._writer.submit(lambda: None).result()
+
+    def shutdown(self) -> None:
+        self._writer.shutdown(wait=True)
+
+    def _write_snapshot(self, name, snapshot, is_preset) -> bool:
+        try:
+            with session_scope() as db:
+                create_or_overwrite_snapshot(db, name, snapshot, is_preset)
+            return True
+        finally:
+            self.invalidate()
+
+    def _delete(self, name: str) -> bool:
+        try:
+            with session_scope() as db:
+                return delete_entry(db, name)
+        finally:
+            self.invalidate()
+
+
+_repository: Optional[AutomatonRepository] = None
+_repository_lock = threading.Lock()
+
+def get_repository() -> AutomatonRepository:
+    """
+    Returns the repository shared by the whole application, creating it on the first call.
+    """
+    global _repository
+    with _repository_lock:
+        if _repository is None:
+            _repository = AutomatonRepository()
+        return _repository
@@ -1,5 +1,10 @@
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 import numpy as np
+import hashlib
+import struct
+import json
+import zlib
+import lzma
 
 from src.backend.models.cell import Cell
 from src.backend.enums.cell_state import CellState
@@ -57,6 +62,12 @@ def unpack_enums(num: np.uint8) -> Tuple[CellState, CellType, bool]:
     flag = bool((num >> 7) & 1)
     return CellState(state_val), CellType(_INT_TO_CELL_TYPE[cell_type_val]), flag
 
+def cell_type_index(type: CellType) -> int:
+    """
+        Returns the integer code of the CellType used in the encoded flags.
+    """
+    return _CELL_TYPE_TO_INT[type]
+
 _ENC_NEI = {-1: 0, 0: 1, 1: 2}
 _DEC_NEI = (-1, 0, 1)
 
@@ -99,9 +110,185 @@ def unpack_neighbors(code: np.uint32, n: int) -> List[Tuple[int, int]]:
         out.append((dx, dy))
     return out
 
+################################################################################
+# Array level serialization
+#
+# Vectorized counterparts of the functions above. They operate on whole columns
+# of the cell_dtype records at once and produce bit-identical results.
+
+_MAX_NEIGHBORS = 8
+
+def pack_enums_array(states: np.ndarray, types: np.ndarray, self_polar: np.ndarray) -> np.ndarray:
+    """
+        Vectorized pack_enums. Packs the state, type and self_polarization columns into the flags column.
+
+        Args:
+            states: np.ndarray - CellState values of the cells
+            types: np.ndarray - CellType indices of the cells (as in the CellType definition order)
+            self_polar: np.ndarray - self_polarization flags of the cells
+
+        Returns:
+            np.ndarray[np.uint8] - encoded flags, same bit layout as pack_enums
+    """
+    states = np.asarray(states, dtype=np.uint8)
+    types = np.asarray(types, dtype=np.uint8)
+    self_polar = np.asarray(self_polar, dtype=bool).astype(np.uint8)
+    return (states & 0b111) | ((types & 0b1111) << 3) | (self_polar << 7)
+
+def unpack_enums_array(flags: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+        Vectorized unpack_enums. Splits the flags column into state, type and self_polarization columns.
+
+        Args:
+            flags: np.ndarray - bit encoded flags column
+
+        Returns:
+            np.ndarray[np.uint8] - CellState values
+            np.ndarray[np.uint8] - CellType indices
+            np.ndarray[bool] - self polarization flags
+    """
+    flags = np.asarray(flags, dtype=np.uint8)
+    return flags & 0b111, (flags >> 3) & 0b1111, ((flags >> 7) & 1).astype(bool)
+
+def pack_neighbors_array(indptr: np.ndarray, offsets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+        Vectorized pack_neighbors. Encodes the neighbors given in the CSR format, where
+        offsets[indptr[i]:indptr[i + 1]] are the relative positions of neighbors of the i-th cell.
+
+        Args:
+            indptr: np.ndarray - CSR row pointer of length n + 1
+            offsets: np.ndarray - (m, 2) array of relative positions of neighbors
+
+        Returns:
+            np.ndarray[np.uint32] - numbers with encoded positions
+            np.ndarray[np.uint8] - neighbor count of each cell
+
+        Throws:
+            ValueError - when any cell has more than 8 neighbors
+    """
+    indptr = np.asarray(indptr, dtype=np.int64)
+    offsets = np.asarray(offsets, dtype=np.int64).reshape(-1, 2)
+    counts = np.diff(indptr)
+    if counts.size and counts.max() > _MAX_NEIGHBORS:
+        raise ValueError(f"At most {_MAX_NEIGHBORS} neighbors can be encoded")
+
+    nibs = (((offsets[:, 0] + 1) & 0x3) | (((offsets[:, 1] + 1) & 0x3) << 2)).astype(np.uint32)
+    codes = np.zeros(counts.size, dtype=np.uint32)
+    starts = indptr[:-1]
+    for slot in range(_MAX_NEIGHBORS):
+        has_slot = counts > slot
+        if not has_slot.any():
+            break
+        codes[has_slot] |= nibs[starts[has_slot] + slot] << np.uint32(4 * slot)
+    return codes, counts.astype(np.uint8)
+
+def unpack_neighbors_array(codes: np.ndarray, n_neighbors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+        Vectorized unpack_neighbors. Decodes the neighbors columns into the CSR format.
+
+        Args:
+            codes: np.ndarray - numbers with encoded neighbors
+            n_neighbors: np.ndarray - number of neighbors encoded in each code
+
+        Returns:
+            np.ndarray[np.int64] - CSR row pointer of length n + 1
+            np.ndarray[np.int8] - (m, 2) array of relative positions of neighbors
+    """
+    codes = np.asarray(codes, dtype=np.uint32)
+    counts = np.asarray(n_neighbors, dtype=np.int64)
+    indptr = np.zeros(counts.size + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+
+    rows = np.repeat(np.arange(counts.size), counts)
+    slots = (np.arange(rows.size) - indptr[rows]).astype(np.uint32)
+    nibs = (codes[rows] >> (np.uint32(4) * slots)) & 0xF
+
+    offsets = np.empty((rows.size, 2), dtype=np.int8)
+    offsets[:, 0] = (nibs & 0x3).astype(np.int8) - 1
+    offsets[:, 1] = ((nibs >> 2) & 0x3).astype(np.int8) - 1
+    return indptr, offsets
+
+def decode_neighbors_csr(blob: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+        Resolves the neighbors of the cell_dtype records to the record indices. Neighbors that point
+        outside of the encoded cells are dropped.
+
+        Args:
+            blob: np.ndarray - array of type cell_dtype with encoded cells
+
+        Returns:
+            np.ndarray[np.int64] - CSR row pointer of length n + 1
+            np.ndarray[np.int32] - indices of the neighbor records
+    """
+    n = len(blob)
+    if n == 0:
+        return np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32)
+
+    indptr, offsets = unpack_neighbors_array(blob["neighbors"], blob["n_neighbors"])
+    positions = blob["position"].astype(np.int64)
+    rows = np.repeat(np.arange(n), np.diff(indptr))
+    # Relative positions are stored as (cell - neighbor)
+    targets = positions[rows] - offsets
+
+    origin = positions.min(axis=0)
+    extent = positions.max(axis=0) - origin + 1
+    lookup = np.full(tuple(extent), -1, dtype=np.int32)
+    lookup[positions[:, 0] - origin[0], positions[:, 1] - origin[1]] = np.arange(n, dtype=np.int32)
+
+    local = targets - origin
+    inside = np.all((local >= 0) & (local < extent), axis=1)
+    indices = np.full(rows.size, -1, dtype=np.int32)
+    indices[inside] = lookup[local[inside, 0], local[inside, 1]]
+
+    found = indices >= 0
+    if not found.all():
+        counts = np.bincount(rows[found], minlength=n)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        indices = indices[found]
+    return indptr, indices
+
 ################################################################################
 # Cell object serialization
 
+def create_config_key(cell_config: Dict[str, Any]) -> tuple:
+    """Create a unique tuple key from cell_config that handles nested dictionaries"""
+    key_parts = []
+    
+    for field in ['period', 'range', 'self_polarization', 'charge_function', 'name']:
+        key_parts.append((field, cell_config.get(field)))
+    
+    cell_data = cell_config.get('cell_data', {})
+    if cell_data:
+        sorted_cell_data = sorted(cell_data.items())
+        key_parts.append(('cell_data', tuple(sorted_cell_data)))
+    
+    return tuple(key_parts)
+
+def config_hash(cell_config: Dict[str, Any]) -> str:
+    """
+    Canonical content hash of the cell config, as stored in the cell_arguments table.
+    Values are coerced to the column types first (and numbers in cell_data to floats), so the config
+    and the row read back from the database hash the same.
+    """
+    self_polarization = cell_config.get('self_polarization')
+    canonical = {
+        'period': float(cell_config['period']),
+        'range': float(cell_config['range']),
+        'propagation_time': int(cell_config['propagation_time']),
+        'propagation_time_max': int(cell_config['propagation_time_max']),
+        'self_polarization': None if self_polarization is None else bool(self_polarization),
+        'charge_function': cell_config.get('charge_function'),
+        'name': cell_config['name'],
+        'cell_data': {
+            key: float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else value
+            for key, value in (cell_config.get('cell_data') or {}).items()
+        },
+    }
+    encoded = json.dumps(canonical, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
 cell_dtype = np.dtype([
     ("flags", np.uint8),
     ("charge", np.float32),
@@ -114,6 +301,169 @@ cell_dtype = np.dtype([
     ("propagation_count", np.uint16),
 ])
 
+# Split of the cell_dtype into the static and the dynamic part. Topology is shared by all the automatons
+# built on the same mesh, so it's stored once. State keeps the full flags, type bits are mirrored in the topology.
+topology_dtype = np.dtype([
+    ("position", np.int16, (2,)),
+    ("type", np.uint8),
+    ("neighbors", np.uint32),
+    ("n_neighbors", np.uint8),
+])
+
+state_dtype = np.dtype([
+    ("flags", np.uint8),
+    ("charge", np.float32),
+    ("arg_id", np.int32),
+    ("timer", np.uint16),
+    ("propagation_time", np.uint16),
+    ("propagation_count", np.uint16),
+])
+
+def split_cells(blob: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+        Splits the cell_dtype records into the topology and the state records, in the same order.
+
+        Args:
+            blob: np.ndarray - array of type cell_dtype
+
+        Returns:
+            np.ndarray - array of type topology_dtype
+            np.ndarray - array of type state_dtype
+    """
+    topology = np.empty(len(blob), dtype=topology_dtype)
+    topology["position"] = blob["position"]
+    topology["type"] = unpack_enums_array(blob["flags"])[1]
+    topology["neighbors"] = blob["neighbors"]
+    topology["n_neighbors"] = blob["n_neighbors"]
+
+    state = np.empty(len(blob), dtype=state_dtype)
+    for field in state_dtype.names:
+        state[field] = blob[field]
+    return topology, state
+
+def join_cells(topology: np.ndarray, state: np.ndarray) -> np.ndarray:
+    """
+        Inverse of split_cells.
+
+        Throws:
+            ValueError - when the number of records differs
+    """
+    if len(topology) != len(state):
+        raise ValueError(f"Topology has {len(topology)} cells, state has {len(state)}")
+    blob = np.empty(len(state), dtype=cell_dtype)
+    for field in state_dtype.names:
+        blob[field] = state[field]
+    blob["position"] = topology["position"]
+    blob["neighbors"] = topology["neighbors"]
+    blob["n_neighbors"] = topology["n_neighbors"]
+    return blob
+
+def topology_hash(topology: np.ndarray) -> str:
+    """
+        Content hash of the topology records, used to find the already stored topology.
+    """
+    digest = hashlib.sha256()
+    digest.update(str(topology_dtype.descr).encode())
+    digest.update(np.ascontiguousarray(topology).tobytes())
+    return digest.hexdigest()
+
+################################################################################
+# Blob format
+#
+# Records are stored column by column, with the position column delta encoded between consecutive records,
+# and the whole payload compressed. Header: magic, format version, codec and the number of records.
+# Blobs without the magic are the raw record arrays written by the older versions.
+
+BLOB_MAGIC = b"CMCB"
+BLOB_VERSION = 1
+BLOB_CODECS = {"none": 0, "zlib": 1, "lzma": 2}
+_BLOB_HEADER = struct.Struct("<4sBBI")
+_DELTA_FIELDS = ("position",)
+
+def _compress(payload: bytes, codec: str) -> bytes:
+    if codec == "zlib":
+        return zlib.compress(payload, 6)
+    if codec == "lzma":
+        return lzma.compress(payload, preset=6)
+    return payload
+
+def _decompress(payload: bytes, codec_id: int) -> bytes:
+    if codec_id == BLOB_CODECS["zlib"]:
+        return zlib.decompress(payload)
+    if codec_id == BLOB_CODECS["lzma"]:
+        return lzma.decompress(payload)
+    if codec_id == BLOB_CODECS["none"]:
+        return bytes(payload)
+    raise ValueError(f"Unknown blob codec {codec_id}")
+
+def encode_columns(records: np.ndarray, codec: str = "zlib") -> bytes:
+    """
+        Encodes the structured array into the versioned columnar blob.
+
+        Args:
+            records: np.ndarray - structured array (cell_dtype, topology_dtype, state_dtype)
+            codec: str - one of "none", "zlib", "lzma"
+
+        Returns:
+            bytes - encoded blob
+
+        Throws:
+            ValueError - on the unknown codec
+    """
+    if codec not in BLOB_CODECS:
+        raise ValueError(f"Unknown blob codec {codec!r}, expected one of {list(BLOB_CODECS)}")
+
+    columns = []
+    for field in records.dtype.names:
+        column = np.ascontiguousarray(records[field])
+        if field in _DELTA_FIELDS and len(column) > 0:
+            # Integer arithmetic wraps, so the cumulative sum in the decoder restores the values exactly
+            column = np.concatenate((column[:1], np.diff(column, axis=0)))
+        columns.append(column.tobytes())
+
+    header = _BLOB_HEADER.pack(BLOB_MAGIC, BLOB_VERSION, BLOB_CODECS[codec], len(records))
+    return header + _compress(b"".join(columns), codec)
+
+def decode_columns(data: bytes, dtype: np.dtype) -> np.ndarray:
+    """
+        Decodes the blob into the structured array of the given dtype. Accepts both the columnar
+        blobs and the raw record arrays.
+
+        Args:
+            data: bytes - encoded blob
+            dtype: np.dtype - record type the blob was encoded from
+
+        Returns:
+            np.ndarray - decoded records
+
+        Throws:
+            ValueError - on the unsupported version or the blob that doesn't match the dtype
+    """
+    data = bytes(data)
+    if not data.startswith(BLOB_MAGIC):
+        return np.frombuffer(data, dtype=dtype)
+
+    _, version, codec_id, n = _BLOB_HEADER.unpack_from(data)
+    if version != BLOB_VERSION:
+        raise ValueError(f"Unsupported blob version {version}")
+    payload = _decompress(data[_BLOB_HEADER.size:], codec_id)
+    if len(payload) != n * dtype.itemsize:
+        raise ValueError(f"Blob with {len(payload)} bytes doesn't hold {n} records of {dtype}")
+
+    records = np.empty(n, dtype=dtype)
+    offset = 0
+    for field in dtype.names:
+        field_dtype = dtype.fields[field][0]
+        size = n * field_dtype.itemsize
+        count = n * int(np.prod(field_dtype.shape))
+        column = np.frombuffer(payload, dtype=field_dtype.base, count=count, offset=offset)
+        column = column.reshape((n,) + field_dtype.shape)
+        if field in _DELTA_FIELDS and n > 0:
+            column = np.cumsum(column, axis=0, dtype=field_dtype.base)
+        records[field] = column
+        offset += size
+    return records
+
 def encode_cell(cell: Cell, arg_id: np.int32) -> np.void:
     """
         Encodes a single cell into cell_dtype object.
@@ -160,6 +510,43 @@ def decode_cell(blob: np.void, cell_args) -> Tuple[Cell, List[Tuple[int, int]]]:
     cell.propagation_count = int(blob["propagation_count"])
     return cell, neighbors
 
+def decode_cells(blob: np.ndarray, cell_args,
+                 neighbors: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> List[Cell]:
+    """
+        Decodes the array of cell_dtype records to the list of cells with their neighbors connected.
+        Columns are decoded with the array level functions, only the Cell objects are created per record.
+
+        Args:
+            blob: np.ndarray - array of type cell_dtype with encoded cells
+            cell_args - mapping of the arg_id to the cell config
+            neighbors - result of decode_neighbors_csr for the blob, if it's already known
+
+        Returns:
+            List[Cell] - decoded cells, in the order of the records
+    """
+    states, types, self_polar = unpack_enums_array(blob["flags"])
+    indptr, indices = neighbors if neighbors is not None else decode_neighbors_csr(blob)
+
+    cells = []
+    for pos, state, cell_type, polar, arg_id, charge, timer, prop_time, prop_count in zip(
+            blob["position"].tolist(), states.tolist(), types.tolist(), self_polar.tolist(),
+            blob["arg_id"].tolist(), blob["charge"].tolist(), blob["timer"].tolist(),
+            blob["propagation_time"].tolist(), blob["propagation_count"].tolist()):
+        cell = Cell(position=tuple(pos), cell_type=_INT_TO_CELL_TYPE[cell_type], cell_config=cell_args[arg_id],
+                    init_state=CellState(state), self_polarization=polar)
+        cell.charge = charge
+        cell.timer = timer
+        cell.propagation_time = prop_time
+        cell.propagation_count = prop_count
+        cells.append(cell)
+
+    indptr = indptr.tolist()
+    indices = indices.tolist()
+    for i, cell in enumerate(cells):
+        for j in indices[indptr[i]:indptr[i + 1]]:
+            cell.add_neighbor(cells[j])
+    return cells
+
 def __serialize_cells(cells: List[Cell], arg_dict: Dict) -> bytes:
     """
         Function that serializes a list of cells to a byte array.
@@ -187,7 +574,7 @@ def __serialize_cells(cells: List[Cell], arg_dict: Dict) -> bytes:
 
 def deserialize_cells(blob: bytes) -> List[np.ndarray[Any]]:
     """
-        Function that deserializes a byte blob to the list of cell_dtype objects
+        Function that deserializes a byte blob (raw or columnar) to the list of cell_dtype objects
 
         Args:
             blob: bytes - encoded binary blob
@@ -197,4 +584,4 @@ def deserialize_cells(blob: bytes) -> List[np.ndarray[Any]]:
     """
     if not blob:
         return None    
-    return np.frombuffer(blob, dtype=cell_dtype)
\ No newline at end of file
+    return decode_columns(blob, cell_dtype)
\ No newline at end of file
@@ -101,9 +101,12 @@
 
 #             self._layout.addLayout(h)
 
-from typing import Iterable, Optional, Dict
+from __future__ import annotations
+from typing import TYPE_CHECKING, Iterable, Optional, Dict
 from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QLineEdit, QHBoxLayout
-from src.models.cell import CellDict
+
+if TYPE_CHECKING:
+    from src.models.cell import CellDict
 
 class CellDetails(QWidget):
     def __init__(self, editable_keys: Iterable[str] = (), parent: Optional[QWidget] = None) -> None:
@@ -1,13 +1,18 @@
-from typing import Optional, Iterable
+from __future__ import annotations
+from typing import TYPE_CHECKING, Optional, Iterable
 
 from PyQt6.QtCore import QSize
 from PyQt6.QtGui import QFont, QIcon
 from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QSizePolicy
 
+from src.backend.enums.cell_state import cell_state_name
 from src.frontend.cell_inspecting.cell_details import CellDetails
 from src.frontend.cell_inspecting.series_plot import SeriesPlot
 from src.frontend.ui_components.ui_factory import UIFactory
-from src.models.cell import CellDict
+
+if TYPE_CHECKING:
+    from src.models.cell import CellDict
+    from src.backend.models.probe_recorder import ProbeRecorder
 
 class CellInspector(QWidget):
     def __init__(self, cell_data: CellDict, on_close_callback, running: bool, parent: Optional[QWidget] = None) -> None:
@@ -40,6 +45,20 @@ class CellInspector(QWidget):
         if charge is not None:
             self._plot.add(charge)
 
+    def update_from_probe(self, probe: ProbeRecorder, column: int = 0) -> None:
+        """
+        Shows the charge trace recorded by the probe and the last recorded values of the cell.
+        """
+        frames, charges, states = probe.series()
+        if len(frames) == 0:
+            return
+        state = int(states[-1, column])
+        self._data["charge"] = float(charges[-1, column])
+        self._data["state_name"] = cell_state_name(state)
+        self._data["state_value"] = state + 1
+        self._details.set_data(self._data)
+        self._plot.set_series(frames, charges[:, column])
+
     def set_running(self, running: bool) -> None:
         if self._running != running:
             self._running = running
@@ -1,8 +1,14 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+
 from PyQt6.QtWidgets import QVBoxLayout
 
 from src.frontend.cell_inspecting.cell_inspector import CellInspector
 from src.frontend.ui_simulation_window import UiSimulationWindow
-from src.models.cell import CellDict
+
+if TYPE_CHECKING:
+    from src.models.cell import CellDict
+    from src.backend.models.probe_recorder import ProbeRecorder
 
 
 class CellInspectorManager:
@@ -49,6 +55,10 @@ class CellInspectorManager:
         if self._current_inspector:
             self._current_inspector.update(new_data)
 
+    def update_from_probe(self, probe: ProbeRecorder):
+        if self._current_inspector:
+            self._current_inspector.update_from_probe(probe)
+
     def set_running_state(self, running: bool):
         if self._current_inspector:
             self._current_inspector.set_running(running)
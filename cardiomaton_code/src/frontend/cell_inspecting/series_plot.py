@@ -41,6 +41,12 @@ class SeriesPlot(QWidget):
         self._buffer.add(value)
         self._update()
 
+    def set_series(self, x, y) -> None:
+        """
+        Replaces the plotted data, used when the samples are buffered outside the plot.
+        """
+        self.plot_curve.setData(x=x, y=y)
+
     def _update(self) -> None:
         x, y = self._buffer.xy()
         self.plot_curve.setData(x=x, y=y)
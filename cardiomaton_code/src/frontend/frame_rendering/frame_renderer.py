@@ -1,10 +1,13 @@
-from typing import Tuple
+from __future__ import annotations
+from typing import TYPE_CHECKING, Tuple
 
 from PyQt6.QtGui import QImage, QPixmap
 from PyQt6.QtCore import QSize
 
 from src.frontend.frame_rendering.pixmap_renderer import PixmapRenderer
-from src.backend.controllers.simulation_controller import SimulationController
+
+if TYPE_CHECKING:
+    from src.backend.controllers.simulation_controller import SimulationController
 
 class FrameRenderer:
 
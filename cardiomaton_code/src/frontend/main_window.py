@@ -1,4 +1,6 @@
+from __future__ import annotations
 import os
+from typing import TYPE_CHECKING
 
 from PyQt6.QtCore import QSize, Qt
 from PyQt6.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QStackedWidget, QLabel
@@ -12,12 +14,20 @@ from src.frontend.ui_components.top_bar_widget import TopBarWidget
 from src.frontend.ui_components.ui_factory import UIFactory
 
 from PyQt6.QtGui import QImage
-from src.backend.controllers.simulation_controller import SimulationController
-from src.frontend.frame_rendering.frame_renderer import FrameRenderer
+
+if TYPE_CHECKING:
+    from src.backend.controllers.simulation_controller import SimulationController
+    from src.frontend.frame_rendering.frame_renderer import FrameRenderer
 
 
 class MainWindow(QMainWindow):
-    def __init__(self, simulation_controller: SimulationController, frame_renderer: FrameRenderer, image: QImage):
+    def __init__(self, simulation_controller: SimulationController = None, frame_renderer: FrameRenderer = None,
+                 image: QImage = None):
+        """
+        Builds the window. Without the simulation controller only the shell (top bar, about view, help, styles)
+        is created and the simulation view is added later with attach_simulation, so the shell can be built
+        while the backend is still loading.
+        """
         super().__init__()
 
         self.resize(1100, 600)
@@ -48,17 +58,26 @@ class MainWindow(QMainWindow):
         self.help_provider = HelpContentProvider(self)
         self.help_overlay.hide()
 
-        self._init_views(simulation_controller, frame_renderer, image)
+        self.simulation_window = None
+        self._init_views()
         self._connect_topbar()
         self._apply_style()
 
-    def _init_views(self,  simulation_controller: SimulationController, frame_renderer: FrameRenderer, image: QImage):
-        self.simulation_window = SimulationWindow(simulation_controller, frame_renderer, image)
-        self.stack.addWidget(self.simulation_window)
+        if simulation_controller is not None:
+            self.attach_simulation(simulation_controller, frame_renderer, image)
 
+    def _init_views(self):
         self.about_view = AboutView()
         self.stack.addWidget(self.about_view)
 
+    def attach_simulation(self, simulation_controller: SimulationController, frame_renderer: FrameRenderer, image: QImage):
+        """
+        Adds the simulation view once the backend is ready and makes it the current page.
+        """
+        self.simulation_window = SimulationWindow(simulation_controller, frame_renderer, image)
+        self.stack.insertWidget(0, self.simulation_window)
+        self.stack.setCurrentIndex(0)
+
     def _connect_topbar(self):
         self.topbar.btn_app.clicked.connect(lambda: self.stack.setCurrentIndex(0))
         self.topbar.btn_help.clicked.connect(self.start_interactive_help)
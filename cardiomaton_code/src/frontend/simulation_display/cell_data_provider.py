@@ -1,7 +1,10 @@
-from typing import Tuple, Optional
+from __future__ import annotations
+from typing import TYPE_CHECKING, Tuple, Optional
 
-from src.backend.controllers.simulation_controller import SimulationController
-from src.models.cell import CellDict
+if TYPE_CHECKING:
+    from src.backend.controllers.simulation_controller import SimulationController
+    from src.models.cell import CellDict
+    from src.backend.models.automaton import CellBatch
 
 
 class CellDataProvider:
@@ -12,4 +15,7 @@ class CellDataProvider:
         return self.simulation_controller.shape
 
     def get_cell_data(self, pos: Tuple[int, int]) -> Optional[CellDict]:
-        return self.simulation_controller.get_cell_data(pos)
\ No newline at end of file
+        return self.simulation_controller.get_cell_data(pos)
+
+    def get_cells(self, positions) -> CellBatch:
+        return self.simulation_controller.get_cells(positions)
@@ -1,11 +1,14 @@
-from typing import Tuple, Optional
+from __future__ import annotations
+from typing import TYPE_CHECKING, Tuple, Optional
 
 from PyQt6.QtWidgets import QLabel, QToolTip
 from PyQt6.QtGui import QMouseEvent
 
 
 from src.frontend.simulation_display.cell_data_provider import CellDataProvider
-from src.models.cell import CellDict
+
+if TYPE_CHECKING:
+    from src.models.cell import CellDict
 
 class CellTooltipManager:
     def __init__(self, cell_data_provider: CellDataProvider, debug: bool = False) -> None:
@@ -1,10 +1,9 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
 from PyQt6.QtGui import QImage, QIcon
 from PyQt6.QtWidgets import QWidget
 
-from src.backend.controllers.simulation_controller import SimulationController
 from src.backend.services.action_potential_generator import ActionPotentialGenerator
-from src.database.crud.automaton_crud import get_automaton
-from src.database.db import SessionLocal
 from src.frontend.cell_inspecting.cell_inspector_manager import CellInspectorManager
 from src.frontend.frame_rendering.frame_renderer import FrameRenderer
 from src.frontend.ui_components.potential_graph_widget import GraphWidget
@@ -15,7 +14,14 @@ from src.frontend.simulation_display.simulation_view import SimulationView
 from src.backend.services.simulation_loop import SimulationRunner
 from src.frontend.ui_components.ui_factory import UIFactory
 from src.frontend.ui_simulation_window import UiSimulationWindow
-from src.models.cell import CellDict
+from src.workers.persistence_notifier import PersistenceNotifier
+
+# Annotation only, the backend is imported by the init worker and importing it here would make the GUI thread wait
+if TYPE_CHECKING:
+    from src.backend.controllers.simulation_controller import SimulationController
+    from src.models.cell import CellDict
+    from src.backend.models.probe_recorder import ProbeRecorder
+    from src.backend.models.ecg_recorder import EcgRecorder
 
 
 class SimulationWindow(QWidget):
@@ -38,12 +44,18 @@ class SimulationWindow(QWidget):
         self.runner.set_speed_level("2x", self.sim)
         self.navigator = PlaybackNavigator()
         self.inspector_manager = CellInspectorManager(self.ui)
+        self.inspector_probe: ProbeRecorder | None = None
         self.generator = ActionPotentialGenerator()
         self.plot_windows = {}
+        self.persistence = PersistenceNotifier(self)
 
         self.overlay_graph = GraphWidget(parent=self)
         self.overlay_graph.hide()
 
+        self.ecg: EcgRecorder | None = None
+        self.ecg_graph = GraphWidget(parent=self, y_label="Potential (a.u.)", x_label="Time (ms)")
+        self.ecg_graph.hide()
+
         self.render_label = SimulationView(self.cell_data_provider, self.ui.brush_size_slider, self.cell_modificator)
         self.render_charged = True
         self.inspection_set = True
@@ -56,6 +68,7 @@ class SimulationWindow(QWidget):
     def _init_ui_layout(self):
         self.ui.simulation_layout.addWidget(self.render_label)
         UIFactory.add_shadow(self.overlay_graph)
+        UIFactory.add_shadow(self.ecg_graph)
 
     def _connect_signals(self):
         self.runner.frame_tick.connect(self._update_live_frame)
@@ -67,6 +80,8 @@ class SimulationWindow(QWidget):
         self.ui.speed_dropdown.currentTextChanged.connect(self._on_speed_change)
         self.ui.toggle_render_button.clicked.connect(self._toggle_render_mode)
         self.ui.toggle_interaction_button.clicked.connect(self._toggle_interaction_mode)
+        self.ui.ecg_button.clicked.connect(self._toggle_ecg)
+        self.ecg_graph.close_btn.clicked.connect(self._hide_ecg)
 
         self.ui.prev_button.pressed.connect(self.navigator.start_backward_hold)
         self.ui.prev_button.released.connect(self.navigator.stop_backward_hold)
@@ -82,6 +97,7 @@ class SimulationWindow(QWidget):
 
         self.ui.presets_layout.preset_selected.connect(self._on_preset_selected)
         self.ui.presets_layout.save_preset_request.connect(self._save_preset)
+        self.persistence.saved.connect(self._on_preset_saved)
 
     def _toggle_simulation(self):
         if not self.runner.running and self.navigator.current_buffer_index != -1:
@@ -130,12 +146,13 @@ class SimulationWindow(QWidget):
         frame, pixmap = self.renderer.render_next_frame(self.render_label.size(), self.render_charged)
         self._display_frame(frame, pixmap)
 
-        if self.inspector_manager.is_active:
-            pos = self.inspector_manager.get_current_position()
-            self.inspector_manager.update_data(self.sim.get_cell_data(pos))
+        if self.inspector_probe is not None:
+            self.inspector_manager.update_from_probe(self.inspector_probe)
+        if self.ecg is not None:
+            self._refresh_ecg()
 
     def _render_history_frame(self, index: int):
-        self.inspector_manager.hide_inspector()
+        self._close_inspector()
 
         frame, pixmap = self.renderer.render_frame(self.render_label.size(), index, self.render_charged,
                                                    drop_newer=False)
@@ -146,11 +163,19 @@ class SimulationWindow(QWidget):
         self.ui.frame_counter_label.setText(f"Time: {frame_num // 2} ms")
 
     def _on_cell_clicked(self, cell_data: CellDict):
+        self._close_inspector()
         self.inspector_manager.show_inspector(
             cell_data,
-            on_close_callback=self.inspector_manager.hide_inspector,
+            on_close_callback=self._close_inspector,
             is_running=self.runner.running
         )
+        self.inspector_probe = self.sim.add_probe([cell_data["position"]])
+
+    def _close_inspector(self):
+        self.inspector_manager.hide_inspector()
+        if self.inspector_probe is not None:
+            self.sim.remove_probe(self.inspector_probe)
+            self.inspector_probe = None
 
     def _modify_cells(self):
         all_params = self.ui.parameter_panel.get_current_values()
@@ -187,9 +212,34 @@ class SimulationWindow(QWidget):
 
     def _reposition_overlay_graph(self):
         self.overlay_graph.setGeometry(500, 230, 585, 250)
+        self.ecg_graph.setGeometry(500, 280, 585, 200)
 
         self.overlay_graph.raise_()
 
+    def _toggle_ecg(self):
+        if self.ecg is None:
+            self._show_ecg()
+        else:
+            self._hide_ecg()
+
+    def _show_ecg(self):
+        self.ecg = self.sim.enable_ecg()
+        self.ecg_graph.show()
+        self.ecg_graph.raise_()
+        self._refresh_ecg()
+
+    def _hide_ecg(self):
+        self.ecg_graph.hide()
+        if self.ecg is not None:
+            self.sim.disable_ecg()
+            self.ecg = None
+
+    def _refresh_ecg(self):
+        frames, values = self.ecg.series()
+        lead = self.ecg.lead_names.index("II")
+        # Two frames per millisecond, as in the time label
+        self.ecg_graph.update_data(frames / 2, values[:, lead], title="Pseudo-ECG, lead II")
+
     def _restart_automaton(self):
         self.sim.restart_automaton()
         self.cell_modificator.reset()
@@ -209,11 +259,8 @@ class SimulationWindow(QWidget):
 
     def _on_preset_selected(self, entry):
         self._pause_simulation()
-        db = SessionLocal()
         try:
-            dto = get_automaton(db, entry)
-
-            self.sim.update_automaton(dto, self.image)
+            self.sim.select_preset(entry)
             self.renderer = FrameRenderer(self.sim, self.image)
 
             self._update_live_frame()
@@ -223,5 +270,10 @@ class SimulationWindow(QWidget):
 
     def _save_preset(self, entry):
         self._pause_simulation()
-        self.sim.save_automaton(entry)
-        self.ui.presets_layout.silent_refresh()
\ No newline at end of file
+        self.persistence.watch_save(entry, self.sim.save_automaton_async(entry))
+
+    def _on_preset_saved(self, entry: str, success: bool):
+        if success:
+            self.ui.presets_layout.silent_refresh()
+        else:
+            print(f"Failed to save the entry: {entry}")
\ No newline at end of file
@@ -39,6 +39,8 @@ class PlayerControlsWidget(QWidget):
         self.toggle_render_button = QPushButton()
         self.toggle_render_button.setFixedSize(25, 25)
         self.toggle_render_button.setObjectName("PotentialBtn")
+        self.ecg_button = QPushButton("ECG")
+        self.ecg_button.setObjectName("EcgBtn")
 
         self.main_layout.addStretch(2)
         self.main_layout.addWidget(self.speed_dropdown)
@@ -52,4 +54,6 @@ class PlayerControlsWidget(QWidget):
         self.main_layout.addWidget(self.toggle_interaction_button)
         self.main_layout.addStretch(1)
         self.main_layout.addWidget(self.toggle_render_button)
+        self.main_layout.addStretch(1)
+        self.main_layout.addWidget(self.ecg_button)
         self.main_layout.addStretch(2)
@@ -7,9 +7,11 @@ from src.frontend.ui_components.ui_factory import UIFactory
 
 
 class GraphWidget(QtWidgets.QFrame):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, y_label: str = "Voltage (mV)", x_label: str = "Time (s)"):
         super().__init__(parent)
         self.setObjectName("Layout")
+        self._y_label = y_label
+        self._x_label = x_label
 
         self.setAttribute(Qt.WidgetAttribute.WA_StyledBackground, True)
 
@@ -66,12 +68,12 @@ class GraphWidget(QtWidgets.QFrame):
         left_axis = self.plot_widget.getAxis('left')
         left_axis.setTextPen(self._axis_color)
         left_axis.setTickFont(self.tick_font)
-        self.plot_widget.setLabel('left', 'Voltage (mV)', **label_styles)
+        self.plot_widget.setLabel('left', self._y_label, **label_styles)
 
         bottom_axis = self.plot_widget.getAxis('bottom')
         bottom_axis.setTextPen(self._axis_color)
         bottom_axis.setTickFont(self.tick_font)
-        self.plot_widget.setLabel('bottom', 'Time (s)', **label_styles)
+        self.plot_widget.setLabel('bottom', self._x_label, **label_styles)
 
     @pyqtProperty(QColor)
     def plotBackground(self):
@@ -6,8 +6,7 @@ from PyQt6.QtWidgets import (
 
 from src.frontend.ui_components.ui_factory import UIFactory
 
-from src.database.db import SessionLocal
-from src.database.crud.automaton_crud import list_entries, delete_entry
+from src.workers.persistence_notifier import PersistenceNotifier
 
 class PresetsWidget(QWidget):
     preset_selected = pyqtSignal(object)  
@@ -32,6 +31,11 @@ class PresetsWidget(QWidget):
 
         self.setFixedHeight(60)
 
+        # Imported here, the database stack is loaded by the backend init worker
+        from src.database.repository.automaton_repository import get_repository
+        self.repository = get_repository()
+        self.persistence = PersistenceNotifier(self)
+
         self.main_layout = QHBoxLayout(self)
 
         self.setAttribute(Qt.WidgetAttribute.WA_StyledBackground, True)
@@ -105,6 +109,7 @@ class PresetsWidget(QWidget):
         self.dropdown.currentTextChanged.connect(self.on_preset_changed)
         self.button.clicked.connect(self.handle_button_click)
         self.exit_button.clicked.connect(self.hide_input_field)
+        self.persistence.deleted.connect(self._on_entry_deleted)
 
     def handle_button_click(self):
         if self.is_adding_preset:
@@ -123,19 +128,24 @@ class PresetsWidget(QWidget):
 
     def _remove_entry(self, name):
         try:
-            db = SessionLocal()
-            delete_entry(db, name)
+            self.persistence.watch_delete(name, self.repository.delete_entry(name))
 
         except Exception as e:
             print(f"Failed to remove: {name}. Error: {e}")
+            self.silent_refresh()
+
+    def _on_entry_deleted(self, name: str, success: bool):
+        # The row is taken out before the delete runs, a failed delete puts it back from the database
+        if not success:
+            print(f"Failed to remove: {name}")
+            self.silent_refresh()
 
     def _load_database_entries(self):
         self.list_widget.clear()
         self.dropdown.clear()
         
         try:
-            db = SessionLocal()
-            entries = list_entries(db)
+            entries = self.repository.list_entries()
 
             if entries:
                 for entry in entries:
@@ -122,6 +122,7 @@ class UiSimulationWindow(object):
         self.speed_dropdown = self.player_controls.speed_dropdown
         self.toggle_render_button = self.player_controls.toggle_render_button
         self.toggle_interaction_button = self.player_controls.toggle_interaction_button
+        self.ecg_button = self.player_controls.ecg_button
 
         self.commit_button = self.modification_panel.commit_button
         self.undo_button = self.modification_panel.undo_button
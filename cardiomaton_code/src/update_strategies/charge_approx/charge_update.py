@@ -24,22 +24,6 @@ CHARGE_FUNCTIONS = {
 }
 
 class ChargeUpdate():
-    @staticmethod
-    def _get_max_arg(func, period: int) -> int:
-        """
-            Find the time argument for update method that returns max
-            charge value
-
-            Args:
-                func - function accepting time as int and returning 
-                    charge value as an int
-
-            Returns:
-                int - greatest value from the func
-            """
-        args = list(map(func, list(range(int(period)))))
-        return np.argmax(args)
-
     @lru_cache(maxsize=128)
     @staticmethod    
     def _get_func(cell_data: Dict, period: float, n_range: int, fun) -> Tuple[List[float], int, float]:
@@ -62,10 +46,10 @@ class ChargeUpdate():
         # return m, ChargeUpdate._get_max_arg(func, period)
         cell_data = dict(cell_data)
         a = period / n_range
-        func = lambda t: fun((t % n_range) * a, **cell_data)
-        args = list(range(int(n_range)))
-        m = [func(t) for t in args]
-        charge_max = ChargeUpdate._get_max_arg(func, n_range)
+        # Charge functions are built from numpy operations, so the whole range is sampled in one call
+        args = np.arange(int(n_range))
+        m = np.broadcast_to(fun((args % n_range) * a, **cell_data), args.shape).astype(np.float64).tolist()
+        charge_max = int(np.argmax(m))
         max_val = m[charge_max]
         min_val = np.min(m)
 
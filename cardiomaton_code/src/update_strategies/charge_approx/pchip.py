@@ -0,0 +1,56 @@
+import numpy as np
+
+
+def _edge_slope(h0, h1, m0, m1):
+    """One-sided three-point slope at the end knot, limited to keep the shape monotone"""
+    d = ((2 * h0 + h1) * m0 - h0 * m1) / (h0 + h1)
+    if np.sign(d) != np.sign(m0):
+        return 0.0
+    if np.sign(m0) != np.sign(m1) and abs(d) > 3.0 * abs(m0):
+        return 3.0 * m0
+    return d
+
+
+def pchip(knots_t, knots_V, t):
+    """
+    Evaluates the monotone piecewise cubic Hermite interpolant (PCHIP) through the knots at t.
+    Same knot slopes and extrapolation as scipy.interpolate.PchipInterpolator, without loading
+    scipy.interpolate when the charge tables are built.
+
+    Args:
+        knots_t - increasing knot times, at least 2
+        knots_V - values at the knots
+        t - scalar or array of the times, outside the knots the end cubics are extended
+
+    Returns:
+        np.ndarray - interpolated values, shaped like t
+    """
+    x = np.asarray(knots_t, dtype=np.float64)
+    y = np.asarray(knots_V, dtype=np.float64)
+    h = np.diff(x)
+    m = np.diff(y) / h
+
+    d = np.zeros_like(y)
+    if len(x) == 2:
+        d[:] = m[0]
+    else:
+        # Weighted harmonic mean of the neighboring secants, 0 at the local extrema
+        w1 = 2 * h[1:] + h[:-1]
+        w2 = h[1:] + 2 * h[:-1]
+        flat = (np.sign(m[1:]) != np.sign(m[:-1])) | (m[1:] == 0) | (m[:-1] == 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            whmean = (w1 / m[:-1] + w2 / m[1:]) / (w1 + w2)
+        d[1:-1] = np.where(flat, 0.0, 1.0 / np.where(flat, 1.0, whmean))
+        d[0] = _edge_slope(h[0], h[1], m[0], m[1])
+        d[-1] = _edge_slope(h[-1], h[-2], m[-1], m[-2])
+
+    # Power basis coefficients of every interval, highest degree first
+    c3 = (d[:-1] + d[1:] - 2 * m) / h
+    c0 = c3 / h
+    c1 = (m - d[:-1]) / h - c3
+    c2 = d[:-1]
+
+    t = np.asarray(t, dtype=np.float64)
+    k = np.clip(np.searchsorted(x, t, side="right") - 1, 0, len(x) - 2)
+    s = t - x[k]
+    return ((c0[k] * s + c1[k]) * s + c2[k]) * s + y[k]
@@ -1,6 +1,6 @@
 import numpy as np
-from scipy.interpolate import PchipInterpolator
 from scipy.special import expit
+from src.update_strategies.charge_approx.pchip import pchip
 
 
 def smooth_transition(x, x0, eps=0.005):
@@ -43,8 +43,7 @@ def purkinje_AP(t,
     # Phases 1-3
     knots_t = [t01, t12, t23, t34]
     knots_V = [V_peak, V12, V23, V_rest]
-    spline = PchipInterpolator(knots_t, knots_V)
-    P13 = spline(t_shift)
+    P13 = pchip(knots_t, knots_V, t_shift)
 
     # Smooth transition between phase 4 and phase 0 
     w40 = smooth_transition(t, t40, eps) 
@@ -2,7 +2,12 @@ from PyQt6.QtCore import QObject, QThread, pyqtSignal
 
 
 class BackendInitWorker(QObject):
+    """
+    Builds the backend (config, database, preset load, automaton) off the GUI thread.
+    Meant to be moved to a QThread, the results are delivered to the GUI thread with the signals.
+    """
     finished = pyqtSignal(object, object, object)  # sim, renderer, image
+    failed = pyqtSignal(object)  # exception
 
     def __init__(self, base_frame_time, size):
         super().__init__()
@@ -10,12 +15,20 @@ class BackendInitWorker(QObject):
         self.size = size
 
     def run(self):
-        from PyQt6.QtGui import QImage
-        from src.backend.controllers.simulation_controller import SimulationController
-        from src.frontend.frame_rendering.frame_renderer import FrameRenderer
+        try:
+            from PyQt6.QtGui import QImage
+            from src.backend.controllers.simulation_controller import SimulationController
+            from src.frontend.frame_rendering.frame_renderer import FrameRenderer
+            from src.backend.enums.cell_type import ConfigLoader
+            from src.database.db import init_db
 
-        image = QImage(self.size[1], self.size[0], QImage.Format.Format_RGBA8888)
-        sim = SimulationController(frame_time=self.base_frame_time, image=image)
-        renderer = FrameRenderer(sim, image)
+            ConfigLoader.loadConfig()
+            init_db()
+            image = QImage(self.size[1], self.size[0], QImage.Format.Format_RGBA8888)
+            sim = SimulationController(frame_time=self.base_frame_time, image=image)
+            renderer = FrameRenderer(sim, image)
+        except Exception as e:
+            self.failed.emit(e)
+            return
 
         self.finished.emit(sim, renderer, image)
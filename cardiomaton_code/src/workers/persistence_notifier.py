@@ -0,0 +1,26 @@
+from concurrent.futures import Future
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+
+class PersistenceNotifier(QObject):
+    """
+    Turns the futures returned by the AutomatonRepository into Qt signals. Futures complete on the
+    writer thread, the signals are delivered to the receivers on their own (GUI) thread.
+    """
+    saved = pyqtSignal(str, bool)  # name, success
+    deleted = pyqtSignal(str, bool)  # name, success
+
+    def watch_save(self, name: str, future: Future) -> None:
+        future.add_done_callback(lambda f: self.saved.emit(name, self._succeeded(name, f)))
+
+    def watch_delete(self, name: str, future: Future) -> None:
+        future.add_done_callback(lambda f: self.deleted.emit(name, self._succeeded(name, f)))
+
+    @staticmethod
+    def _succeeded(name: str, future: Future) -> bool:
+        error = future.exception()
+        if error is not None:
+            print(f"Database write for {name} failed: {error}")
+            return False
+        return bool(future.result())
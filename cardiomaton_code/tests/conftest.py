@@ -0,0 +1,22 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# The code is imported as the src package from the code root, where the database and the resources are looked up
+ROOT = Path(__file__).resolve().parent.parent
+if ROOT.as_posix() not in sys.path:
+    sys.path.insert(0, ROOT.as_posix())
+
+
+def pytest_configure(config):
+    # src.database.db resolves the database path against the working directory when it's imported,
+    # which happens while the test modules are collected
+    os.chdir(ROOT)
+
+
+@pytest.fixture(autouse=True)
+def code_root(monkeypatch):
+    monkeypatch.chdir(ROOT)
+    return ROOT
@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from src.database.crud import automaton_crud
+from src.database.db import Base
+from src.database.models.cell_arguments import CellArguments
+from src.database.utils.cell_utils import config_hash
+
+
+CONFIG = {
+    "cell_data": {"V_rest": -60.0, "V_peak": 20.0},
+    "period": 1000.0,
+    "range": 2000.0,
+    "propagation_time": 4,
+    "propagation_time_max": 5,
+    "self_polarization": False,
+    "charge_function": "ATRIAL",
+    "name": "test",
+}
+
+
+@pytest.fixture
+def session(monkeypatch):
+    monkeypatch.setattr(automaton_crud, "_hashes_backfilled", False)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine, autoflush=False)()
+    # Row written before the hash column existed
+    row = CellArguments(hash=None, **{key: value for key, value in CONFIG.items() if key != "cell_data"})
+    row.set_cell_data(CONFIG["cell_data"])
+    db.add(row)
+    db.commit()
+    yield db
+    db.close()
+
+
+def stored_hash(db):
+    return db.execute(select(CellArguments.hash)).scalar_one()
+
+
+def test_backfill_is_retried_after_rollback(session):
+    automaton_crud.get_or_create_cell_arguments(session, CONFIG)
+    session.rollback()
+    assert not automaton_crud._hashes_backfilled
+    assert stored_hash(session) is None
+
+    automaton_crud.get_or_create_cell_arguments(session, CONFIG)
+    session.commit()
+    assert automaton_crud._hashes_backfilled
+    assert stored_hash(session) == config_hash(CONFIG)
+
+
+def test_backfilled_row_is_reused(session):
+    first = automaton_crud.get_or_create_cell_arguments(session, CONFIG)
+    session.commit()
+    assert automaton_crud.get_or_create_cell_arguments(session, CONFIG) == first
+    assert session.query(CellArguments).count() == 1
@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+from src.backend.enums.cell_state import CellState
+from src.backend.enums.cell_type import CellType
+from src.database.utils.cell_utils import (cell_dtype, cell_type_index, decode_neighbors_csr, pack_enums,
+                                           pack_enums_array, pack_neighbors, pack_neighbors_array, unpack_enums,
+                                           unpack_enums_array, unpack_neighbors, unpack_neighbors_array)
+
+OFFSETS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if (dx, dy) != (0, 0)]
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(1234)
+
+
+def random_records(rng, n):
+    records = np.zeros(n, dtype=cell_dtype)
+    states = [list(CellState)[k] for k in rng.integers(0, len(CellState), n)]
+    types = [list(CellType)[k] for k in rng.integers(0, len(CellType), n)]
+    polar = rng.random(n) < 0.5
+    records["flags"] = [pack_enums(s, t, p) for s, t, p in zip(states, types, polar)]
+    return records, states, types, polar
+
+
+def random_neighbors(rng, n):
+    # Empty and full (8 neighbor) cells are always included
+    counts = np.concatenate([[0, 8], rng.integers(0, 9, n - 2)])
+    return [[OFFSETS[k] for k in rng.permutation(8)[:count]] for count in counts]
+
+
+def to_csr(neighbors):
+    indptr = np.zeros(len(neighbors) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(cell) for cell in neighbors])
+    offsets = np.array([offset for cell in neighbors for offset in cell], dtype=np.int64).reshape(-1, 2)
+    return indptr, offsets
+
+
+def test_pack_enums_array_matches_scalar(rng):
+    records, states, types, polar = random_records(rng, 500)
+    packed = pack_enums_array([s.value for s in states], [cell_type_index(t) for t in types], polar)
+    assert packed.dtype == np.uint8
+    np.testing.assert_array_equal(packed, records["flags"])
+
+
+def test_unpack_enums_array_matches_scalar(rng):
+    records, _, _, _ = random_records(rng, 500)
+    states, types, polar = unpack_enums_array(records["flags"])
+    for flags, state, type_index, flag in zip(records["flags"], states, types, polar):
+        expected_state, expected_type, expected_flag = unpack_enums(flags)
+        assert state == expected_state.value
+        assert type_index == cell_type_index(expected_type)
+        assert flag == expected_flag
+
+
+def test_pack_neighbors_array_matches_scalar(rng):
+    neighbors = random_neighbors(rng, 300)
+    codes, counts = pack_neighbors_array(*to_csr(neighbors))
+    np.testing.assert_array_equal(codes, [pack_neighbors(cell) for cell in neighbors])
+    np.testing.assert_array_equal(counts, [len(cell) for cell in neighbors])
+
+
+def test_unpack_neighbors_array_matches_scalar(rng):
+    neighbors = random_neighbors(rng, 300)
+    codes = np.array([pack_neighbors(cell) for cell in neighbors], dtype=np.uint32)
+    counts = np.array([len(cell) for cell in neighbors], dtype=np.uint8)
+    indptr, offsets = unpack_neighbors_array(codes, counts)
+    for i, (code, count) in enumerate(zip(codes, counts)):
+        assert list(map(tuple, offsets[indptr[i]:indptr[i + 1]].tolist())) == unpack_neighbors(code, count)
+
+
+def test_neighbors_array_round_trip(rng):
+    neighbors = random_neighbors(rng, 300)
+    indptr, offsets = to_csr(neighbors)
+    out_indptr, out_offsets = unpack_neighbors_array(*pack_neighbors_array(indptr, offsets))
+    np.testing.assert_array_equal(out_indptr, indptr)
+    np.testing.assert_array_equal(out_offsets, offsets)
+
+
+def test_pack_neighbors_array_rejects_more_than_eight():
+    with pytest.raises(ValueError):
+        pack_neighbors_array([0, 9], np.zeros((9, 2)))
+
+
+def test_decode_neighbors_csr_matches_scalar(rng):
+    # Cells on a grid with holes, neighbors pointing at the missing cells are dropped by decode_neighbors_csr
+    grid = [(x, y) for x in range(12) for y in range(10) if rng.random() < 0.8]
+    present = set(grid)
+    records = np.zeros(len(grid), dtype=cell_dtype)
+    for i, (x, y) in enumerate(grid):
+        # Relative positions are stored as (cell - neighbor)
+        cell = [offset for offset in OFFSETS if rng.random() < 0.7]
+        records[i]["position"] = (x, y)
+        records[i]["neighbors"] = pack_neighbors(cell)
+        records[i]["n_neighbors"] = len(cell)
+
+    indptr, indices = decode_neighbors_csr(records)
+    index = {position: i for i, position in enumerate(grid)}
+    for i, (x, y) in enumerate(grid):
+        relative = unpack_neighbors(records[i]["neighbors"], records[i]["n_neighbors"])
+        expected = [index[(x - dx, y - dy)] for dx, dy in relative if (x - dx, y - dy) in present]
+        assert indices[indptr[i]:indptr[i + 1]].tolist() == expected
+
+
+def test_decode_neighbors_csr_empty():
+    indptr, indices = decode_neighbors_csr(np.zeros(0, dtype=cell_dtype))
+    assert indptr.tolist() == [0]
+    assert indices.size == 0
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+import cli
+
+
+def run_cli(tmp_path, *arguments):
+    return cli.main(["run", "--steps", "20", "--out", str(tmp_path / "out"), *arguments])
+
+
+def read_summary(tmp_path):
+    with open(tmp_path / "out" / "run.json") as file:
+        return json.load(file)
+
+
+@pytest.mark.parametrize("arguments, message", [
+    (("--probe", "100", "100"), "No cell at position"),
+    (("--preset", "NO_SUCH_PRESET"), "No automaton with name"),
+    (("--record", "--compression", "12"), "Compression level"),
+    (("--video", "run.mkv"), "Unknown video extension"),
+    (("--video", "run.mp4", "--stride", "0"), "have to be positive"),
+])
+def test_invalid_run_reports_the_error(tmp_path, capsys, arguments, message):
+    assert run_cli(tmp_path, *arguments) == 1
+
+    error = capsys.readouterr().err
+    assert message in error
+    assert "Traceback" not in error
+    summary = read_summary(tmp_path)
+    assert message in summary["error"]
+    assert summary["outputs"] == []
+
+
+def test_modification_outside_of_the_run_fails_before_simulating(tmp_path, capsys):
+    modifications = tmp_path / "modifications.json"
+    modifications.write_text(json.dumps([{"step": 99, "cells": [[1, 1]], "depolarize": True}]))
+
+    assert run_cli(tmp_path, "--modifications", str(modifications)) == 1
+    assert "outside of the run" in capsys.readouterr().err
+    assert not (tmp_path / "out").exists()
+
+
+def test_failed_video_writer_stops_the_recording(tmp_path, capsys):
+    # The writer can't create the file in the missing directory
+    assert run_cli(tmp_path, "--record", "--ecg", "--video", "missing/run.mp4") == 1
+
+    assert "Failed to open the video writer" in capsys.readouterr().err
+    summary = read_summary(tmp_path)
+    assert summary["steps_done"] == 0
+    assert summary["outputs"] == []
+    assert not (tmp_path / "out" / "recording" / "index.json").exists()
+
+
+def test_successful_run_lists_the_outputs(tmp_path, capsys):
+    assert run_cli(tmp_path, "--ecg", "--probe", "4", "41") == 0
+
+    summary = read_summary(tmp_path)
+    assert "error" not in summary
+    assert summary["outputs"] == ["probes.npz", "ecg.npz"]
+    assert summary["end_frame"] - summary["start_frame"] == 20
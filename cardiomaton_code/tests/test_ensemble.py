@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from src.backend.enums.cell_type import ConfigLoader
+from src.backend.models.automaton import Automaton
+from src.backend.models.ecg_recorder import EcgRecorder
+from src.backend.models.ensemble import Ensemble
+from src.backend.models.region_recorder import RegionRecorder
+from src.backend.services.ecg_leads import lead_weights
+from src.backend.services.parameter_sweep import apply_parameters
+from src.database.repository.automaton_repository import get_repository
+
+# Long enough for the sinus node to fire and the wave to cross the atria and the ventricles
+N_STEPS = 1500
+
+VARIANTS = [
+    {},
+    {"SA_NODE.t40": 0.5},
+    {"AV_NODE.range": 2600},
+    {"*.propagation_time": 3},
+]
+
+
+@pytest.fixture(scope="module")
+def preset():
+    ConfigLoader.loadConfig()
+    return get_repository().get_automaton("PHYSIOLOGICAL")
+
+
+@pytest.fixture(scope="module")
+def runs(preset):
+    """
+    Runs the variants together in one Ensemble and each of them in its own Automaton, with the recorders attached.
+    """
+    cell_maps = [apply_parameters(preset.cell_map, variant) for variant in VARIANTS]
+    ensemble = Ensemble(preset.shape, cell_maps, frame=preset.frame)
+    names, weights = lead_weights(ensemble.get_positions(), ensemble.get_shape())
+    ensemble.record(N_STEPS, weights, names)
+    ensemble.advance(N_STEPS)
+
+    automata = []
+    for cell_map in cell_maps:
+        automaton = Automaton(preset.shape, cell_map, img_ptr=0, img_bytes=0, frame=preset.frame, buffer_size=1)
+        regions = RegionRecorder(N_STEPS)
+        ecg = EcgRecorder(weights, names, N_STEPS)
+        automaton.attach_region_recorder(regions)
+        automaton.attach_ecg(ecg)
+        automaton.advance(N_STEPS)
+        automata.append((automaton, regions, ecg))
+    return ensemble, automata
+
+
+def test_ensemble_matches_the_automaton_of_every_variant(runs):
+    ensemble, automata = runs
+    last, previous = ensemble.activation_times()
+    for k, (automaton, _, _) in enumerate(automata):
+        view = automaton.state_view()
+        automaton_last, automaton_previous = automaton.activation_times()
+
+        assert ensemble.get_frame_counter() == automaton.get_frame_counter()
+        np.testing.assert_array_equal(ensemble.get_positions(), automaton.get_positions())
+        np.testing.assert_array_equal(ensemble.states()[k], view.state, err_msg=f"state of variant {k}")
+        np.testing.assert_array_equal(ensemble.timers()[k], view.timer, err_msg=f"timer of variant {k}")
+        # The automaton keeps the charge of the snapshot in its own precision
+        np.testing.assert_array_equal(ensemble.charges()[k].astype(view.charge.dtype), view.charge,
+                                      err_msg=f"charge of variant {k}")
+        np.testing.assert_array_equal(last[k], automaton_last, err_msg=f"last activation of variant {k}")
+        np.testing.assert_array_equal(previous[k], automaton_previous, err_msg=f"previous activation of variant {k}")
+
+
+def test_variants_diverge(runs):
+    ensemble, _ = runs
+    last, _ = ensemble.activation_times()
+    assert (last[0] >= 0).any()
+    assert any((last[k] != last[0]).any() for k in range(1, len(VARIANTS)))
+
+
+def test_ensemble_recording_matches_the_recorders(runs):
+    ensemble, automata = runs
+    frames, counts, values = ensemble.series()
+    for k, (_, regions, ecg) in enumerate(automata):
+        region_frames, region_counts, _ = regions.series()
+        _, ecg_values = ecg.series()
+
+        np.testing.assert_array_equal(frames, region_frames)
+        np.testing.assert_array_equal(counts[:, k], region_counts, err_msg=f"region counts of variant {k}")
+        # The leads are summed in a different order
+        np.testing.assert_allclose(values[:, k], ecg_values, rtol=1e-9, atol=1e-9, err_msg=f"leads of variant {k}")
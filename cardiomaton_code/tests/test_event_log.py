@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from src.backend.enums.cell_type import ConfigLoader
+from src.backend.models.automaton import Automaton
+from src.backend.models.event_log import EventLog
+from src.database.repository.automaton_repository import get_repository
+
+N_STEPS = 600
+REWIND = 30
+
+
+@pytest.fixture
+def automaton(code_root):
+    ConfigLoader.loadConfig()
+    dto = get_repository().get_automaton("PHYSIOLOGICAL")
+    return Automaton(dto.shape, dto.cell_map, img_ptr=0, img_bytes=0, frame=dto.frame, buffer_size=100)
+
+
+def advance(automaton, steps):
+    for _ in range(steps):
+        automaton.update_grid(False)
+
+
+def go_back(automaton, frames):
+    """
+    Goes back in time the way the playback slider does.
+    """
+    automaton.render_frame(-frames - 1, False, False)
+    automaton.set_frame_counter(-frames)
+
+
+def test_rewind_in_memory_log(automaton):
+    log = EventLog()
+    automaton.attach_event_log(log)
+    advance(automaton, N_STEPS)
+    rewound = automaton.get_frame_counter() - REWIND
+    states = log.states_at(rewound)
+
+    go_back(automaton, REWIND)
+    assert automaton.get_frame_counter() == rewound
+    np.testing.assert_array_equal(states, automaton.get_states())
+    np.testing.assert_array_equal(log.last_states, automaton.get_states())
+
+    advance(automaton, 50)
+    np.testing.assert_array_equal(log.last_states, automaton.get_states())
+    np.testing.assert_array_equal(log.states_at(automaton.get_frame_counter()), automaton.get_states())
+
+
+def test_rewind_before_the_log_starts_over(automaton):
+    advance(automaton, N_STEPS)
+    log = EventLog()
+    automaton.attach_event_log(log)
+    advance(automaton, 10)
+
+    go_back(automaton, REWIND)
+    assert log.base_frame == automaton.get_frame_counter()
+    assert len(log) == 0
+    np.testing.assert_array_equal(log.base_states, automaton.get_states())
+
+    advance(automaton, 50)
+    np.testing.assert_array_equal(log.states_at(automaton.get_frame_counter()), automaton.get_states())
+
+
+def test_rewind_streamed_log(automaton, tmp_path):
+    path = tmp_path / "events.bin"
+    # Every frame is flushed, the rewind goes back past the events already in the file
+    log = EventLog(path=str(path), flush_size=1)
+    start = automaton.get_states().copy()
+    automaton.attach_event_log(log)
+    advance(automaton, N_STEPS)
+
+    go_back(automaton, REWIND)
+    np.testing.assert_array_equal(log.last_states, automaton.get_states())
+
+    advance(automaton, 50)
+    log.flush()
+    np.testing.assert_array_equal(log.last_states, automaton.get_states())
+
+    events = EventLog.read_file(str(path))
+    assert (np.diff(events["frame"]) >= 0).all()
+    assert events["frame"][-1] <= automaton.get_frame_counter()
+    replayed = start.copy()
+    for event in events:
+        replayed[event["cell"]] = event["state"]
+    np.testing.assert_array_equal(replayed, automaton.get_states())
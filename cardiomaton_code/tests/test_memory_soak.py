@@ -0,0 +1,66 @@
+import gc
+import tracemalloc
+
+import pytest
+
+from src.backend.enums.cell_state import CellState
+from src.backend.enums.cell_type import ConfigLoader
+from src.backend.models.automaton import Automaton
+from src.database.repository.automaton_repository import get_repository
+
+N_STEPS = 2000
+WARMUP_STEPS = 800
+MODIFY_EVERY = 40
+
+# Python side growth allowed after the warm up, the charge function cache is full by then
+TRACED_GROWTH_BYTES = 2 * 1024 * 1024
+
+
+@pytest.fixture
+def automaton(code_root):
+    ConfigLoader.loadConfig()
+    dto = get_repository().get_automaton("PHYSIOLOGICAL")
+    return Automaton(dto.shape, dto.cell_map, img_ptr=0, img_bytes=0, frame=dto.frame, buffer_size=50)
+
+
+def test_commit_modify_undo_soak_stays_bounded(automaton):
+    positions = [tuple(p) for p in automaton.get_positions().tolist()]
+    modified = set(positions[::40])
+    stimulated = set(positions[:50])
+    base_report = automaton.memory_report()
+
+    tracemalloc.start()
+    try:
+        warm_traced = None
+        warm_report = None
+        for step in range(N_STEPS):
+            automaton.update_grid(False)
+            if step % MODIFY_EVERY == 0:
+                k = step // MODIFY_EVERY
+                # Two commits per cycle, the charge parameters differ between the cycles
+                automaton.commit_current_automaton()
+                automaton.modify_charge_data(modified, {"V_peak": 15.0 + k % 12},
+                                             {"V_peak": 10.0 + k % 9}, {"V_peak": 20.0 + k % 7})
+                automaton.commit_current_automaton()
+                automaton.modify_cell_state(stimulated, CellState.RAPID_DEPOLARIZATION)
+            elif step % MODIFY_EVERY == MODIFY_EVERY // 2:
+                automaton.undo_modification()
+                automaton.undo_modification()
+
+            if step == WARMUP_STEPS - 1:
+                gc.collect()
+                warm_traced = tracemalloc.get_traced_memory()[0]
+                warm_report = automaton.memory_report()
+
+        gc.collect()
+        traced = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    report = automaton.memory_report()
+    assert traced - warm_traced < TRACED_GROWTH_BYTES
+    # Every commit was undone, so the snapshots and the charge tables they kept alive are freed
+    assert report["undo_snapshots"] == base_report["undo_snapshots"]
+    assert report["charge_tables"] == base_report["charge_tables"]
+    for key in ("grids", "neighbors", "charge_tables", "undo_snapshots", "frame_recorder", "recorders"):
+        assert report[key] <= warm_report[key], key
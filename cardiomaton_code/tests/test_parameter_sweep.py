@@ -0,0 +1,62 @@
+import json
+import sqlite3
+
+import numpy as np
+import pytest
+
+from src.backend.services.parameter_sweep import ParameterSweep, grid
+
+STEPS = 60
+POINTS = grid({"SA_NODE.t40": [0.5, 1.0]})
+
+
+def run_sweep(path, steps=STEPS, batch_size=1, progress=None):
+    sweep = ParameterSweep("PHYSIOLOGICAL", POINTS, steps, str(path), workers=1, batch_size=batch_size)
+    try:
+        return sweep.run(progress)
+    finally:
+        sweep.close()
+
+
+def test_rerun_resumes_only_the_missing_points(tmp_path):
+    path = tmp_path / "sweep.sqlite"
+    first = run_sweep(path)
+    assert list(first["point"]) == [0, 1]
+
+    # Point 1 is lost, point 0 gets a marker that a rerun of it would overwrite
+    with sqlite3.connect(path) as connection:
+        connection.execute("DELETE FROM sweep_runs WHERE point = 1")
+        metrics = {**json.loads(connection.execute("SELECT metrics FROM sweep_runs WHERE point = 0").fetchone()[0]),
+                   "ecg_ii_ptp": -1.0}
+        connection.execute("UPDATE sweep_runs SET metrics = ? WHERE point = 0", (json.dumps(metrics),))
+
+    reported = []
+    resumed = run_sweep(path, progress=lambda finished, total: reported.append((finished, total)))
+
+    assert reported == [(1, 2), (2, 2)]
+    assert resumed["ecg_ii_ptp"][0] == -1.0
+    for name in resumed.dtype.names:
+        if name != "ecg_ii_ptp":
+            np.testing.assert_array_equal(resumed[name], first[name], err_msg=name)
+    np.testing.assert_array_equal(resumed["ecg_ii_ptp"][1], first["ecg_ii_ptp"][1])
+
+
+def test_results_of_a_different_sweep_are_refused(tmp_path):
+    path = tmp_path / "sweep.sqlite"
+    ParameterSweep("PHYSIOLOGICAL", POINTS, STEPS, str(path), workers=1).close()
+
+    with pytest.raises(ValueError, match="different sweep"):
+        ParameterSweep("PHYSIOLOGICAL", POINTS, STEPS + 1, str(path), workers=1)
+
+
+def test_batched_points_match_the_single_runs(tmp_path):
+    single = run_sweep(tmp_path / "single.sqlite")
+    batched = run_sweep(tmp_path / "batched.sqlite", batch_size=2)
+
+    assert single.dtype == batched.dtype
+    for name in single.dtype.names:
+        if name == "ecg_ii_ptp":
+            # The lead is summed over the cells in a different order, the rest is exact
+            np.testing.assert_allclose(batched[name], single[name], rtol=1e-9, err_msg=name)
+        else:
+            np.testing.assert_array_equal(batched[name], single[name], err_msg=name)
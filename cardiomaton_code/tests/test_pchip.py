@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from src.update_strategies.charge_approx.pchip import pchip
+
+interpolate = pytest.importorskip("scipy.interpolate")
+
+
+def test_matches_scipy_on_random_knots():
+    rng = np.random.default_rng(3)
+    for _ in range(500):
+        n = int(rng.integers(2, 7))
+        x = np.cumsum(rng.uniform(0.01, 1.0, n))
+        y = rng.normal(size=n)
+        if rng.random() < 0.3:
+            # Flat segments and the local extrema get the zero slopes
+            y[rng.integers(0, n)] = y[0]
+        t = np.concatenate([rng.uniform(x[0] - 1, x[-1] + 1, 100), x])
+
+        expected = interpolate.PchipInterpolator(x, y)(t)
+        np.testing.assert_allclose(pchip(x, y, t), expected, rtol=1e-12, atol=1e-12)
+
+
+def test_matches_scipy_on_the_action_potential_knots():
+    knots_t = [0.004, 0.019, 0.089, 0.259]
+    knots_V = [20.0, 5.0, -15.0, -85.0]
+    t = np.linspace(-0.1, 0.3, 2001)
+
+    expected = interpolate.PchipInterpolator(knots_t, knots_V)(t)
+    np.testing.assert_allclose(pchip(knots_t, knots_V, t), expected, rtol=1e-12, atol=1e-12)
+    assert np.ndim(pchip(knots_t, knots_V, 0.05)) == 0
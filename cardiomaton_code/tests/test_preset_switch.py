@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("PyQt6.QtGui")
+
+from PyQt6.QtGui import QImage
+
+from src.backend.services import simulation_service
+from src.backend.services.simulation_service import SimulationService
+
+ENTRIES = [
+    {"name": "PHYSIOLOGICAL", "topology_id": 1},
+    {"name": "SINUS_BRADYCARDIA", "topology_id": 1},
+    {"name": "OTHER_MESH", "topology_id": 2},
+    {"name": "LEGACY", "topology_id": None},
+]
+
+
+class FakeRepository:
+    def __init__(self):
+        self.loaded = []
+
+    def list_entries(self):
+        return [dict(entry) for entry in ENTRIES]
+
+    def get_automaton(self, name):
+        self.loaded.append(name)
+        return SimpleNamespace(shape=(4, 4), cell_map={}, frame=7)
+
+
+class FakeTemplates:
+    def __init__(self):
+        self.built = []
+
+    def get(self, name):
+        self.built.append(name)
+        return name
+
+
+class FakeAutomaton:
+    def __init__(self, *args, **kwargs):
+        self.reset_to = []
+
+    def reset_from(self, template):
+        self.reset_to.append(template)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(simulation_service, "Automaton", FakeAutomaton)
+    service = SimulationService.__new__(SimulationService)
+    service.ft = 0.05
+    service.image = QImage(8, 8, QImage.Format.Format_RGBA8888)
+    service.repository = FakeRepository()
+    service.templates = FakeTemplates()
+    service.current_automaton_preset = "PHYSIOLOGICAL"
+    service.automaton = FakeAutomaton()
+    service.replaced = []
+    service._replace_automaton = service.replaced.append
+    return service
+
+
+def test_preset_on_the_same_mesh_is_restored_from_the_template(service):
+    live = service.automaton
+    service.select_preset("SINUS_BRADYCARDIA")
+
+    assert live.reset_to == ["SINUS_BRADYCARDIA"]
+    assert service.repository.loaded == []
+    assert service.replaced == []
+
+
+@pytest.mark.parametrize("entry", ["OTHER_MESH", "LEGACY"])
+def test_preset_on_another_mesh_is_built_once(service, entry):
+    service.select_preset(entry)
+
+    assert service.templates.built == []
+    assert service.repository.loaded == [entry]
+    assert len(service.replaced) == 1
+    assert service.current_automaton_preset == entry
+
+
+def test_restart_uses_the_template(service):
+    service.current_automaton_preset = "LEGACY"
+    live = service.automaton
+    service.restart_automaton()
+
+    assert live.reset_to == ["LEGACY"]
+    assert service.repository.loaded == []
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from src.backend.enums.cell_type import ConfigLoader
+from src.backend.models.automaton import Automaton
+from src.backend.models.ecg_recorder import EcgRecorder
+from src.backend.models.region_recorder import RegionRecorder
+from src.database.repository.automaton_repository import get_repository
+
+N_STEPS = 400
+
+
+@pytest.fixture
+def automaton(code_root):
+    ConfigLoader.loadConfig()
+    dto = get_repository().get_automaton("PHYSIOLOGICAL")
+    return Automaton(dto.shape, dto.cell_map, img_ptr=0, img_bytes=0, frame=dto.frame, buffer_size=1)
+
+
+def test_recorders_match_the_state_of_every_step(automaton):
+    n_cells = len(automaton.get_positions())
+    rng = np.random.default_rng(0)
+    # Two recorders with a different number of leads, their sums share one buffer in the update loop
+    ecgs = [EcgRecorder(rng.normal(size=(n_leads, n_cells)), capacity=N_STEPS) for n_leads in (3, 1)]
+    regions = RegionRecorder(N_STEPS)
+    for ecg in ecgs:
+        automaton.attach_ecg(ecg)
+    automaton.attach_region_recorder(regions)
+
+    expected_leads = [[] for _ in ecgs]
+    expected_counts = []
+    for _ in range(N_STEPS):
+        automaton.update_grid(False)
+        view = automaton.state_view()
+        for k, ecg in enumerate(ecgs):
+            expected_leads[k].append(ecg.weight_matrix @ view.charge)
+        counts = np.zeros((len(regions.region_names), len(regions.state_names)), dtype=np.int32)
+        np.add.at(counts, (view.type, view.state), 1)
+        expected_counts.append(counts)
+
+    for k, ecg in enumerate(ecgs):
+        _, values = ecg.series()
+        # The snapshot keeps the charge in single precision, the leads are summed from the cells
+        np.testing.assert_allclose(values, expected_leads[k], rtol=1e-5)
+    frames, counts, _ = regions.series()
+    np.testing.assert_array_equal(counts, expected_counts)
+    assert frames[-1] == automaton.get_frame_counter()
+
+
+def test_ring_buffer_keeps_the_newest_frames_in_order(automaton):
+    probe = automaton.add_probe(automaton.get_positions()[:3].tolist(), 5)
+    automaton.advance(12)
+
+    frames, charges, states = probe.series()
+    newest = automaton.get_frame_counter()
+    np.testing.assert_array_equal(frames, np.arange(newest - 4, newest + 1))
+    assert charges.shape == states.shape == (5, 3)
+    assert (probe.count, probe.total) == (5, 12)
+    assert probe.latest()[0] == newest
+
+    probe.clear()
+    assert (probe.count, probe.total) == (0, 0)
+    assert len(probe.series()[0]) == 0
+    assert probe.latest() is None
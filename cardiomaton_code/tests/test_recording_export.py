@@ -0,0 +1,70 @@
+import time
+
+import numpy as np
+import pytest
+
+from src.backend.enums.cell_type import ConfigLoader
+from src.backend.models.automaton import Automaton
+from src.backend.services import recording_export
+from src.backend.services.recording_export import COLUMNS, RecordingExporter, export_recorded, read_recording
+from src.database.repository.automaton_repository import get_repository
+
+N_FRAMES = 45
+CHUNK_FRAMES = 16
+
+
+@pytest.fixture
+def automaton(code_root):
+    ConfigLoader.loadConfig()
+    dto = get_repository().get_automaton("PHYSIOLOGICAL")
+    automaton = Automaton(dto.shape, dto.cell_map, img_ptr=0, img_bytes=0, frame=dto.frame, buffer_size=64)
+    for _ in range(N_FRAMES):
+        automaton.update_grid(False)
+    return automaton
+
+
+@pytest.mark.parametrize("compression", [None, 6])
+def test_export_reads_back_as_the_recorded_frames(automaton, tmp_path, compression):
+    export_recorded(automaton, tmp_path, chunk_frames=CHUNK_FRAMES, compression=compression)
+    recording = read_recording(tmp_path)
+
+    newest = automaton.get_frame_counter()
+    np.testing.assert_array_equal(recording["frame"], np.arange(newest - N_FRAMES + 1, newest + 1))
+    np.testing.assert_array_equal(recording["positions"], automaton.get_positions())
+    for row, back in enumerate(range(N_FRAMES, 0, -1)):
+        frame = automaton.frame_view(-back)
+        for name, field, dtype in COLUMNS:
+            np.testing.assert_array_equal(recording[name][row], frame[field].astype(dtype), err_msg=name)
+
+    # Two full chunks and the partial last one
+    chunks = sorted(path.name for path in tmp_path.glob("chunk_*"))
+    assert len(chunks) == 3
+    assert all(name.endswith(".npz") for name in chunks) == (compression is not None)
+
+
+def test_reading_selected_columns(automaton, tmp_path):
+    export_recorded(automaton, tmp_path, chunk_frames=CHUNK_FRAMES)
+    recording = read_recording(tmp_path, columns=["state"])
+
+    assert set(recording) == {"frame", "state", "positions"}
+    assert recording["state"].shape == (N_FRAMES, len(automaton.get_positions()))
+
+
+def test_failed_write_surfaces_on_submit_and_close(automaton, tmp_path, monkeypatch):
+    exporter = RecordingExporter(tmp_path, automaton.get_positions(), chunk_frames=2)
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(recording_export.np, "save", fail)
+    frame = automaton.frame_view(-1)
+
+    with pytest.raises(RuntimeError, match="disk full"):
+        # The chunk is written on the writer thread, the error is seen by one of the next submits
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            exporter.submit(frame, 0)
+            time.sleep(0.01)
+    with pytest.raises(RuntimeError, match="disk full"):
+        exporter.close()
+    assert not (tmp_path / recording_export.INDEX_FILE).exists()
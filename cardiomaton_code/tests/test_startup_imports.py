@@ -0,0 +1,52 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+pytest.importorskip("PyQt6.QtWidgets")
+
+# Only the mesh building and the video export need these, loading them at startup costs seconds
+MESH_ONLY_MODULES = ("cv2", "networkx", "matplotlib", "scipy.spatial", "scipy.interpolate")
+
+# Generous limits, importing main_with_front takes about 0.05s and the first frame is shown after about 1.4s
+IMPORT_BUDGET_S = 2.0
+FIRST_FRAME_BUDGET_S = 10.0
+
+# Runs the real startup of main_with_front, with the backend built by BackendInitWorker, up to the first frame
+STARTUP_SCRIPT = """
+import json, sys, time
+t0 = time.perf_counter()
+import main_with_front
+imported = time.perf_counter() - t0
+try:
+    main_with_front.main(exit_after_first_frame=True)
+except SystemExit as exit:
+    if exit.code:
+        raise
+first_frame = time.perf_counter() - t0
+
+print(json.dumps({"modules": sorted(sys.modules), "import_s": imported, "first_frame_s": first_frame}))
+"""
+
+
+@pytest.fixture(scope="module")
+def startup():
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    result = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_mesh_only_modules_stay_off_the_startup_path(startup):
+    loaded = [name for name in MESH_ONLY_MODULES if name in startup["modules"]]
+    assert loaded == []
+
+
+def test_startup_within_budget(startup):
+    assert startup["import_s"] < IMPORT_BUDGET_S
+    assert startup["first_frame_s"] < FIRST_FRAME_BUDGET_S